@@ -0,0 +1,197 @@
+import itertools
+import threading
+from typing import Iterable, Iterator
+from urllib.parse import quote
+
+from config import Config
+from crossref import create_client, iter_dois_data, new_doi_result
+from doi_result import DOIResult
+from host_matcher import Hosts
+from http_client import Client, ClientError, RetryBudget
+from stats import job_stats
+
+
+""" Route each DOI by the registration agency its prefix belongs to """
+
+
+CROSSREF = "crossref"
+DOI_NOT_FOUND = "DOI does not exist"
+
+
+def get_prefix(doi: str) -> str:
+    return doi.strip().split("/", 1)[0].lower()
+
+
+def get_agency_url(dois: list[str]) -> str:
+    """URL of the doi.org endpoint that says which agency registered each of dois."""
+    return "/ra/" + ",".join(quote(doi, safe="/") for doi in dois)
+
+
+class AgencyCache:
+    """Registration agency of each prefix looked up, every DOI under a prefix is registered with the same agency."""
+
+    def __init__(self) -> None:
+        self.agencies: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def get(self, prefix: str) -> str | None:
+        with self.lock:
+            return self.agencies.get(prefix)
+
+    def set(self, prefix: str, agency: str) -> None:
+        with self.lock:
+            self.agencies[prefix] = agency
+
+
+_cache = AgencyCache()
+
+
+def get_agency_cache() -> AgencyCache:
+    """Get the process wide agency cache, so the queue worker only looks each prefix up once."""
+    return _cache
+
+
+def fetch_agencies(client: Client, dois: list[str]) -> dict[str, str | None]:
+    """
+    Ask doi.org which agency registered each of dois in one request, returning the lower cased DOI
+    mapped to the agency's name, or to None if the DOI doesn't exist. DOIs the answer doesn't
+    cover are left out, and an empty dict is returned if the request fails.
+    """
+    try:
+        items = client.get_json(get_agency_url(dois))
+    except ClientError as err:
+        print(f"Agency lookup of {len(dois)} DOIs failed: {err}")
+        return {}
+    job_stats.incr("agency_lookups")
+
+    found: dict[str, str | None] = {}
+    for item in items if isinstance(items, list) else []:
+        doi = str(item.get("DOI", "")).lower()
+        if item.get("RA"):
+            found[doi] = item["RA"]
+        elif item.get("status") == DOI_NOT_FOUND:
+            found[doi] = None
+    return found
+
+
+def find_agencies(
+    dois: list[str],
+    batch_size: int = Config.AGENCY_BATCH_SIZE,
+    retry_dois: int = Config.AGENCY_RETRY_DOIS,
+    max_misses: int = Config.AGENCY_MAX_MISSES,
+) -> tuple[dict[str, str], set[str]]:
+    """
+    Agency of each prefix of dois, and the lower cased DOIs that don't exist.
+
+    Prefixes already in the cache aren't looked up again. For the rest one DOI per prefix is
+    asked about, batch_size to a request. If it doesn't exist retry_dois more DOIs of the prefix
+    are asked about together in the next request, and the prefix is given up on once max_misses
+    of its DOIs don't exist. Prefixes whose agency couldn't be found are left out.
+    """
+    cache = get_agency_cache()
+    agencies: dict[str, str] = {}
+    candidates: dict[str, list[str]] = {}
+    for doi in dict.fromkeys(dois):
+        prefix = get_prefix(doi)
+        agency = cache.get(prefix)
+        if agency:
+            agencies[prefix] = agency
+        # a comma would split the DOI in two in the request
+        elif doi and "," not in doi:
+            candidates.setdefault(prefix, []).append(doi)
+
+    missing: set[str] = set()
+    if not candidates:
+        return agencies, missing
+
+    misses: dict[str, int] = {}
+    with create_client(RetryBudget(), Config.AGENCY_HOST) as client:
+        while candidates:
+            asking: dict[str, list[str]] = {}
+            space = max(batch_size, 1)
+            for prefix, queue in candidates.items():
+                if space <= 0:
+                    break
+                count = min(retry_dois if prefix in misses else 1, space)
+                asking[prefix], candidates[prefix] = queue[:count], queue[count:]
+                space -= count
+
+            found = fetch_agencies(client, [doi for asked in asking.values() for doi in asked])
+            if not found:
+                break
+
+            for prefix, asked in asking.items():
+                answers = [found.get(doi.lower(), "") for doi in asked]
+                missed = [doi.lower() for doi, agency in zip(asked, answers) if agency is None]
+                missing.update(missed)
+
+                agency = next((agency for agency in answers if agency), None)
+                if agency:
+                    cache.set(prefix, agency)
+                    agencies[prefix] = agency
+                    del candidates[prefix]
+                elif len(missed) < len(asked):
+                    # left out of the answer, so the prefix is left unknown
+                    del candidates[prefix]
+                else:
+                    misses[prefix] = misses.get(prefix, 0) + len(missed)
+                    if not candidates[prefix] or misses[prefix] >= max_misses:
+                        del candidates[prefix]
+
+    return agencies, missing
+
+
+def iter_routed_data(
+    dois: Iterable[str],
+    resolving_host: Hosts = "",
+    full_metadata: bool = True,
+    jobs: int = 1,
+    use_async: bool = False,
+    batch_size: int = Config.BATCH_SIZE,
+    fields: list[str] | None = None,
+    window: int = Config.STREAM_WINDOW,
+    other_backend: str = Config.OTHER_AGENCY_BACKEND,
+) -> Iterator[DOIResult]:
+    """
+    Yield a result for each DOI in order, finding which agency registered it first.
+
+    Crossref DOIs are looked up with the Crossref API as usual, and DOIs registered with other
+    agencies are checked with other_backend, "handle" or "redirects", or skipped if it is "skip".
+    DOIs that don't exist fail without being looked up, and DOIs whose agency couldn't be found
+    go to Crossref. DOIs are routed window at a time, the other options are as for iter_dois_data.
+    """
+    dois = iter(dois)
+    while chunk := list(itertools.islice(dois, window)):
+        agencies, missing = find_agencies(chunk)
+        results: list[DOIResult | None] = [None] * len(chunk)
+        routes: dict[str, list[int]] = {}
+
+        for index, doi in enumerate(chunk):
+            agency = agencies.get(get_prefix(doi), CROSSREF)
+            if doi.lower() in missing:
+                results[index] = new_doi_result(doi, errors="Resource not found.")
+            elif agency.lower() == CROSSREF:
+                routes.setdefault(CROSSREF, []).append(index)
+            elif other_backend == "skip":
+                results[index] = new_doi_result(doi, errors=f"Registered with {agency}, not Crossref")
+            else:
+                routes.setdefault(other_backend, []).append(index)
+
+        for backend, indices in routes.items():
+            job_stats.incr(f"routed_to_{backend}", len(indices))
+            routed = iter_dois_data(
+                [chunk[index] for index in indices],
+                resolving_host,
+                full_metadata,
+                jobs,
+                use_async,
+                batch_size,
+                fields,
+                window,
+                backend=backend,
+            )
+            # strict, so the lookups run to the end and close their connections
+            for index, result in zip(indices, routed, strict=True):
+                results[index] = result
+
+        yield from results  # type: ignore[misc]
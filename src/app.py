@@ -1,7 +1,7 @@
 from bottle import default_app, response, request, static_file
 
 from config import Config
-from helpers import add_csv_to_queue, generate_csrf_token
+from helpers import add_csv_to_queue, generate_csrf_token, is_timings_file, split_doi_hosts
 from submissions import start_queue
 from validators import validate_form, get_errors
 
@@ -41,7 +41,7 @@ def queue_count():
 def completed():
     completed_dir = Config.directories["COMPLETE_DIR"]
     completed_files = list(completed_dir.glob("*.csv"))
-    filenames = [file.name for file in completed_files]
+    filenames = [file.name for file in completed_files if not is_timings_file(file)]
     response.content_type = "application/json"
     return {"completed": filenames}
 
@@ -57,11 +57,23 @@ def post_submit():
         response.status = 400
         return {"success": False, "message": "Invalid form", "errors": errors}
 
+    # a prefix job has no DOIs, they are paged through from the API when it is processed
+    options = {"backend": result["backend"]["value"], "sample": result["sample"]["value"]}
+    if result["sample"]["value"] and request.forms.get("full_run"):
+        options["full_run"] = "true"
+    if "prefix" in result:
+        options.update({"prefix": result["prefix"]["value"], "filter": result["filters"]["value"]})
+
+    # lines of DOIs can give the hosts their DOI should resolve to after it
+    dois, hosts = split_doi_hosts([] if "prefix" in options else result["dois"]["value"])
+
     output_path = add_csv_to_queue(
         queue_dir=Config.directories["QUEUE_DIR"],
         resolver_host=result["resolver"]["value"],
         email=result["email"]["value"],
-        dois=result["dois"]["value"],
+        dois=dois,
+        options=options,
+        hosts=hosts,
     )
 
     # check if queue is running, by checking lockfile exists
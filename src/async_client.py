@@ -0,0 +1,349 @@
+import asyncio
+import ssl
+import time
+
+from config import Config
+from stats import job_stats
+from http_client import (
+    BufferedResponse,
+    RETRYABLE_STATUSES,
+    check_response_status,
+    decode_json,
+    get_retry_delay,
+    parse_retry_after,
+    read_decoded_body,
+)
+
+
+class AsyncConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.connect_time: float | None = None
+        # set once the connection has been idle, when the server may have closed it
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncClient:
+    """
+    asyncio alternative to http_client.Client.
+
+    Any number of requests can be awaited at once, they are shared out
+    over at most max_connections persistent HTTP/1.1 connections.
+    """
+
+    def __init__(
+        self,
+        max_connections=10,
+        timeout=30,
+        max_retries=3,
+        retry_delay=2,
+        host=None,
+        headers=None,
+        port=443,
+        use_ssl=True,
+        rate_limiter=None,
+        retry_budget=None,
+        max_retry_delay=Config.MAX_RETRY_DELAY,
+        circuit_breaker=None,
+        latency_tracker=None,
+        hedge=False,
+        cassette=None,
+        replay=False,
+        replay_latency=True,
+    ) -> None:
+        """
+        Host should be passed without protocol.
+
+        If a rate_limiter is passed, every request waits for a token from it.
+        Retries back off and use retry_budget and circuit_breaker, and latency_tracker
+        and hedge set timeouts and hedge slow requests, in the same way as http_client.Client.
+
+        If a cassette.Cassette is passed every response is recorded to it, or with replay set
+        requests are answered from it without connecting, taking as long as they did when
+        recorded unless replay_latency is False.
+        """
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_budget = retry_budget
+        self.circuit_breaker = circuit_breaker
+        self.latency_tracker = latency_tracker
+        self.hedge = hedge
+        self.cassette = cassette
+        self.replay = replay
+        self.replay_latency = replay_latency
+        self.host = host or Config.API_HOST
+        self.headers = headers or Config.HEADERS
+        self.port = port
+        self.rate_limiter = rate_limiter
+        self.context = ssl.create_default_context() if use_ssl else None
+        self.idle: list[AsyncConnection] = []
+        self.slots = asyncio.Semaphore(max_connections)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close_connections()
+
+    def close_connections(self):
+        while self.idle:
+            self.idle.pop().close()
+
+    async def _get_connection(self) -> AsyncConnection:
+        while self.idle:
+            conn = self.idle.pop()
+            # the server closed it while it was idle
+            if conn.reader.at_eof() or conn.writer.is_closing():
+                conn.close()
+                continue
+            conn.reused = True
+            return conn
+        return await self._connect()
+
+    async def _connect(self) -> AsyncConnection:
+        started = time.monotonic()
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self.context, server_hostname=self.host if self.context else None
+        )
+        conn = AsyncConnection(reader, writer)
+        # lookup, TCP and TLS all happen inside open_connection so can only be timed together
+        conn.connect_time = time.monotonic() - started
+        job_stats.observe("connect", conn.connect_time)
+        return conn
+
+    async def request(self, url, method="GET", headers={}) -> BufferedResponse | None:
+        if headers == {}:
+            headers = self.headers
+
+        if self.retry_budget:
+            self.retry_budget.record_request()
+
+        for attempt in range(1, self.max_retries + 1):
+            retry_after = None
+            if self.circuit_breaker:
+                self.circuit_breaker.before_request()
+
+            try:
+                print(f"making {method} request to {url}")
+                response = await self._send(url, method, headers)
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_status(response.status)
+
+                if response.status == 200:
+                    return response
+
+                print(f"Attempt {attempt}: Received status {response.status}")
+
+                # 404s and other client errors will not change on a retry
+                if response.status not in RETRYABLE_STATUSES:
+                    return response
+
+                retry_after = parse_retry_after(response.getheader("Retry-After"))
+
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                print(f"Attempt {attempt}: Error - {e!r}")
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+
+            if attempt < self.max_retries:
+                if self.retry_budget and not self.retry_budget.spend():
+                    print("Retry budget for this job used up, not retrying")
+                    break
+                await asyncio.sleep(get_retry_delay(attempt, self.retry_delay, self.max_retry_delay, retry_after))
+
+        print("Failed to fetch data after retries.")
+        return None
+
+    async def _send(self, url: str, method: str, headers: dict) -> BufferedResponse:
+        """
+        Make a request, and if it hasn't been answered within the usual time and hedging is on,
+        make it again on another connection and use whichever response comes first.
+        """
+        primary = asyncio.ensure_future(self._make_request(url, method, headers))
+
+        hedge_after = None
+        if self.hedge and self.latency_tracker and method == "GET":
+            hedge_after = self.latency_tracker.hedge_delay()
+
+        if hedge_after is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(self._make_request(url, method, headers))
+        job_stats.incr("hedges_sent")
+
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            job_stats.incr("hedge_wins")
+                        return task.result()
+            # both failed
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _make_request(self, url: str, method: str, headers: dict) -> BufferedResponse:
+        """
+        Make one request, holding a connection slot until the response has been read.
+
+        The timeout only starts once a slot is free and a rate limit token has been waited for.
+        How long the request took is recorded, or the timeout if it timed out.
+
+        A reused keep-alive connection may have been closed by the server while idle,
+        in that case the request is sent once more on a new connection without using up an attempt.
+        """
+        if self.cassette and self.replay:
+            return await self._replay(url, method)
+
+        async with self.slots:
+            if self.rate_limiter:
+                await self._wait_for_token()
+            timeout = self.latency_tracker.timeout(self.timeout) if self.latency_tracker else self.timeout
+            started = time.monotonic()
+            try:
+                conn = await asyncio.wait_for(self._get_connection(), timeout)
+            except asyncio.TimeoutError:
+                if self.latency_tracker:
+                    self.latency_tracker.record_timeout(timeout)
+                raise
+            try:
+                try:
+                    response = await asyncio.wait_for(self._exchange(conn, url, method, headers), timeout)
+                except (ConnectionResetError, BrokenPipeError) as e:
+                    if not conn.reused:
+                        raise
+                    print(f"Reconnecting after stale connection: {e!r}")
+                    conn.close()
+                    conn = await asyncio.wait_for(self._connect(), timeout)
+                    response = await asyncio.wait_for(self._exchange(conn, url, method, headers), timeout)
+            except BaseException as err:
+                # connection state is unknown after a failure or cancellation
+                conn.close()
+                if isinstance(err, asyncio.TimeoutError) and self.latency_tracker:
+                    self.latency_tracker.record_timeout(timeout)
+                raise
+
+            elapsed = time.monotonic() - started
+            if self.latency_tracker:
+                self.latency_tracker.record(elapsed)
+
+            if self.cassette:
+                self.cassette.record(method, self.host, url, response, elapsed)
+
+            if self.rate_limiter:
+                self.rate_limiter.update_from_headers(response)
+
+            if (response.getheader("connection") or "").lower() == "close":
+                conn.close()
+            else:
+                self.idle.append(conn)
+            return response
+
+    async def _wait_for_token(self) -> None:
+        """
+        Reserve a token from the rate limiter and wait until it can be used.
+
+        Called once a slot is held, so no more tokens are reserved ahead than there are connections.
+        The bucket file is locked off the event loop, and the token is given back if cancelled while waiting.
+        """
+        reserving = asyncio.ensure_future(asyncio.to_thread(self.rate_limiter.reserve))
+        try:
+            delay = await asyncio.shield(reserving)
+        except asyncio.CancelledError:
+            # the thread takes the token even once nothing is waiting for it, so it is given back when taken
+            reserving.add_done_callback(self._refund_reserved)
+            raise
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # refunded straight away, as the task may not get to await anything else
+            self.rate_limiter.refund()
+            raise
+
+    def _refund_reserved(self, reserving: asyncio.Future) -> None:
+        if not reserving.cancelled() and reserving.exception() is None:
+            self.rate_limiter.refund()
+
+    async def _replay(self, url: str, method: str) -> BufferedResponse:
+        recorded, elapsed = self.cassette.find(method, self.host, url)
+        if self.replay_latency:
+            await asyncio.sleep(elapsed)
+        return recorded
+
+    async def _exchange(self, conn: AsyncConnection, url: str, method: str, headers: dict) -> BufferedResponse:
+        request_lines = [f"{method} {url} HTTP/1.1", f"Host: {self.host}", "Connection: keep-alive"]
+        request_lines += [f"{name}: {value}" for name, value in headers.items()]
+        started = time.monotonic()
+        conn.writer.write(("\r\n".join(request_lines) + "\r\n\r\n").encode("latin-1"))
+        await conn.writer.drain()
+
+        status_line = await conn.reader.readline()
+        first_byte = time.monotonic()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        _, status, *reason = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+
+        response_headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked(conn.reader)
+        elif "content-length" in response_headers:
+            body = await conn.reader.readexactly(int(response_headers["content-length"]))
+        else:
+            body = await conn.reader.read()
+            response_headers["connection"] = "close"
+
+        response = BufferedResponse(int(status), "".join(reason), list(response_headers.items()), body)
+        response.timings = {"ttfb": first_byte - started, "body": time.monotonic() - first_byte}
+        if conn.connect_time is not None:
+            response.timings["connect"], conn.connect_time = conn.connect_time, None
+        job_stats.observe("ttfb", response.timings["ttfb"])
+        job_stats.observe("body", response.timings["body"])
+        return response
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks: list[bytes] = []
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";")[0], 16)
+            if size == 0:
+                # skip trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def get_response_data(self, response: BufferedResponse) -> str:
+        return read_decoded_body(response.read, response.getheader("Content-Encoding")).decode("utf-8")
+
+    async def get_json(self, url: str) -> dict:
+        """
+        Request url and return the JSON body as a dict.
+
+        Raises the same errors as http_client.Client.get_json.
+        """
+        response = check_response_status(await self.request(url))
+        return decode_json(read_decoded_body(response.read, response.getheader("Content-Encoding")))
@@ -0,0 +1,89 @@
+import statistics
+import threading
+
+from config import Config
+from stats import job_stats
+
+
+class ConcurrencyController:
+    """
+    Sets how many requests may be in flight at once using additive increase, multiplicative decrease.
+
+    Decisions are made once every limit requests have finished. The limit doubles until the first
+    sign of trouble, then grows by one while response times stay close to the lowest median seen.
+    It is halved when the median response time rises past latency_tolerance times that
+    baseline, or when a request ends with a 429, a server error or no response at all.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: int = 1,
+        latency_tolerance: float = Config.AUTOTUNE_LATENCY_TOLERANCE,
+        backoff: float = 0.5,
+    ) -> None:
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = min(max(initial_limit, min_limit), self.max_limit)
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.latencies: list[float] = []
+        self.congested = False
+        self.slow_start = True
+        self.baseline: float | None = None
+
+    def acquire(self) -> None:
+        """Block until another request may be sent."""
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, status: int | None) -> None:
+        """Report a finished request, status is None if no response was received."""
+        with self.condition:
+            self.in_flight -= 1
+            # wake waiting workers even if adjusting fails, or they would wait forever
+            try:
+                self.latencies.append(latency)
+                if status is None or status == 429 or status >= 500:
+                    self.congested = True
+
+                if len(self.latencies) >= self.limit:
+                    self._adjust()
+            finally:
+                self.condition.notify_all()
+
+    def _adjust(self) -> None:
+        median = statistics.median(self.latencies)
+        old_limit = self.limit
+
+        if self.congested:
+            reason = "throttled or failed requests"
+        elif self.baseline and median > self.baseline * self.latency_tolerance:
+            reason = f"median latency {median:.2f}s over baseline {self.baseline:.2f}s"
+        else:
+            reason = ""
+
+        if reason:
+            self.limit = max(int(self.limit * self.backoff), self.min_limit)
+            self.slow_start = False
+            job_stats.incr("concurrency_decreases")
+        elif self.slow_start:
+            self.limit = min(self.limit * 2, self.max_limit)
+        else:
+            self.limit = min(self.limit + 1, self.max_limit)
+
+        if self.limit > old_limit:
+            reason = f"median latency {median:.2f}s"
+            job_stats.incr("concurrency_increases")
+        if self.limit != old_limit:
+            print(f"Concurrency {old_limit} -> {self.limit}: {reason}")
+
+        # the baseline can creep up slowly, so a quiet spell early on doesn't hold the limit down for good
+        self.baseline = median if self.baseline is None else min(median, self.baseline * 1.05)
+        self.latencies = []
+        self.congested = False
@@ -0,0 +1,237 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+from http_client import BufferedResponse, ClientError
+
+
+""" Record API responses to a cassette file and replay them later without a network """
+
+
+class CassetteMissError(ClientError):
+    """Replaying and the request was never recorded."""
+
+
+class Cassette:
+    """
+    SQLite file holding every exchange for each method, host and URL, in the order they were made.
+
+    Exchanges for a URL are replayed in the order they were recorded, so a request that was retried
+    gets the same responses again, and once they run out the last one keeps being replayed.
+    A URL recorded again replaces what was recorded for it before.
+    Bodies are stored as they came off the wire, so compressed responses stay compressed.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        # exchanges recorded, and replayed, for each method, host and URL since the file was opened
+        self.recorded: set[tuple[str, str, str]] = set()
+        self.replayed: dict[tuple[str, str, str], int] = {}
+        with self.lock, self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS recordings ("
+                "seq INTEGER PRIMARY KEY, method TEXT, host TEXT, url TEXT, "
+                "status INTEGER, reason TEXT, headers TEXT, body BLOB, elapsed REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS recordings_request ON recordings (method, host, url, seq)")
+
+    def record(self, method: str, host: str, url: str, response: BufferedResponse, elapsed: float) -> None:
+        key = (method, host, url)
+        with self.lock, self.db:
+            if key not in self.recorded:
+                self.recorded.add(key)
+                self.db.execute("DELETE FROM recordings WHERE method = ? AND host = ? AND url = ?", key)
+            self.db.execute(
+                "INSERT INTO recordings (method, host, url, status, reason, headers, body, elapsed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    method,
+                    host,
+                    url,
+                    response.status,
+                    response.reason,
+                    json.dumps(response.headers),
+                    response.body,
+                    elapsed,
+                ),
+            )
+
+    def find(self, method: str, host: str, url: str) -> tuple[BufferedResponse, float]:
+        """
+        Return the next recorded response and how many seconds it took,
+        raises CassetteMissError if there isn't one.
+        """
+        key = (method, host, url)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT status, reason, headers, body, elapsed FROM recordings "
+                "WHERE method = ? AND host = ? AND url = ? ORDER BY seq",
+                key,
+            ).fetchall()
+            if not rows:
+                raise CassetteMissError(f"No recorded response for {method} {host}{url}")
+            replayed = self.replayed.get(key, 0)
+            self.replayed[key] = replayed + 1
+
+        status, reason, headers, body, elapsed = rows[min(replayed, len(rows) - 1)]
+        return BufferedResponse(status, reason, [tuple(header) for header in json.loads(headers)], body), elapsed
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+class RecordingConnection:
+    """Wraps a connection leased from another transport, saving every exchange made on it."""
+
+    def __init__(self, conn, cassette: Cassette, host: str):
+        self.conn = conn
+        self.cassette = cassette
+        self.host = host
+        self.method = ""
+        self.url = ""
+        self.started = 0.0
+
+    def __getattr__(self, name: str):
+        # anything not wrapped, such as connect_timings, comes from the real connection
+        return getattr(self.conn, name)
+
+    @property
+    def timeout(self):
+        return self.conn.timeout
+
+    @timeout.setter
+    def timeout(self, value) -> None:
+        self.conn.timeout = value
+
+    @property
+    def auto_open(self):
+        return getattr(self.conn, "auto_open", 1)
+
+    @auto_open.setter
+    def auto_open(self, value) -> None:
+        self.conn.auto_open = value
+
+    def request(self, method: str, url: str, headers: dict = {}) -> None:
+        self.method, self.url = method, url
+        self.started = time.monotonic()
+        self.conn.request(method, url, headers=headers)
+
+    def getresponse(self) -> BufferedResponse:
+        response = self.conn.getresponse()
+        elapsed = time.monotonic() - self.started
+        recorded = BufferedResponse(response.status, response.reason, response.getheaders(), response.read())
+        self.cassette.record(self.method, self.host, self.url, recorded, elapsed)
+        return recorded
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class RecordingTransport:
+    """Transport that leases from transport and records the responses to cassette."""
+
+    def __init__(self, transport, cassette: Cassette, host: str):
+        self.transport = transport
+        self.cassette = cassette
+        self.host = host
+
+    @property
+    def reuses_connections(self) -> bool:
+        return self.transport.reuses_connections
+
+    def lease(self) -> RecordingConnection:
+        return RecordingConnection(self.transport.lease(), self.cassette, self.host)
+
+    def release(self, conn: RecordingConnection) -> None:
+        self.transport.release(conn.conn)
+
+    def discard(self, conn: RecordingConnection) -> None:
+        self.transport.discard(conn.conn)
+
+    def prewarm(self, count: int) -> None:
+        self.transport.prewarm(count)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class ReplayConnection:
+    """Stands in for an HTTPSConnection, answering from the cassette."""
+
+    def __init__(self, cassette: Cassette, host: str, realtime: bool):
+        self.cassette = cassette
+        self.host = host
+        self.realtime = realtime
+        self.timeout = None
+        self.request_line: tuple[str, str] | None = None
+
+    def request(self, method: str, url: str, headers: dict = {}) -> None:
+        self.request_line = (method, url)
+
+    def getresponse(self) -> BufferedResponse:
+        if self.request_line is None:
+            raise ConnectionError("getresponse called before request")
+        method, url = self.request_line
+        self.request_line = None
+
+        response, elapsed = self.cassette.find(method, self.host, url)
+        if self.realtime:
+            time.sleep(elapsed)
+        return response
+
+    def close(self) -> None:
+        self.request_line = None
+
+
+class ReplayTransport:
+    """
+    Transport that never touches the network, every request is answered from the cassette.
+
+    If realtime is set each response takes as long as it did when it was recorded,
+    otherwise responses are returned straight away.
+    """
+
+    reuses_connections = False
+
+    def __init__(self, cassette: Cassette, host: str, realtime: bool = True):
+        self.cassette = cassette
+        self.host = host
+        self.realtime = realtime
+
+    def lease(self) -> ReplayConnection:
+        return ReplayConnection(self.cassette, self.host, self.realtime)
+
+    def release(self, conn: ReplayConnection) -> None:
+        conn.close()
+
+    def discard(self, conn: ReplayConnection) -> None:
+        conn.close()
+
+    def prewarm(self, count: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+_cassette: Cassette | None = None
+_cassette_pid = 0
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Get the process wide cassette at Config.CASSETTE_FILEPATH, a SQLite connection can't be shared with a fork."""
+    global _cassette, _cassette_pid
+
+    with _cassette_lock:
+        if _cassette is None or _cassette_pid != os.getpid():
+            _cassette = Cassette(Config.CASSETTE_FILEPATH)
+            _cassette_pid = os.getpid()
+        return _cassette
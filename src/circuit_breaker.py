@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+from config import Config
+from stats import job_stats
+
+
+class CircuitOpenError(Exception):
+    """The API is failing, requests are refused until the circuit breaker lets a probe through."""
+
+    def __init__(self, message: str, host: str | None = None) -> None:
+        super().__init__(message)
+        self.host = host
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host that is mostly failing.
+
+    Closed, requests go through and their outcomes are kept for the last window requests.
+    Once failure_rate of them have failed the breaker opens and every request raises
+    CircuitOpenError. After reset_timeout seconds it is half open, a single probe request
+    is let through which closes the breaker if it succeeds or opens it again if it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half open"
+
+    def __init__(
+        self,
+        host: str,
+        failure_rate: float = Config.CIRCUIT_FAILURE_RATE,
+        window: int = Config.CIRCUIT_WINDOW,
+        min_requests: int = Config.CIRCUIT_MIN_REQUESTS,
+        reset_timeout: float = Config.CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at: float | None = None
+        self.lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError unless a request may be made now."""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                print(f"Circuit for {self.host} half open, sending a probe request")
+                self.state = self.HALF_OPEN
+                self.probe_started_at = None
+
+            # one probe at a time, a new one is allowed if the last never reported back
+            if self.state == self.HALF_OPEN and (
+                self.probe_started_at is None or now - self.probe_started_at >= self.reset_timeout
+            ):
+                self.probe_started_at = now
+                return
+
+        raise CircuitOpenError(f"{self.host} is failing, requests paused for {self.retry_in():.0f}s", host=self.host)
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                print(f"Circuit for {self.host} closed, probe request succeeded")
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            if self.state == self.OPEN:
+                return
+
+            self.outcomes.append(False)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_requests and failures >= self.failure_rate * len(self.outcomes):
+                self._open()
+
+    def record_status(self, status: int) -> None:
+        """Server errors count as failures, anything else shows the API is up."""
+        if status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def _open(self) -> None:
+        print(f"Circuit for {self.host} open, pausing requests for {self.reset_timeout:g}s")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started_at = None
+        self.outcomes.clear()
+        job_stats.incr("circuit_opened")
+
+    def retry_in(self) -> float:
+        """Seconds until a probe request will be let through, 0 if requests can be made now."""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(self.opened_at + self.reset_timeout - time.monotonic(), 0)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host: str | None = None) -> CircuitBreaker:
+    """Get the process wide circuit breaker for host, by default the Crossref API."""
+    host = host or Config.API_HOST
+
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
@@ -5,12 +5,27 @@ import pprint
 import subprocess
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from app import run_app
-from crossref import fetch_dois_data
+from circuit_breaker import CircuitOpenError
+from config import Config
+from crossref import iter_dois_data, iter_prefix_data
+from doi_result import DOIResult
 from emailer import run_emailer_cli, set_emailer_arg_parser
-from helpers import read_full_csv_data
-from submissions import write_full_metadata_to_csv, write_resolving_host_summary_to_csv
+from host_matcher import ExpectedHosts
+from http_client import ClientError
+from helpers import (
+    read_csv_options,
+    read_dois_from_csv,
+    read_expected_hosts,
+    read_full_csv_data,
+    write_full_metadata_to_csv,
+    write_results_to_csv,
+    write_timings_to_csv,
+)
+from sampling import SAMPLE_METHODS, iter_sampled_data
+from stats import job_stats
 
 
 def set_arg_parser() -> argparse.ArgumentParser:
@@ -22,7 +37,8 @@ def set_arg_parser() -> argparse.ArgumentParser:
         "-res",
         "--resolving-host",
         type=str,
-        help="If passed the script will check the given DOI/s to see if they resolve to the given host URL.",
+        help="If passed the script will check the given DOI/s to see if they resolve to the given host URL. "
+        "Pass several hosts separated by commas to accept any of them.",
     )
     parser.add_argument(
         "-full",
@@ -30,6 +46,71 @@ def set_arg_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="If passed the full metadata will be queried for",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=Config.JOBS,
+        help="Number of DOI requests to make at once. Defaults to 1, which makes requests one after another.",
+    )
+    parser.add_argument(
+        "-async",
+        "--use-async",
+        action="store_true",
+        default=Config.USE_ASYNC,
+        help="Fetch DOIs on a single asyncio event loop, --jobs sets the number of connections used.",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=Config.BATCH_SIZE,
+        help="Look up this many DOIs per request using the works filter. Defaults to looking each DOI up on its own.",
+    )
+    parser.add_argument(
+        "--fields",
+        type=lambda value: [field.strip() for field in value.split(",") if field.strip()],
+        help="Comma separated metadata fields to request, e.g. DOI,resource,title. "
+        "Defaults to all fields with --full-metadata, otherwise only those needed to check the resolving host.",
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        default="",
+        help="Works filter to narrow a --prefix check, e.g. type:journal-article,from-pub-date:2020",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["crossref", "handle", "redirects", "auto"],
+        default=Config.BACKEND,
+        help="Look DOIs up with the Crossref API, only ask the doi.org Handle API where each DOI resolves to, "
+        "follow each DOI's redirects from doi.org to where it lands, or find each DOI's registration agency "
+        "and only look Crossref DOIs up with Crossref. "
+        "The Handle API can check DOIs from any registration agency but has no metadata.",
+    )
+    parser.add_argument(
+        "--sample",
+        choices=SAMPLE_METHODS,
+        help="Only check a sample of the DOIs, picked at random within each prefix or from all of them, "
+        "and estimate how many of all the DOIs resolve to the resolving host.",
+    )
+    parser.add_argument(
+        "--margin",
+        type=float,
+        default=Config.SAMPLE_MARGIN,
+        help="With --sample, check enough DOIs to estimate the success rate to within this fraction either way.",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=Config.SAMPLE_CONFIDENCE,
+        help="With --sample, the confidence the estimate is within --margin.",
+    )
+    parser.add_argument(
+        "--full-run",
+        action="store_true",
+        help="With --sample, go on to check the rest of the DOIs after the estimate, without checking the sample again.",
+    )
     parser.add_argument(
         "-w",
         "--write-to-csv",
@@ -51,12 +132,19 @@ def set_arg_parser() -> argparse.ArgumentParser:
         help="Pass DOIs separated by comma to be validated.",
     )
     group.add_argument("-d", "-doi", "--doi", type=str, help="Pass single DOI to be validated.")
+    group.add_argument(
+        "-p",
+        "--prefix",
+        type=str,
+        help="Check every DOI registered under the given prefix, e.g. 10.1234.",
+    )
     group.add_argument(
         "-f",
         "-file",
         "--file",
         type=str,
-        help="Pass filepath for csv file of DOIs to be validated. This should contain the DOIs in the first column and nothing else.",
+        help="Pass filepath for csv file of DOIs to be validated. This should contain the DOIs in the first column, "
+        "optionally followed by hosts that DOI should resolve to instead of the resolving host.",
     )
     group.add_argument(
         "-app",
@@ -106,6 +194,13 @@ def set_arg_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def print_results(results: Iterable[DOIResult]) -> Iterator[DOIResult]:
+    """Print each result as it passes through on its way to be written."""
+    for result in results:
+        pprint.pp(result.as_dict())
+        yield result
+
+
 def run_command(command):
     try:
         subprocess.run(command, check=True)
@@ -182,12 +277,19 @@ def main():
         sys.exit()
 
     resolving_host = args.resolving_host
+    # hosts given for single DOIs in a .csv, checked instead of the resolving host
+    per_doi_hosts: dict[str, str] = {}
 
     if args.complete_csv:
         print("getting email, resolver and dois from csv")
         print(args.complete_csv)
         email, resolving_host, dois = read_full_csv_data(args.complete_csv)
         print(email, resolving_host, dois)
+        options = read_csv_options(args.complete_csv)
+        args.prefix = options.get("prefix")
+        args.filter = options.get("filter", args.filter)
+        args.backend = options.get("backend") or args.backend
+        per_doi_hosts = read_expected_hosts(args.complete_csv)
 
     if args.doi:
         print("single doi passed to validate")
@@ -197,7 +299,8 @@ def main():
         dois = args.dois.split(",")
 
     if args.file:
-        dois = read_full_csv_data(args.file)
+        dois = read_dois_from_csv(args.file)
+        per_doi_hosts = read_expected_hosts(args.file, header_rows=0)
         print(dois)
 
     if not resolving_host:
@@ -206,23 +309,74 @@ def main():
         except KeyError:
             pass
 
-    full_metadata = args.full_metadata
-
-    if resolving_host:
-        results = fetch_dois_data(dois=dois, resolving_host=resolving_host, full_metadata=full_metadata)
+    expected_hosts = ExpectedHosts(resolving_host or "", per_doi_hosts)
+    # the redirects backend always has every hop to write
+    full_metadata = args.full_metadata or args.backend == "redirects"
+
+    if args.backend == "handle" and full_metadata:
+        parser.error("--backend handle only checks where DOIs resolve to, it can't fetch metadata")
+    if args.backend != "crossref" and args.prefix:
+        parser.error("a prefix can only be checked with --backend crossref")
+    if args.sample and (args.prefix or not expected_hosts):
+        parser.error("--sample needs DOIs and a resolving host to estimate how many resolve to it")
+
+    def lookup(dois: list[str]) -> Iterator[DOIResult]:
+        results = iter_dois_data(
+            dois=dois,
+            resolving_host=expected_hosts,
+            full_metadata=full_metadata,
+            jobs=args.jobs,
+            use_async=args.use_async,
+            batch_size=args.batch_size,
+            fields=args.fields,
+            backend=args.backend,
+        )
+        return print_results(results)
+
+    if args.prefix:
+        results = print_results(
+            iter_prefix_data(
+                prefix=args.prefix,
+                resolving_host=resolving_host,
+                filters=args.filter,
+                full_metadata=full_metadata,
+                fields=args.fields,
+            )
+        )
+    elif args.sample:
+        # the sample's results are printed as they arrive, and the rest as the full run reaches them
+        results = iter_sampled_data(dois, lookup, args.sample, args.full_run, args.margin, args.confidence)
     else:
-        results = fetch_dois_data(dois=dois, resolving_host=resolving_host, full_metadata=full_metadata)
-
-    if args.write_to_csv:
-        output_dir = Path().resolve() / "complete"
+        results = lookup(dois)
+    output_dir = Path().resolve() / "complete"
 
-        if full_metadata:
+    # results are looked up as they are written, so errors from the API surface here
+    try:
+        if args.write_to_csv and expected_hosts and (full_metadata or args.backend != "crossref"):
+            # other backends only write the summary unless metadata is asked for, and handle checks have none
+            summary_filepath = write_results_to_csv(
+                expected_hosts, results, full_metadata=full_metadata, output_dir=output_dir
+            )
+            timings = job_stats.histograms_snapshot()
+            if timings:
+                write_timings_to_csv(timings, summary_filepath)
+        elif args.write_to_csv and full_metadata:
             write_full_metadata_to_csv(results, output_dir)
+        else:
+            for _ in results:
+                pass
+    except CircuitOpenError as err:
+        print(f"CrossRef API is unavailable, try again later: {err}")
+        sys.exit(1)
+    except ClientError as err:
+        # without --prefix there is no prefix to blame, so the error is left to surface as it is
+        if not args.prefix:
+            raise
+        print(f"Unable to check prefix {args.prefix}: {err}")
+        sys.exit(1)
 
-        if full_metadata and resolving_host:
-            write_resolving_host_summary_to_csv(resolving_host=resolving_host, results=results, output_dir=output_dir)
-
-    pprint.pp(results)
+    print(f"Job stats: {job_stats.snapshot()}")
+    print(f"Request timings: {job_stats.timing_summary()}")
 
 
 if __name__ == "__main__":
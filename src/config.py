@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 
@@ -37,8 +38,107 @@ class Config:
         "Content-type": "application/json",
         "User-Agent": f"dopi mailto:{EMAIL_ADDRESS}",
         "Mailto": EMAIL_ADDRESS,
+        "Accept-Encoding": "gzip, deflate",
     }
 
+    """ DOI fetching config """
+    # "crossref" to look DOIs up with the Crossref API, "handle" to only ask doi.org where each DOI resolves to,
+    # "redirects" to follow each DOI from doi.org to where it lands, or "auto" to look up each DOI's
+    # registration agency first and only send Crossref DOIs to the Crossref API
+    BACKEND: str = os.environ.get("BACKEND", "crossref")
+    # host of the Handle API used by the handle backend
+    HANDLE_HOST: str = os.environ.get("HANDLE_HOST", "doi.org")
+    # how the auto backend checks DOIs registered with other agencies, "handle", "redirects" or "skip"
+    OTHER_AGENCY_BACKEND: str = os.environ.get("OTHER_AGENCY_BACKEND", "handle")
+    # host of the doi.org endpoint that says which agency registered each DOI, and how many DOIs to ask about at once
+    AGENCY_HOST: str = os.environ.get("AGENCY_HOST", "doi.org")
+    AGENCY_BATCH_SIZE: int = int(os.environ.get("AGENCY_BATCH_SIZE", 50))
+    # DOIs of a prefix asked about at once after one doesn't exist, and how many may not exist before it is given up on
+    AGENCY_RETRY_DOIS: int = int(os.environ.get("AGENCY_RETRY_DOIS", 5))
+    AGENCY_MAX_MISSES: int = int(os.environ.get("AGENCY_MAX_MISSES", 10))
+    # where the redirects backend starts following each DOI from
+    RESOLVER_URL: str = os.environ.get("RESOLVER_URL", "https://doi.org")
+    # most redirects followed for one DOI before giving up
+    MAX_REDIRECTS: int = int(os.environ.get("MAX_REDIRECTS", 10))
+    # politeness limits for each landing host, the most requests in flight to it at once
+    # and the fewest seconds between starting requests to it
+    HOST_CONCURRENCY: int = int(os.environ.get("HOST_CONCURRENCY", 2))
+    HOST_INTERVAL: float = float(os.environ.get("HOST_INTERVAL", 0.2))
+    # landing hosts with keep-alive connections kept open, the least recently used are closed after this
+    MAX_HOST_POOLS: int = int(os.environ.get("MAX_HOST_POOLS", 100))
+    # sampling jobs check enough DOIs to estimate the success rate to within SAMPLE_MARGIN
+    # either way, as a fraction, with SAMPLE_CONFIDENCE confidence
+    SAMPLE_MARGIN: float = float(os.environ.get("SAMPLE_MARGIN", 0.02))
+    SAMPLE_CONFIDENCE: float = float(os.environ.get("SAMPLE_CONFIDENCE", 0.95))
+    # number of DOI requests in flight at once, 1 keeps requests sequential
+    JOBS: int = int(os.environ.get("JOBS", 1))
+    # use the asyncio engine, JOBS is then the number of connections
+    USE_ASYNC: bool = os.environ.get("USE_ASYNC", "False").lower() == "true"
+    # look up this many DOIs per request with the works filter, 0 or 1 looks each DOI up on its own
+    BATCH_SIZE: int = int(os.environ.get("BATCH_SIZE", 0))
+    # most results held in memory at once when results are streamed to the output files
+    STREAM_WINDOW: int = int(os.environ.get("STREAM_WINDOW", 1000))
+    # works per page when checking a whole prefix, 1000 is the most the API returns
+    PREFIX_ROWS: int = int(os.environ.get("PREFIX_ROWS", 1000))
+    # the only fields requested when full metadata isn't wanted, enough to check where a DOI resolves to
+    SUMMARY_FIELDS: list[str] = ["DOI", "resource"]
+
+    # keep-alive connections kept open between jobs by the queue worker
+    POOL_SIZE: int = int(os.environ.get("POOL_SIZE", max(JOBS, 10)))
+    PREWARM_CONNECTIONS: int = int(os.environ.get("PREWARM_CONNECTIONS", JOBS))
+    # seconds an idle connection is kept, servers tend to close them sooner than this
+    POOL_IDLE_TIMEOUT: float = float(os.environ.get("POOL_IDLE_TIMEOUT", 30))
+    # "1.1" or "2", HTTP/2 shares one connection between all requests and needs the h2 package
+    HTTP_VERSION: str = os.environ.get("HTTP_VERSION", "1.1")
+    # seconds resolved API addresses are reused before looking them up again
+    DNS_CACHE_TTL: float = float(os.environ.get("DNS_CACHE_TTL", 300))
+    # "live", "record" to also save every response to CASSETTE_FILE, or "replay" to answer requests from it offline
+    TRANSPORT_MODE: str = os.environ.get("TRANSPORT_MODE", "live")
+    # replay responses as slowly as they were recorded, False replays at full speed
+    REPLAY_LATENCY: bool = os.environ.get("REPLAY_LATENCY", "True").lower() == "true"
+    CASSETTE_FILE: str = os.environ.get("CASSETTE_FILE", "crossref_cassette.sqlite3")
+    CASSETTE_FILEPATH: Path = APP_DIR / CASSETTE_FILE
+
+    # requests per second until the API sends X-Rate-Limit headers, shared by all workers through RATE_LIMIT_FILE
+    RATE_LIMIT: float = float(os.environ.get("RATE_LIMIT", 10))
+
+    if RATE_LIMIT <= 0:
+        raise ValueError("RATE_LIMIT must be more than 0 requests per second")
+
+    # only runtime state, so kept in the temp directory where every worker on the machine shares it
+    RATE_LIMIT_FILE: str = os.environ.get("RATE_LIMIT_FILE", "crossref_rate_limit.bucket")
+    RATE_LIMIT_FILEPATH: Path = Path(tempfile.gettempdir()) / RATE_LIMIT_FILE
+
+    # longest backoff between retries, in seconds
+    MAX_RETRY_DELAY: float = float(os.environ.get("MAX_RETRY_DELAY", 30))
+    # retries allowed per job, a base amount plus a share of the requests made
+    RETRY_BUDGET_MIN: int = int(os.environ.get("RETRY_BUDGET_MIN", 10))
+    RETRY_BUDGET_RATIO: float = float(os.environ.get("RETRY_BUDGET_RATIO", 0.1))
+
+    # the circuit breaker opens once this share of the last CIRCUIT_WINDOW requests have failed,
+    # counting only after CIRCUIT_MIN_REQUESTS, and lets a probe request through after CIRCUIT_RESET_TIMEOUT seconds
+    CIRCUIT_FAILURE_RATE: float = float(os.environ.get("CIRCUIT_FAILURE_RATE", 0.5))
+    CIRCUIT_WINDOW: int = int(os.environ.get("CIRCUIT_WINDOW", 20))
+    CIRCUIT_MIN_REQUESTS: int = int(os.environ.get("CIRCUIT_MIN_REQUESTS", 10))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 30))
+    # times a queued file is left in the queue because the circuit breaker opened, before it is moved to failures
+    MAX_REQUEUES: int = int(os.environ.get("MAX_REQUEUES", 5))
+
+    # timeouts follow the response times seen, TIMEOUT_MULTIPLIER times the p99 but at least MIN_TIMEOUT seconds
+    ADAPTIVE_TIMEOUTS: bool = os.environ.get("ADAPTIVE_TIMEOUTS", "False").lower() == "true"
+    MIN_TIMEOUT: float = float(os.environ.get("MIN_TIMEOUT", 2))
+    TIMEOUT_MULTIPLIER: float = float(os.environ.get("TIMEOUT_MULTIPLIER", 3))
+    # response times kept per host
+    LATENCY_WINDOW: int = int(os.environ.get("LATENCY_WINDOW", 200))
+    # send a second copy of a GET that has waited longer than the HEDGE_PERCENTILE response time, first reply wins
+    HEDGE_REQUESTS: bool = os.environ.get("HEDGE_REQUESTS", "False").lower() == "true"
+    HEDGE_PERCENTILE: float = float(os.environ.get("HEDGE_PERCENTILE", 95))
+
+    # with JOBS above 1, adjust the requests in flight between 1 and JOBS as the API speeds up or slows down
+    AUTOTUNE: bool = os.environ.get("AUTOTUNE", "False").lower() == "true"
+    # back off once the median response time is this many times the lowest seen
+    AUTOTUNE_LATENCY_TOLERANCE: float = float(os.environ.get("AUTOTUNE_LATENCY_TOLERANCE", 2))
+
     LOCK_FILE: str = "doi_processing.lock"
     LOCK_FILEPATH: Path = APP_DIR / LOCK_FILE
 
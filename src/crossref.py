@@ -1,48 +1,583 @@
-from typing import Any
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+from urllib.parse import quote
 
-from http_client import Client
+from async_client import AsyncClient
+from autotuner import ConcurrencyController
+from cassette import get_cassette
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from config import Config
+from doi_result import DOIResult, Status, intern
+from host_matcher import Hosts, get_host_matcher
+from http_client import Client, ClientError, RetryBudget, get_pool
+from latency import get_latency_tracker
+from rate_limiter import RateLimiter, get_rate_limiter
 
 
 """ Functions for interacting with CrossRef API """
 
 
-def fetch_dois_data(dois: list[str], resolving_host: str = "", full_metadata: bool = True) -> list[dict[str, Any]]:
+def get_host_rate_limiter(host: str) -> RateLimiter | None:
+    """
+    Only the Crossref API sends the rate limit headers the rate limiter follows,
+    and replayed requests never reach it, so they aren't rate limited.
+    """
+    if host != Config.API_HOST or Config.TRANSPORT_MODE == "replay":
+        return None
+    return get_rate_limiter()
+
+
+def create_client(retry_budget: RetryBudget, host: str | None = None) -> Client:
+    """
+    Client for host, by default the Crossref API, using the process wide connection pool,
+    rate limiter, circuit breaker and latency tracker, with the job's retry budget.
+    """
+    host = host or Config.API_HOST
+    return Client(
+        host=host,
+        pool=get_pool(host),
+        rate_limiter=get_host_rate_limiter(host),
+        retry_budget=retry_budget,
+        circuit_breaker=get_circuit_breaker(host),
+        latency_tracker=get_latency_tracker(host) if Config.ADAPTIVE_TIMEOUTS else None,
+        hedge=Config.HEDGE_REQUESTS,
+    )
+
+
+def create_async_client(max_connections: int, host: str | None = None) -> AsyncClient:
+    """AsyncClient for host, by default the Crossref API, set up in the same way as create_client."""
+    host = host or Config.API_HOST
+    return AsyncClient(
+        max_connections=max(max_connections, 1),
+        host=host,
+        rate_limiter=get_host_rate_limiter(host),
+        retry_budget=RetryBudget(),
+        circuit_breaker=get_circuit_breaker(host),
+        latency_tracker=get_latency_tracker(host) if Config.ADAPTIVE_TIMEOUTS else None,
+        hedge=Config.HEDGE_REQUESTS,
+        cassette=get_cassette() if Config.TRANSPORT_MODE in ("record", "replay") else None,
+        replay=Config.TRANSPORT_MODE == "replay",
+        replay_latency=Config.REPLAY_LATENCY,
+    )
+
+
+def check_api_available(host: str | None = None) -> bool:
+    """
+    Send a single request through host's circuit breaker to see if it has recovered,
+    by default the Crossref API. Any other host is probed at its root.
+
+    Returns False without making a request if the breaker is still open.
+    """
+    host = host or Config.API_HOST
+    client = Client(
+        host=host,
+        max_retries=1,
+        pool=get_pool(host),
+        rate_limiter=get_host_rate_limiter(host),
+        circuit_breaker=get_circuit_breaker(host),
+    )
+    try:
+        with client:
+            response = client.request("/works?rows=0" if host == Config.API_HOST else "/")
+            if response is None:
+                return False
+            response.read()
+            return response.status < 500
+    except CircuitOpenError:
+        return False
+
+
+def fetch_dois_data(
+    dois: list[str],
+    resolving_host: Hosts = "",
+    full_metadata: bool = True,
+    jobs: int = 1,
+    use_async: bool = False,
+    batch_size: int = Config.BATCH_SIZE,
+    fields: list[str] | None = None,
+    backend: str = "",
+) -> list[DOIResult]:
     """
     Fetch metadata for a list of DOIs from the Crossref API.
+
+    Raises CircuitOpenError if the API is failing, rather than returning a result for every DOI.
+
+    If jobs is greater than 1, up to that many requests are made at once.
+    If use_async is set, the asyncio engine is used with jobs as its connection count.
+    If batch_size is greater than 1, DOIs are looked up that many at a time, see fetch_dois_data_batched.
+
+    If fields are given only those top level fields of each work are kept, and requested with select
+    when DOIs are looked up in batches. Without full_metadata, only Config.SUMMARY_FIELDS are kept
+    unless other fields are given.
+
+    If backend is "handle" only where each DOI resolves to is looked up, see iter_handle_data,
+    if it is "redirects" each DOI is followed to where it lands, see redirects.iter_redirect_data,
+    and if it is "auto" only Crossref DOIs are looked up with Crossref, see agencies.iter_routed_data.
+
+    An empty backend is Config.BACKEND, lookups made from here always name their backend
+    so they aren't sent to Config.BACKEND instead.
+
+    Every result is held in the returned list, use iter_dois_data to handle each as it is ready.
     """
-    results = []
+    backend = backend or Config.BACKEND
+    if backend != "crossref":
+        return list(
+            iter_dois_data(dois, resolving_host, full_metadata, jobs, use_async, batch_size, fields, backend=backend)
+        )
+
+    if fields is None and not full_metadata:
+        fields = Config.SUMMARY_FIELDS
+
+    if batch_size > 1:
+        return fetch_dois_data_batched(dois, resolving_host, full_metadata, jobs, use_async, batch_size, fields)
+
+    if use_async:
+        return asyncio.run(
+            fetch_dois_data_async(dois, resolving_host, full_metadata, max_connections=jobs, fields=fields)
+        )
+
+    return list(iter_dois_data(dois, resolving_host, full_metadata, jobs, fields=fields, backend="crossref"))
+
+
+def iter_dois_data(
+    dois: Iterable[str],
+    resolving_host: Hosts = "",
+    full_metadata: bool = True,
+    jobs: int = 1,
+    use_async: bool = False,
+    batch_size: int = Config.BATCH_SIZE,
+    fields: list[str] | None = None,
+    window: int = Config.STREAM_WINDOW,
+    backend: str = "",
+) -> Iterator[DOIResult]:
+    """
+    Yield the result for each DOI in order as soon as it is ready, takes the same options as fetch_dois_data.
+
+    At most window DOIs are looked up ahead of the result being yielded, so memory use
+    doesn't grow with the number of DOIs. The batched and asyncio engines work on a list
+    at a time, so they are given window DOIs at a time.
+    """
+    backend = backend or Config.BACKEND
+    if backend == "handle":
+        yield from iter_handle_data(dois, resolving_host, jobs, use_async, window)
+        return
+
+    if backend == "redirects":
+        # redirects imports this module, so can only be imported once it has loaded
+        from redirects import iter_redirect_data
+
+        yield from iter_redirect_data(dois, resolving_host, jobs, window)
+        return
+
+    if backend == "auto":
+        # agencies imports this module too
+        from agencies import iter_routed_data
+
+        yield from iter_routed_data(dois, resolving_host, full_metadata, jobs, use_async, batch_size, fields, window)
+        return
 
-    with Client() as client:
+    if fields is None and not full_metadata:
+        fields = Config.SUMMARY_FIELDS
+
+    if batch_size > 1 or use_async:
+        dois = iter(dois)
+        while chunk := list(itertools.islice(dois, window)):
+            # the backend is given, so a chunk is never routed again and sent back here
+            yield from fetch_dois_data(
+                chunk, resolving_host, full_metadata, jobs, use_async, batch_size, fields, backend="crossref"
+            )
+        return
+
+    def lookup(client: Client, doi: str) -> DOIResult:
+        return process_single_doi(client, doi, resolving_host, full_metadata, fields)
+
+    if jobs > 1:
+        yield from iter_dois_data_concurrently(dois, lookup, jobs, window)
+        return
+
+    with create_client(RetryBudget()) as client:
         for doi in dois:
-            result = process_single_doi(client, doi, resolving_host, full_metadata)
-            results.append(result)
-    return results
-
-
-def process_single_doi(client: Client, doi: str, resolving_host: str, full_metadata: bool) -> dict[str, Any]:
-    """Process a single DOI and return its result dictionary."""
-    # default failure template
-    result = {
-        "doi": doi,
-        "status": "FAILURE",
-        "resolving_url": "not_found",
-        "ERRORS": "",
-        "full_metadata": {"message": {}},
+            yield lookup(client, doi)
+
+
+def fetch_dois_data_batched(
+    dois: list[str],
+    resolving_host: Hosts,
+    full_metadata: bool,
+    jobs: int,
+    use_async: bool,
+    batch_size: int,
+    fields: list[str] | None = None,
+) -> list[DOIResult]:
+    """
+    Fetch DOIs batch_size at a time with the works filter, up to jobs batches at once.
+
+    DOIs a batch didn't return are looked up one by one with the usual engine,
+    so they get the same not found or failure results as without batching.
+    Results are in the same order and shape as from single lookups.
+    """
+    # a comma would split the DOI in two in the filter
+    batchable = list(dict.fromkeys(doi for doi in dois if doi and "," not in doi))
+    batches = [batchable[i : i + batch_size] for i in range(0, len(batchable), batch_size)]
+    retry_budget = RetryBudget()
+
+    def fetch(batch: list[str]) -> dict[str, dict]:
+        with create_client(retry_budget) as client:
+            return fetch_batch(client, batch, fields)
+
+    found: dict[str, dict] = {}
+    if jobs > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for batch_found in executor.map(fetch, batches):
+                found.update(batch_found)
+    else:
+        for batch in batches:
+            found.update(fetch(batch))
+
+    missing = [doi for doi in dois if doi.lower() not in found]
+    if missing:
+        print(f"{len(missing)} DOIs not returned by batch lookups, looking them up one by one")
+    singles = iter(
+        fetch_dois_data(
+            missing, resolving_host, full_metadata, jobs, use_async, batch_size=0, fields=fields, backend="crossref"
+        )
+    )
+
+    return [
+        build_doi_result(doi, found[doi.lower()], resolving_host, full_metadata)
+        if doi.lower() in found
+        else next(singles)
+        for doi in dois
+    ]
+
+
+def get_select_param(fields: list[str] | None) -> str:
+    """select query parameter for fields, empty if every field is wanted."""
+    if not fields:
+        return ""
+    # DOI is needed to match works to the DOIs asked for
+    return "&select=" + ",".join(dict.fromkeys(["DOI", *fields]))
+
+
+def get_works_url(dois: list[str], fields: list[str] | None = None) -> str:
+    """URL to look up dois with the works filter, selecting only fields if given."""
+    doi_filter = ",".join(f"doi:{quote(doi, safe='/')}" for doi in dois)
+    return f"/works?filter={doi_filter}&rows={len(dois)}" + get_select_param(fields)
+
+
+def wrap_work(response_dict: dict, item: dict) -> dict:
+    """Wrap a work from a list response in a response dict shaped like the one from /works/{doi}."""
+    return {
+        "status": response_dict.get("status", "ok"),
+        "message-type": "work",
+        "message-version": response_dict.get("message-version"),
+        "message": item,
     }
 
-    url_path = f"/works/{doi}"
-    response = client.request(url_path)
-    response_data = client.get_response_data(response)
 
-    if not response_data or ("Resource not found." in response_data):
-        result["ERRORS"] = response_data
-        return result
+def get_works_by_doi(response_dict: dict) -> dict[str, dict]:
+    """
+    Map the lower cased DOI of each work in a works filter response
+    to a response dict shaped like the one from /works/{doi}.
+    """
+    items = response_dict.get("message", {}).get("items", [])
+    return {item.get("DOI", "").lower(): wrap_work(response_dict, item) for item in items}
 
-    response_dict = client.get_json_dict_from_response(response_data)
 
-    if isinstance(response_dict, str):
-        result["ERRORS"] = response_dict
-        return result
+def get_work_url(doi: str) -> str:
+    """
+    URL of a single DOI. It is never looked up with the works filter, Crossref splits the filter
+    on a comma in a DOI even once it is encoded, so select is only used on list queries.
+    """
+    return f"/works/{quote(doi, safe='/')}"
+
+
+def select_fields(response_dict: dict, fields: list[str] | None) -> dict:
+    """Keep only fields and DOI of the work in a /works/{doi} response, as select would have."""
+    message = response_dict.get("message")
+    if not fields or not isinstance(message, dict):
+        return response_dict
+    wanted = {"DOI", *fields}
+    return {**response_dict, "message": {key: value for key, value in message.items() if key in wanted}}
+
+
+def fetch_batch(client: Client, dois: list[str], fields: list[str] | None = None) -> dict[str, dict]:
+    """
+    Look up dois in one request, returning the lower cased DOI of each work found
+    mapped to a response dict shaped like the one from /works/{doi}.
+
+    Returns an empty dict if the request fails, so every DOI gets looked up alone.
+    """
+    try:
+        response_dict = client.get_json(get_works_url(dois, fields))
+    except ClientError as err:
+        print(f"Batch lookup of {len(dois)} DOIs failed: {err}")
+        return {}
+    return get_works_by_doi(response_dict)
+
+
+def fetch_prefix_data(
+    prefix: str,
+    resolving_host: Hosts = "",
+    filters: str = "",
+    full_metadata: bool = False,
+    rows: int = Config.PREFIX_ROWS,
+    fields: list[str] | None = None,
+) -> list[DOIResult]:
+    """
+    Check every DOI registered under prefix, optionally narrowed with a works filter
+    such as "type:journal-article,from-pub-date:2020".
+
+    Works are fetched rows at a time using cursor deep paging and each page is checked as it arrives.
+    Fields are selected as in fetch_dois_data. Raises ClientError if a page can't be fetched,
+    as the rest of the works can't be reached without its cursor.
+    """
+    return list(iter_prefix_data(prefix, resolving_host, filters, full_metadata, rows, fields))
+
+
+def iter_prefix_data(
+    prefix: str,
+    resolving_host: Hosts = "",
+    filters: str = "",
+    full_metadata: bool = False,
+    rows: int = Config.PREFIX_ROWS,
+    fields: list[str] | None = None,
+) -> Iterator[DOIResult]:
+    """Yield the results of fetch_prefix_data a page at a time, so only one page is held in memory."""
+    if fields is None and not full_metadata:
+        fields = Config.SUMMARY_FIELDS
+
+    checked = 0
+    cursor = "*"
+
+    with create_client(RetryBudget()) as client:
+        while True:
+            response_dict = client.get_json(get_prefix_works_url(prefix, cursor, rows, filters, fields))
+            message = response_dict.get("message", {})
+            items = message.get("items", [])
+
+            for item in items:
+                doi = item.get("DOI", "")
+                yield build_doi_result(doi, wrap_work(response_dict, item), resolving_host, full_metadata)
+            checked += len(items)
+            print(f"Checked {checked} of {message.get('total-results', 0)} works under {prefix}")
+
+            # a short page is the last one, the API would only return an empty page after it
+            cursor = message.get("next-cursor")
+            if not cursor or len(items) < rows:
+                return
+
+
+def get_prefix_works_url(
+    prefix: str, cursor: str, rows: int, filters: str = "", fields: list[str] | None = None
+) -> str:
+    """URL of the page of works under prefix starting at cursor."""
+    url = f"/prefixes/{quote(prefix)}/works?cursor={quote(cursor, safe='')}&rows={rows}"
+    if filters:
+        url += f"&filter={quote(filters, safe=':,')}"
+    return url + get_select_param(fields)
+
+
+def iter_in_order(func: Callable[[str], DOIResult], dois: Iterable[str], jobs: int, window: int) -> Iterator[DOIResult]:
+    """
+    Yield func(doi) for each DOI in order, calling it from a pool of jobs worker threads.
+    No more than window DOIs are submitted ahead of the next result to be yielded.
+    """
+    pending: deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            for doi in dois:
+                pending.append(executor.submit(func, doi))
+                if len(pending) >= max(window, jobs):
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # if stopped early, by an error or the caller, the rest aren't waited for
+            for future in pending:
+                future.cancel()
+
+
+def iter_dois_data_concurrently(
+    dois: Iterable[str],
+    lookup: Callable[[Client, str], DOIResult],
+    jobs: int,
+    window: int = Config.STREAM_WINDOW,
+    host: str | None = None,
+) -> Iterator[DOIResult]:
+    """
+    Look DOIs up with lookup using a pool of worker threads, each making its requests to host.
+
+    Each worker holds its own Client so keeps its own keep-alive connection
+    leased from the pool, results are yielded in the same order as the given DOIs.
+    No more than window DOIs are submitted ahead of the next result to be yielded.
+
+    If Config.AUTOTUNE is set, jobs is the most requests made at once and a
+    ConcurrencyController decides how many of the workers may send at a time.
+    """
+    local = threading.local()
+    clients: list[Client] = []
+    lock = threading.Lock()
+    retry_budget = RetryBudget()
+    controller = None
+
+    if Config.AUTOTUNE:
+        # never more than the API says it allows in flight at once
+        rate_limiter = get_host_rate_limiter(host or Config.API_HOST)
+        concurrency_limit = rate_limiter.concurrency_limit if rate_limiter else 0
+        controller = ConcurrencyController(max_limit=min(jobs, concurrency_limit) if concurrency_limit else jobs)
+
+    def process_doi(doi: str) -> DOIResult:
+        if not hasattr(local, "client"):
+            local.client = create_client(retry_budget, host)
+            with lock:
+                clients.append(local.client)
+
+        if controller is None:
+            return lookup(local.client, doi)
+
+        controller.acquire()
+        started = time.monotonic()
+        try:
+            return lookup(local.client, doi)
+        finally:
+            controller.release(time.monotonic() - started, local.client.last_status)
+
+    try:
+        yield from iter_in_order(process_doi, dois, jobs, window)
+    finally:
+        for client in clients:
+            if client.conn:
+                client.close_connection()
+
+
+async def fetch_dois_data_async(
+    dois: list[str],
+    resolving_host: Hosts = "",
+    full_metadata: bool = True,
+    max_connections: int = 10,
+    fields: list[str] | None = None,
+) -> list[DOIResult]:
+    """
+    Fetch metadata for a list of DOIs on a single event loop.
+
+    Every DOI is requested at once and the AsyncClient shares them out
+    over max_connections keep-alive connections.
+    """
+    async with create_async_client(max_connections) as client:
+        tasks = [process_single_doi_async(client, doi, resolving_host, full_metadata, fields) for doi in dois]
+        return await asyncio.gather(*tasks)
+
+
+def process_single_doi(
+    client: Client, doi: str, resolving_host: Hosts, full_metadata: bool, fields: list[str] | None = None
+) -> DOIResult:
+    """Process a single DOI and return its result."""
+    try:
+        response_dict = select_fields(client.get_json(get_work_url(doi)), fields)
+    except ClientError as err:
+        return new_doi_result(doi, errors=str(err))
+    return build_doi_result(doi, response_dict, resolving_host, full_metadata)
+
+
+async def process_single_doi_async(
+    client: AsyncClient, doi: str, resolving_host: Hosts, full_metadata: bool, fields: list[str] | None = None
+) -> DOIResult:
+    """Async version of process_single_doi."""
+    try:
+        response_dict = select_fields(await client.get_json(get_work_url(doi)), fields)
+    except ClientError as err:
+        return new_doi_result(doi, errors=str(err))
+    return build_doi_result(doi, response_dict, resolving_host, full_metadata)
+
+
+def get_handle_url(doi: str) -> str:
+    """Handle API URL for only the URL value of a DOI's handle."""
+    return f"/api/handles/{quote(doi, safe='/')}?type=URL"
+
+
+def wrap_handle(response_dict: dict) -> dict:
+    """
+    Wrap a Handle API response in a response dict shaped like the one from /works/{doi},
+    holding only the DOI and the URL it resolves to.
+    """
+    message: dict = {"DOI": response_dict.get("handle", "")}
+    for value in response_dict.get("values", []):
+        if value.get("type") == "URL":
+            message["resource"] = {"primary": {"URL": value.get("data", {}).get("value", "")}}
+            break
+    return {"status": "ok", "message-type": "work", "message": message}
+
+
+def iter_handle_data(
+    dois: Iterable[str],
+    resolving_host: Hosts = "",
+    jobs: int = 1,
+    use_async: bool = False,
+    window: int = Config.STREAM_WINDOW,
+) -> Iterator[DOIResult]:
+    """
+    Yield where each DOI resolves to, looked up with the doi.org Handle API instead of the Crossref API.
+
+    A Handle API response holds little more than the URL, so each check downloads a fraction
+    of the bytes, and DOIs from any registration agency can be checked. There is no metadata,
+    so results never have full_metadata. jobs, use_async and window are as for iter_dois_data.
+    """
+    if use_async:
+        dois = iter(dois)
+        while chunk := list(itertools.islice(dois, window)):
+            yield from asyncio.run(fetch_handle_data_async(chunk, resolving_host, max_connections=jobs))
+        return
+
+    def lookup(client: Client, doi: str) -> DOIResult:
+        return process_single_handle(client, doi, resolving_host)
+
+    if jobs > 1:
+        yield from iter_dois_data_concurrently(dois, lookup, jobs, window, host=Config.HANDLE_HOST)
+        return
+
+    with create_client(RetryBudget(), Config.HANDLE_HOST) as client:
+        for doi in dois:
+            yield lookup(client, doi)
+
+
+async def fetch_handle_data_async(dois: list[str], resolving_host: Hosts, max_connections: int) -> list[DOIResult]:
+    """Look up where each DOI resolves to with the Handle API on a single event loop."""
+    async with create_async_client(max_connections, Config.HANDLE_HOST) as client:
+        return await asyncio.gather(*(process_single_handle_async(client, doi, resolving_host) for doi in dois))
+
+
+def process_single_handle(client: Client, doi: str, resolving_host: Hosts) -> DOIResult:
+    """Look up where a single DOI resolves to with the Handle API and return its result."""
+    try:
+        response_dict = client.get_json(get_handle_url(doi))
+    except ClientError as err:
+        return new_doi_result(doi, errors=str(err))
+    return build_doi_result(doi, wrap_handle(response_dict), resolving_host, full_metadata=False)
+
+
+async def process_single_handle_async(client: AsyncClient, doi: str, resolving_host: Hosts) -> DOIResult:
+    """Async version of process_single_handle."""
+    try:
+        response_dict = await client.get_json(get_handle_url(doi))
+    except ClientError as err:
+        return new_doi_result(doi, errors=str(err))
+    return build_doi_result(doi, wrap_handle(response_dict), resolving_host, full_metadata=False)
+
+
+def new_doi_result(doi: str, errors: str = "") -> DOIResult:
+    """Default failure template for a DOI result, the same errors are shared between results."""
+    return DOIResult(doi, errors=intern(errors))
+
+
+def build_doi_result(doi: str, response_dict: dict, resolving_host: Hosts, full_metadata: bool) -> DOIResult:
+    """Build the result for a DOI from its parsed metadata."""
+    result = new_doi_result(doi)
 
     print(f"Received data for DOI {doi}")
 
@@ -50,7 +585,7 @@ def process_single_doi(client: Client, doi: str, resolving_host: str, full_metad
         result = validate_resolving_url(doi, response_dict, resolving_host, result)
 
     if full_metadata:
-        result["full_metadata"] = response_dict
+        result.full_metadata = response_dict
 
     return result
 
@@ -64,21 +599,23 @@ def get_resolving_url_for_doi(response_dict: dict) -> str:
         return ""
 
 
-def validate_resolving_url(doi: str, response_dict: dict, resolving_host: str, result: dict) -> dict:
-    """Validate if DOI resolves to the expected host."""
+def validate_resolving_url(doi: str, response_dict: dict, resolving_host: Hosts, result: DOIResult) -> DOIResult:
+    """Validate if DOI resolves to one of its expected hosts, or a subdomain of one."""
     resolving_url = get_resolving_url_for_doi(response_dict)
 
     if not resolving_url:
-        result["ERRORS"] = "Unable to find resolving URL in metadata"
+        result.errors = "Unable to find resolving URL in metadata"
         return result
 
     print(f"{doi} resolves to {resolving_url}")
 
-    if resolving_host in resolving_url:
-        print(f"{resolving_host} in {resolving_url}, {doi} resolves as expected")
-        result.update({"status": "SUCCESS", "resolving_url": resolving_url, "ERRORS": ""})
+    result.resolving_url = resolving_url
+    hosts = get_host_matcher(resolving_host, doi)
+    if hosts.matches(resolving_url):
+        print(f"{hosts} in {resolving_url}, {doi} resolves as expected")
+        result.status, result.errors = Status.SUCCESS, ""
     else:
-        err_msg = f"{resolving_host} NOT in {resolving_url}, {doi} does not resolve correctly"
+        err_msg = f"{hosts} NOT in {resolving_url}, {doi} does not resolve correctly"
         print(err_msg)
-        result.update({"status": "FAILURE", "resolving_url": resolving_url, "ERRORS": err_msg})
+        result.status, result.errors = Status.FAILURE, err_msg
     return result
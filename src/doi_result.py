@@ -0,0 +1,86 @@
+from enum import StrEnum
+from functools import lru_cache
+
+
+""" The record kept for each DOI checked """
+
+
+class Status(StrEnum):
+    SUCCESS = "SUCCESS"
+    FAILURE = "FAILURE"
+
+
+NOT_FOUND = "not_found"
+
+# summary csv columns, ERRORS keeps the name it has always had in the output
+SUMMARY_COLUMNS = ("doi", "status", "resolving_url", "ERRORS")
+
+# the most distinct strings intern will share, messages naming a DOI are never repeated
+MAX_INTERNED = 10_000
+
+
+@lru_cache(maxsize=MAX_INTERNED)
+def intern(value: str) -> str:
+    """
+    Return the shared copy of value, so error messages repeated across a job are held once.
+
+    Unlike sys.intern the table is bounded, the least recently used strings are dropped once it is full,
+    so one-off messages don't keep the repeated ones out.
+    """
+    return value
+
+
+class DOIResult:
+    """
+    Outcome of checking one DOI.
+
+    Slotted, as a job can hold a great many of these at once. full_metadata is None
+    until the work's metadata is kept. Can still be read like the dicts results used to be,
+    result["ERRORS"] is result.errors.
+    """
+
+    __slots__ = ("doi", "status", "resolving_url", "errors", "full_metadata")
+
+    def __init__(
+        self,
+        doi: str,
+        status: Status = Status.FAILURE,
+        resolving_url: str = NOT_FOUND,
+        errors: str = "",
+        full_metadata: dict | None = None,
+    ) -> None:
+        self.doi = doi
+        self.status = status
+        self.resolving_url = resolving_url
+        self.errors = errors
+        self.full_metadata = full_metadata
+
+    def summary_row(self) -> tuple[str, str, str, str]:
+        """Values for SUMMARY_COLUMNS."""
+        return self.doi, self.status, self.resolving_url, self.errors
+
+    def as_dict(self) -> dict:
+        return {
+            "doi": self.doi,
+            "status": str(self.status),
+            "resolving_url": self.resolving_url,
+            "ERRORS": self.errors,
+            "full_metadata": self.full_metadata if self.full_metadata is not None else {"message": {}},
+        }
+
+    def __getitem__(self, key: str):
+        if key == "ERRORS":
+            return self.errors
+        if key == "full_metadata":
+            return self.as_dict()["full_metadata"]
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, DOIResult):
+            return self.as_dict() == other.as_dict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"DOIResult({self.doi!r}, {self.status.value}, {self.resolving_url!r}, errors={self.errors!r})"
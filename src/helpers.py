@@ -1,10 +1,14 @@
 import csv
+import itertools
 import os
 import re
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Tuple
+
+from doi_result import SUMMARY_COLUMNS, DOIResult
+from host_matcher import Hosts, split_hosts
 
 
 def generate_csrf_token():
@@ -64,17 +68,60 @@ def read_full_csv_data(path_to_csv: str | os.PathLike) -> Tuple[str, str, list]:
     hello@email.com
     hostsite-dois-should-resolve-to
     doi
-    doi
+    doi,optional-host-for-this-doi
     >>> email, resolving_host, dois = read_csv_data(filepath)
     """
     with open(path_to_csv, "r", encoding="utf-8") as file:
         reader = csv.reader(file)
         email = next(reader)[0]
-        host = next(reader)[0]
+        # several hosts can be given, in one column or across the row
+        host = ", ".join(split_hosts(" ".join(next(reader))))
         dois = [row[0] for row in reader]
     return email, host, dois
 
 
+def read_expected_hosts(path_to_csv: str | os.PathLike, header_rows: int = 2) -> dict[str, str]:
+    """
+    Hosts given for a DOI in the columns after it, for DOIs expected somewhere other than
+    the job's resolving host. DOI rows start after header_rows rows:
+
+    10.1234/abc,example.com,example.org
+    >>> hosts = read_expected_hosts(filepath)
+    """
+    with open(path_to_csv, "r", encoding="utf-8") as file:
+        rows = itertools.islice(csv.reader(file), header_rows, None)
+        return {
+            row[0]: ", ".join(split_hosts(" ".join(row[1:])))
+            for row in rows
+            if len(row) > 1 and "".join(row[1:]).strip()
+        }
+
+
+def read_csv_options(path_to_csv: str | os.PathLike) -> dict[str, str]:
+    """
+    Options for a queued job are written as key=value columns after the email:
+
+    hello@email.com,prefix=10.1234,filter=type:journal-article
+    >>> options = read_csv_options(filepath)
+    """
+    with open(path_to_csv, "r", encoding="utf-8") as file:
+        first_row = next(csv.reader(file), [])
+    return dict(option.split("=", 1) for option in first_row[1:] if "=" in option)
+
+
+def update_csv_options(path_to_csv: str | os.PathLike, options: dict[str, str]) -> None:
+    """Replace the options of a queued job, leaving the rest of its csv as it is."""
+    with open(path_to_csv, "r", encoding="utf-8", newline="") as file:
+        rows = list(csv.reader(file))
+
+    rows[0] = [rows[0][0], *(f"{key}={value}" for key, value in options.items() if value)]
+    temp_path = f"{path_to_csv}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="") as file:
+        csv.writer(file).writerows(rows)
+    # replaced in one step, so the queue never sees a half written file
+    os.replace(temp_path, path_to_csv)
+
+
 def read_dois_from_csv(path_to_csv: str | os.PathLike) -> list:
     """
     CSV should contain dois in first column and nothing else
@@ -89,18 +136,40 @@ def read_dois_from_csv(path_to_csv: str | os.PathLike) -> list:
 """ Functions for writing to csv files """
 
 
-def add_csv_to_queue(queue_dir: Path, resolver_host: str, email: str, dois: list) -> Path:
-    output_filename = create_log_filename(f"checks_to_{resolver_host}")
+def split_doi_hosts(lines: list[str]) -> tuple[list[str], dict[str, str]]:
+    """
+    DOIs from lines that can each give hosts for their DOI after a space,
+    and the hosts given, for example "10.1234/abc example.com,example.org"
+    """
+    dois, hosts = [], {}
+    for line in lines:
+        doi, _, doi_hosts = line.strip().partition(" ")
+        dois.append(doi)
+        if doi_hosts.strip():
+            hosts[doi] = ", ".join(split_hosts(doi_hosts))
+    return dois, hosts
+
+
+def get_hosts_label(hosts: str) -> str:
+    """Hosts as they go in a filename, "example.com, example.org" becomes example.com_example.org"""
+    return re.sub(r"[^\w.-]+", "_", str(hosts)).strip("_") or "listed_hosts"
+
+
+def add_csv_to_queue(
+    queue_dir: Path, resolver_host: str, email: str, dois: list, options: dict = {}, hosts: dict = {}
+) -> Path:
+    """Queue a job, hosts has the expected hosts of any DOIs that don't go to resolver_host."""
+    output_filename = create_log_filename(f"checks_to_{get_hosts_label(resolver_host)}")
     output_path = queue_dir / output_filename
 
     with open(output_path, mode="w", newline="") as file:
         writer = csv.writer(file)
 
-        writer.writerow([email])
+        writer.writerow([email, *(f"{key}={value}" for key, value in options.items() if value)])
         writer.writerow([resolver_host])
 
         for doi in dois:
-            writer.writerow([doi])
+            writer.writerow([doi, hosts[doi]] if hosts.get(doi) else [doi])
     return output_path
 
 
@@ -116,41 +185,149 @@ def create_log_filename(file_str: str, ext=".csv") -> str:
     return filename
 
 
-def write_resolving_host_summary_to_csv(
-    resolving_host, results: list, output_dir: Path = Path("output"), directories: dict = {}
-) -> Path:
-    for res in results:
-        res.pop("full_metadata", None)
+# bytes buffered before rows are written out, so a long job's output is never all held in memory
+WRITE_BUFFER_SIZE = 64 * 1024
 
-    summary_filename = create_log_filename(f"dois_to_{resolving_host}_results")
 
+def get_output_filepath(filename: str, output_dir: Path, directories: dict) -> Path:
     if directories != {}:
-        summary_filepath = directories["COMPLETE_DIR"] / summary_filename
-    else:
-        summary_filepath = output_dir / summary_filename
+        return directories["COMPLETE_DIR"] / filename
+    return output_dir / filename
+
 
-    with open(summary_filepath, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=results[0].keys())
-        writer.writeheader()
-        for row in results:
-            writer.writerow(row)
-    return summary_filepath
+class SummaryCSVWriter:
+    """Writes a row per result, without its full metadata, as each result arrives."""
 
+    def __init__(self, filepath: Path) -> None:
+        self.filepath = filepath
+        self.file = open(filepath, mode="w", newline="", buffering=WRITE_BUFFER_SIZE)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(SUMMARY_COLUMNS)
 
-def write_full_metadata_to_csv(results: list, output_dir: Path = Path("output"), directories: dict = {}) -> None:
+    def write(self, result: DOIResult) -> None:
+        self.writer.writerow(result.summary_row())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class FullMetadataCSVWriter:
+    """
+    Writes a row per result with the work's metadata as each result arrives,
+    results without metadata are skipped. The columns are taken from the first work written,
+    and a later work with fields that aren't among them raises ValueError rather than losing them.
+    """
+
+    def __init__(self, filepath: Path) -> None:
+        self.filepath = filepath
+        self.file = open(filepath, mode="w", newline="", buffering=WRITE_BUFFER_SIZE)
+        self.writer: csv.DictWriter | None = None
+        self.columns: set[str] = set()
+
+    def write(self, result: DOIResult) -> None:
+        if not result.full_metadata or not result.full_metadata.get("message"):
+            return
+        row = result.full_metadata["message"]
+
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(row))
+            self.writer.writeheader()
+            self.columns = set(row)
+
+        extra = [field for field in row if field not in self.columns]
+        if extra:
+            raise ValueError(f"{result.doi} has fields not in the full metadata csv columns: {', '.join(extra)}")
+        self.writer.writerow(row)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def write_results_to_csv(
+    resolving_host: Hosts,
+    results: Iterable[DOIResult],
+    full_metadata: bool = False,
+    output_dir: Path = Path("output"),
+    directories: dict = {},
+    name: str = "results",
+) -> Path:
+    """
+    Write the summary csv, and the full metadata csv if full_metadata is set, in one pass over results.
+    name goes in the filenames, to tell a sample's results from a whole job's.
+
+    Each result is written as soon as it is read, so results can be streamed from iter_dois_data
+    without being held in memory. Returns the summary csv filepath.
+    """
+    summary_filename = create_log_filename(f"dois_to_{get_hosts_label(resolving_host)}_{name}")
+    writers: list[SummaryCSVWriter | FullMetadataCSVWriter] = [
+        SummaryCSVWriter(get_output_filepath(summary_filename, output_dir, directories))
+    ]
+    try:
+        if full_metadata:
+            full_meta_filename = create_log_filename(f"full_metadata_{name}")
+            writers.append(FullMetadataCSVWriter(get_output_filepath(full_meta_filename, output_dir, directories)))
+
+        for result in results:
+            for writer in writers:
+                writer.write(result)
+    except BaseException:
+        # a job that stops part way is run again, so don't leave its partial results behind
+        for writer in writers:
+            writer.close()
+            writer.filepath.unlink(missing_ok=True)
+        raise
+
+    for writer in writers:
+        writer.close()
+    return writers[0].filepath
+
+
+def write_resolving_host_summary_to_csv(
+    resolving_host, results: Iterable[DOIResult], output_dir: Path = Path("output"), directories: dict = {}
+) -> Path:
+    return write_results_to_csv(resolving_host, results, output_dir=output_dir, directories=directories)
+
+
+def write_full_metadata_to_csv(
+    results: Iterable[DOIResult], output_dir: Path = Path("output"), directories: dict = {}
+) -> None:
     full_meta_filename = create_log_filename("full_metadata_results")
+    writer = FullMetadataCSVWriter(get_output_filepath(full_meta_filename, output_dir, directories))
 
-    if directories != {}:
-        full_meta_filepath = directories["COMPLETE_DIR"] / full_meta_filename
-    else:
-        full_meta_filepath = output_dir / full_meta_filename
+    try:
+        for result in results:
+            writer.write(result)
+    finally:
+        writer.close()
 
-    with open(full_meta_filepath, mode="w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=results[0]["full_metadata"]["message"].keys())
-        writer.writeheader()
 
-        for index in range(len(results)):
-            row = results[index]["full_metadata"]["message"]
+def is_timings_file(filepath: Path) -> bool:
+    """Timings files sit next to the results they are for, but aren't results themselves."""
+    return filepath.name.endswith("_timings.csv")
 
-            if row != {}:
-                writer.writerow(row)
+
+def write_timings_to_csv(histograms: dict, results_filepath: Path) -> Path:
+    """
+    Write a row per request phase with its summary and histogram bucket counts,
+    next to the results file and named after it.
+
+    histograms is the output of Stats.histograms_snapshot, and must not be empty.
+    """
+    timings_filepath = results_filepath.with_name(f"{results_filepath.stem}_timings.csv")
+    phase_order = ["dns", "connect", "tls", "ttfb", "body"]
+    phases = sorted(histograms, key=lambda name: phase_order.index(name) if name in phase_order else len(phase_order))
+
+    with open(timings_filepath, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        buckets = next(iter(histograms.values())).buckets
+        writer.writerow(["phase", "count", "mean", "p50", "p90", "p99", "max"] + [f"le_{bound:g}" for bound in buckets])
+
+        for phase in phases:
+            histogram = histograms[phase]
+            summary = histogram.summary()
+            writer.writerow(
+                [phase, summary["count"]]
+                + [round(summary[key], 6) for key in ("mean", "p50", "p90", "p99", "max")]
+                + histogram.counts
+            )
+    return timings_filepath
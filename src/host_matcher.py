@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import urlsplit
+
+
+""" Check which host a URL is on against the hosts it is expected to be on """
+
+
+HOST_SEPARATOR = re.compile(r"[,\s]+")
+
+
+def split_hosts(hosts: str) -> list[str]:
+    """Hosts from a comma or whitespace separated list."""
+    return [host for host in HOST_SEPARATOR.split(hosts) if host]
+
+
+def parse_host(host: str) -> tuple[str, int | None, str]:
+    """
+    Lower cased hostname, port if one is given, and path prefix without its trailing slash,
+    from a host that may have been entered with a scheme, such as https://www.example.com/journals/.
+    """
+    host = host.strip()
+    parts = urlsplit(host if "//" in host else f"//{host}")
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    return (parts.hostname or "").rstrip("."), port, parts.path.rstrip("/")
+
+
+def has_path_prefix(path: str, prefix: str) -> bool:
+    """True if path is prefix or below it, so /journals matches /journals/a but not /journalsx."""
+    return not prefix or path == prefix or path.startswith(prefix + "/")
+
+
+class HostMatcher:
+    """
+    Matches URLs on any of hosts or their subdomains, so example.com matches www.example.com
+    but not notexample.com. A port is only compared if the expected host has one, and a path
+    only if it has one, so example.com/journals matches example.com/journals/a but not example.com/books.
+
+    Hosts are kept in a dict by hostname, and a URL is matched by looking up each suffix of its
+    hostname in turn, so matching doesn't slow down with the number of hosts.
+    """
+
+    def __init__(self, hosts: Iterable[str]) -> None:
+        self.hosts: tuple[str, ...] = tuple(dict.fromkeys(host.strip() for host in hosts if host.strip()))
+        self.rules: dict[str, set[tuple[int | None, str]]] = {}
+        for host in self.hosts:
+            hostname, port, path = parse_host(host)
+            if hostname:
+                self.rules.setdefault(hostname, set()).add((port, path))
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def __str__(self) -> str:
+        return ", ".join(self.hosts)
+
+    def matches(self, url: str) -> bool:
+        parts = urlsplit(url)
+        hostname = (parts.hostname or "").rstrip(".")
+        try:
+            port = parts.port
+        except ValueError:
+            return False
+
+        labels = hostname.split(".")
+        for start in range(len(labels)):
+            for expected_port, prefix in self.rules.get(".".join(labels[start:]), ()):
+                if expected_port in (None, port) and has_path_prefix(parts.path, prefix):
+                    return True
+        return False
+
+
+@lru_cache(maxsize=256)
+def compile_hosts(hosts: str) -> HostMatcher:
+    """HostMatcher for a comma or whitespace separated list of hosts, compiled once per list."""
+    return HostMatcher(split_hosts(hosts))
+
+
+class ExpectedHosts:
+    """
+    Hosts each DOI is expected to resolve to. DOIs listed in per_doi must be on one of
+    their own hosts, any other DOI on one of the default hosts.
+    """
+
+    def __init__(self, default: str = "", per_doi: dict[str, str] | None = None) -> None:
+        self.default = default
+        self.per_doi = {doi.strip().lower(): hosts for doi, hosts in (per_doi or {}).items()}
+
+    def __bool__(self) -> bool:
+        return bool(self.default or self.per_doi)
+
+    def __str__(self) -> str:
+        return self.default
+
+    def for_doi(self, doi: str) -> HostMatcher:
+        return compile_hosts(self.per_doi.get(doi.strip().lower()) or self.default)
+
+
+Hosts = str | HostMatcher | ExpectedHosts
+
+
+def get_host_matcher(expected: Hosts, doi: str) -> HostMatcher:
+    """The HostMatcher doi is checked with, from a job's expected hosts."""
+    if isinstance(expected, str):
+        return compile_hosts(expected)
+    if isinstance(expected, ExpectedHosts):
+        return expected.for_doi(doi)
+    return expected
@@ -0,0 +1,338 @@
+import selectors
+import socket
+import ssl
+import threading
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+except ImportError as err:
+    raise ImportError("HTTP/2 needs the h2 package, install it with: pip install -e .[http2]") from err
+
+from http_client import BufferedResponse, dns_cache
+from stats import job_stats
+
+
+""" HTTP/2 transport for http_client.Client, many requests share one multiplexed connection """
+
+
+# headers that are not allowed in HTTP/2 requests
+CONNECTION_HEADERS = {"connection", "host", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+
+class StreamState:
+    def __init__(self) -> None:
+        self.status = 0
+        self.headers: list[tuple[str, str]] = []
+        self.body: list[bytes] = []
+        self.done = threading.Event()
+        self.error: Exception | None = None
+
+
+class Http2Connection:
+    """
+    One TCP and TLS connection carrying many concurrent streams.
+
+    An SSL socket can't be used from several threads at once, so a background thread does all the
+    reading and writing. Calling threads only queue frames on the h2 connection under the lock and
+    wake it to send them, and it hands the frames it reads to the stream they belong to.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float, context: ssl.SSLContext | None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.scheme = "https" if context else "http"
+
+        sock = dns_cache.create_connection(host, port, timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if context:
+            try:
+                sock = context.wrap_socket(sock, server_hostname=host)
+            except BaseException:
+                sock.close()
+                raise
+            if sock.selected_alpn_protocol() != "h2":
+                sock.close()
+                raise ConnectionError(f"{host} did not agree to use HTTP/2")
+
+        sock.setblocking(False)
+        self.sock = sock
+        # written to by calling threads to wake the I/O thread when they have queued frames
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+
+        self.h2 = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=True, header_encoding=None))
+        self.lock = threading.Condition()
+        self.streams: dict[int, StreamState] = {}
+        self.closed = False
+        self.closing = False
+
+        with self.lock:
+            self.h2.initiate_connection()
+        job_stats.incr("http2_connections")
+
+        self.io_thread = threading.Thread(target=self._run, daemon=True)
+        self.io_thread.start()
+
+    def _wake(self) -> None:
+        try:
+            self.wake_writer.send(b"\0")
+        except OSError:
+            # already due to wake up, or closed
+            pass
+
+    def send_request(self, method: str, url: str, headers: dict) -> int:
+        request_headers = [
+            (":method", method),
+            (":scheme", self.scheme),
+            (":authority", self.host),
+            (":path", url),
+        ]
+        request_headers += [
+            (name.lower(), str(value)) for name, value in headers.items() if name.lower() not in CONNECTION_HEADERS
+        ]
+
+        with self.lock:
+            # wait for a free stream if the server limits how many can be open at once
+            while not self.closed and self.h2.open_outbound_streams >= self.h2.remote_settings.max_concurrent_streams:
+                if not self.lock.wait(self.timeout):
+                    raise socket.timeout("timed out waiting for a free HTTP/2 stream")
+
+            if self.closed or self.closing:
+                raise ConnectionResetError("HTTP/2 connection closed")
+
+            stream_id = self.h2.get_next_available_stream_id()
+            self.streams[stream_id] = StreamState()
+            self.h2.send_headers(stream_id, request_headers, end_stream=True)
+        self._wake()
+        job_stats.incr("http2_streams")
+        return stream_id
+
+    def get_response(self, stream_id: int, timeout: float | None = None) -> BufferedResponse:
+        """Wait up to timeout, by default the connection's, for the whole response on stream_id."""
+        stream = self.streams[stream_id]
+
+        if not stream.done.wait(timeout or self.timeout):
+            self.reset_stream(stream_id)
+            raise socket.timeout(f"timed out waiting for HTTP/2 stream {stream_id}")
+
+        with self.lock:
+            self.streams.pop(stream_id, None)
+            self.lock.notify_all()
+
+        if stream.error:
+            raise stream.error
+        return BufferedResponse(stream.status, "", stream.headers, b"".join(stream.body))
+
+    def reset_stream(self, stream_id: int) -> None:
+        with self.lock:
+            self.streams.pop(stream_id, None)
+            if self.closed:
+                return
+            try:
+                self.h2.reset_stream(stream_id)
+            except h2.exceptions.H2Error:
+                return
+        self._wake()
+
+    def _run(self) -> None:
+        """Send queued frames and read incoming ones until the connection is closed by either side."""
+        error: Exception = ConnectionResetError("HTTP/2 connection closed by server")
+        selector = selectors.DefaultSelector()
+        selector.register(self.wake_reader, selectors.EVENT_READ)
+        selector.register(self.sock, selectors.EVENT_READ)
+        outbound = b""
+        try:
+            while True:
+                with self.lock:
+                    outbound += self.h2.data_to_send()
+                    closing = self.closing
+                if closing and not outbound:
+                    break
+
+                selector.modify(self.sock, selectors.EVENT_READ | (selectors.EVENT_WRITE if outbound else 0))
+                for key, _ in selector.select():
+                    if key.fileobj is self.wake_reader:
+                        while self._drain_wakes():
+                            pass
+
+                if outbound:
+                    try:
+                        outbound = outbound[self.sock.send(outbound) :]
+                    except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                        pass
+
+                if self._receive():
+                    break
+        except (OSError, h2.exceptions.ProtocolError) as err:
+            if not self.closing:
+                error = ConnectionResetError(f"HTTP/2 connection failed: {err}")
+        finally:
+            selector.close()
+            self._fail_streams(error)
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.wake_reader.close()
+            self.wake_writer.close()
+
+    def _drain_wakes(self) -> bool:
+        try:
+            return bool(self.wake_reader.recv(4096))
+        except BlockingIOError:
+            return False
+
+    def _receive(self) -> bool:
+        """Read everything available, returns True once the server has ended the connection."""
+        while True:
+            try:
+                data = self.sock.recv(65535)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError, BlockingIOError):
+                return False
+            if not data:
+                return True
+
+            with self.lock:
+                terminated = self._handle_events(self.h2.receive_data(data))
+                self.lock.notify_all()
+            if terminated:
+                return True
+
+    def _handle_events(self, events: list) -> bool:
+        """Apply frames to their streams, returns True once the server has ended the connection."""
+        for event in events:
+            stream = self.streams.get(getattr(event, "stream_id", 0))
+
+            if isinstance(event, h2.events.ResponseReceived) and stream:
+                for name, value in event.headers:
+                    if name == b":status":
+                        stream.status = int(value)
+                    else:
+                        stream.headers.append((name.decode("latin-1"), value.decode("latin-1")))
+
+            elif isinstance(event, h2.events.DataReceived):
+                if stream:
+                    stream.body.append(event.data)
+                # open up the flow control window again
+                self.h2.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+
+            elif isinstance(event, h2.events.StreamEnded) and stream:
+                stream.done.set()
+
+            elif isinstance(event, h2.events.StreamReset) and stream:
+                stream.error = ConnectionResetError(f"HTTP/2 stream {event.stream_id} reset by server")
+                stream.done.set()
+
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                return True
+        return False
+
+    def _fail_streams(self, error: Exception) -> None:
+        with self.lock:
+            self.closed = True
+            for stream in self.streams.values():
+                if not stream.done.is_set():
+                    stream.error = error
+                    stream.done.set()
+            self.lock.notify_all()
+
+    def close(self) -> None:
+        """Send GOAWAY and wait for the I/O thread to flush it and close the socket."""
+        with self.lock:
+            if not self.closed and not self.closing:
+                try:
+                    self.h2.close_connection()
+                except h2.exceptions.H2Error:
+                    pass
+            self.closing = True
+        self._wake()
+        if threading.current_thread() is not self.io_thread:
+            self.io_thread.join(self.timeout)
+
+
+class Http2Stream:
+    """
+    Stands in for an HTTPSConnection leased to a Client,
+    each request it makes is a new stream on the shared connection.
+    """
+
+    def __init__(self, transport: "Http2Transport"):
+        self.transport = transport
+        # set by Client before each request, how long to wait for the response
+        self.timeout = transport.timeout
+        self.connection: Http2Connection | None = None
+        self.stream_id: int | None = None
+
+    def request(self, method: str, url: str, headers: dict = {}) -> None:
+        self.connection = self.transport.get_connection()
+        self.stream_id = self.connection.send_request(method, url, headers)
+
+    def getresponse(self) -> BufferedResponse:
+        if self.connection is None or self.stream_id is None:
+            raise ConnectionError("getresponse called before request")
+        stream_id, self.stream_id = self.stream_id, None
+        return self.connection.get_response(stream_id, self.timeout)
+
+    def close(self) -> None:
+        if self.connection and self.stream_id is not None:
+            self.connection.reset_stream(self.stream_id)
+        self.stream_id = None
+
+
+class Http2Transport:
+    """
+    HTTP/2 alternative to http_client.ConnectionPool.
+
+    Every Client leasing from it shares one multiplexed connection,
+    which is replaced if the server closes it.
+    """
+
+    reuses_connections = False
+
+    def __init__(self, host: str, port: int = 443, timeout: float = 30, use_tls: bool = True):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.context: ssl.SSLContext | None = None
+        if use_tls:
+            self.context = ssl.create_default_context()
+            self.context.set_alpn_protocols(["h2"])
+        self.connection: Http2Connection | None = None
+        self.lock = threading.Lock()
+
+    def get_connection(self) -> Http2Connection:
+        with self.lock:
+            if self.connection is None or self.connection.closed:
+                self.connection = Http2Connection(self.host, self.port, self.timeout, self.context)
+            return self.connection
+
+    def lease(self) -> Http2Stream:
+        return Http2Stream(self)
+
+    def release(self, conn: Http2Stream) -> None:
+        conn.close()
+
+    def discard(self, conn: Http2Stream) -> None:
+        conn.close()
+
+    def prewarm(self, count: int) -> None:
+        """A single connection serves every request, so count only matters as far as opening one."""
+        if count < 1:
+            return
+        try:
+            self.get_connection()
+        except OSError as err:
+            print(f"unable to prewarm HTTP/2 connection to {self.host}: {err}")
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
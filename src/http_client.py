@@ -1,24 +1,609 @@
+import email.utils
 import http.client
+import io
 import json
+import os
+import random
+import select
 import socket
 import ssl
+import threading
 import time
+import zlib
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Callable, Protocol
 
 from config import Config
+from stats import job_stats
+
+
+class DNSCache:
+    """
+    Caches resolved addresses for ttl seconds so reconnects don't
+    need a fresh DNS lookup every time.
+    """
+
+    def __init__(self, ttl: float = Config.DNS_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self.entries: dict[tuple[str, int], tuple[float, list]] = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> list:
+        with self.lock:
+            entry = self.entries.get((host, port))
+
+        if entry and entry[0] > time.monotonic():
+            job_stats.incr("dns_cache_hits")
+            return entry[1]
+
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        job_stats.incr("dns_lookups")
+
+        with self.lock:
+            self.entries[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    def invalidate(self, host: str, port: int) -> None:
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+    def create_connection(
+        self, host: str, port: int, timeout: float, source_address=None, timings: dict | None = None
+    ) -> socket.socket:
+        """
+        Connect to the first reachable address for host, like socket.create_connection.
+
+        If a timings dict is passed, the seconds taken to resolve and connect are set as dns and connect.
+        """
+        error: OSError | None = None
+        started = time.monotonic()
+        addresses = self.resolve(host, port)
+        resolved = time.monotonic()
+
+        for family, type_, proto, _, sockaddr in addresses:
+            sock = socket.socket(family, type_, proto)
+            try:
+                sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+                if timings is not None:
+                    timings["dns"] = resolved - started
+                    timings["connect"] = time.monotonic() - resolved
+                return sock
+            except OSError as err:
+                error = err
+                sock.close()
+
+        # addresses may have moved, look them up again next time
+        self.invalidate(host, port)
+        raise error or OSError(f"no addresses found for {host}")
+
+
+class TLSSessionCache:
+    """
+    Keeps the last TLS session per host so new connections can offer it
+    and get an abbreviated handshake.
+
+    Sessions can only be resumed with the SSLContext that created them,
+    so they are stored per context.
+    """
+
+    def __init__(self) -> None:
+        self.sessions: dict[tuple[ssl.SSLContext, str, int], ssl.SSLSession] = {}
+        self.lock = threading.Lock()
+
+    def get(self, context: ssl.SSLContext, host: str, port: int) -> ssl.SSLSession | None:
+        with self.lock:
+            return self.sessions.get((context, host, port))
+
+    def set(self, context: ssl.SSLContext, host: str, port: int, session: ssl.SSLSession | None) -> None:
+        if session is None:
+            return
+        with self.lock:
+            self.sessions[(context, host, port)] = session
+
+
+dns_cache = DNSCache()
+tls_sessions = TLSSessionCache()
+# shared by Clients made without a pool, as their sessions can only be resumed with the same context
+ssl_context = ssl.create_default_context()
+
+
+class CachingHTTPSConnection(http.client.HTTPSConnection):
+    """
+    HTTPSConnection that resolves its host through dns_cache and resumes
+    TLS sessions from tls_sessions.
+
+    Handshakes are counted in job_stats as tls_handshakes_full or tls_handshakes_resumed.
+    Each connect replaces connect_timings with the seconds taken by its dns, connect and tls phases.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.connect_timings: dict[str, float] = {}
+
+    def connect(self):
+        timings = {}
+        sock = dns_cache.create_connection(self.host, self.port, self.timeout, self.source_address, timings)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        session = tls_sessions.get(self._context, self.host, self.port)
+        started = time.monotonic()
+        try:
+            self.sock = self._context.wrap_socket(sock, server_hostname=self.host, session=session)
+        except BaseException:
+            sock.close()
+            raise
+        timings["tls"] = time.monotonic() - started
+        self.connect_timings = timings
+
+        if self.sock.session_reused:
+            job_stats.incr("tls_handshakes_resumed")
+        else:
+            job_stats.incr("tls_handshakes_full")
+        self.save_tls_session()
+
+    def save_tls_session(self):
+        if isinstance(self.sock, ssl.SSLSocket):
+            tls_sessions.set(self._context, self.host, self.port, self.sock.session)
+
+    def getresponse(self):
+        response = super().getresponse()
+        # TLS 1.3 session tickets arrive after the handshake, so are only available once data has been read
+        self.save_tls_session()
+        return response
+
+
+# bytes read from the socket at a time when decompressing a response
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ClientError(Exception):
+    """Base class for errors getting a JSON document from the API."""
+
+
+class NotFoundError(ClientError):
+    """The API returned 404."""
+
+
+class RequestFailedError(ClientError):
+    """No successful response was received."""
+
+
+class ResponseParseError(ClientError):
+    """The response body was not valid JSON."""
+
+
+class BufferedResponse:
+    """
+    Response read in full, with the parts of http.client.HTTPResponse that Client uses.
+    Stands in for it wherever the body isn't read from a socket, such as HTTP/2, asyncio and replayed responses.
+    """
+
+    def __init__(self, status: int, reason: str, headers: list[tuple[str, str]], body: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.fp = io.BytesIO(body)
+        # seconds taken by each phase of the request
+        self.timings: dict[str, float] = {}
+
+    def getheader(self, name: str, default: str | None = None) -> str | None:
+        name = name.lower()
+        for header, value in self.headers:
+            if header.lower() == name:
+                return value
+        return default
+
+    def getheaders(self) -> list[tuple[str, str]]:
+        return self.headers
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self.fp.read(amt)
+
+    def readinto(self, buffer) -> int:
+        return self.fp.readinto(buffer)
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+def check_response_status(response):
+    """
+    Return response if it is a 200, otherwise raise the matching ClientError.
+
+    The body of an error response is read so the connection can be reused.
+    """
+    if response is None:
+        raise RequestFailedError("Failed to fetch data after retries.")
+
+    if response.status == 200:
+        return response
+
+    response.read()
+    if response.status == 404:
+        raise NotFoundError("Resource not found.")
+    raise RequestFailedError(f"Received status {response.status}")
+
+
+def decode_json(body: bytes | memoryview) -> dict:
+    """Parse a UTF-8 JSON body, decoding straight from the buffer it was read into."""
+    try:
+        return json.loads(str(body, "utf-8"))
+    except ValueError as err:
+        raise ResponseParseError(f"ERROR reading json from response: {err}") from err
+
+
+def has_zlib_header(data: bytes) -> bool:
+    return len(data) >= 2 and data[0] & 0x0F == 8 and (data[0] * 256 + data[1]) % 31 == 0
+
+
+def read_decoded_body(read: Callable[..., bytes], content_encoding: str | None) -> bytes:
+    """
+    Read a response body in chunks using read, decompressing each chunk as it
+    arrives if the body is gzip or deflate encoded.
+
+    Sizes before and after decompression are counted in job_stats.
+    """
+    encoding = (content_encoding or "").strip().lower()
+
+    if encoding not in ("gzip", "deflate"):
+        body = read()
+        job_stats.incr("body_bytes_received", len(body))
+        job_stats.incr("body_bytes_decoded", len(body))
+        return body
+
+    # gzip has a header and trailer, deflate should be zlib wrapped but some servers send it raw
+    wbits = zlib.MAX_WBITS | 16 if encoding == "gzip" else zlib.MAX_WBITS
+    decompressor = zlib.decompressobj(wbits)
+    chunks = []
+    received = 0
+
+    while chunk := read(READ_CHUNK_SIZE):
+        if received == 0 and encoding == "deflate" and not has_zlib_header(chunk):
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        received += len(chunk)
+        chunks.append(decompressor.decompress(chunk))
+    chunks.append(decompressor.flush())
+
+    body = b"".join(chunks)
+    job_stats.incr("body_bytes_received", received)
+    job_stats.incr("body_bytes_decoded", len(body))
+    return body
+
+
+def record_body_time(response, seconds: float) -> None:
+    """Add the time taken to read the body to the response's timings and the job_stats histograms."""
+    timings = getattr(response, "timings", None)
+    if isinstance(timings, dict):
+        timings["body"] = seconds
+    job_stats.observe("body", seconds)
+
+
+# statuses worth retrying, anything else is returned straight away
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Read a Retry-After header, given either as seconds or as a HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+def get_retry_delay(
+    attempt: int, retry_delay: float, max_retry_delay: float, retry_after: float | None = None
+) -> float:
+    """
+    Seconds to wait before retrying after attempt.
+
+    The server's Retry-After is used if given, otherwise the delay doubles with each
+    attempt up to max_retry_delay, with jitter so workers that failed together don't retry together.
+    Either way the delay is never more than max_retry_delay, so a server can't stall a worker for hours.
+    """
+    if retry_after is not None:
+        return min(retry_after, max_retry_delay)
+    delay = min(retry_delay * 2 ** (attempt - 1), max_retry_delay)
+    return random.uniform(delay / 2, delay)
+
+
+class RetryBudget:
+    """
+    Limits the retries made across a whole job, so a period of API errors
+    can't multiply how long the job takes.
+
+    Allows min_retries retries plus ratio retries for every request made.
+    """
+
+    def __init__(self, ratio: float = Config.RETRY_BUDGET_RATIO, min_retries: int = Config.RETRY_BUDGET_MIN) -> None:
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self.lock:
+            self.requests += 1
+
+    def spend(self) -> bool:
+        """Take a retry from the budget, returns False if there is none left."""
+        with self.lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                job_stats.incr("retries_denied")
+                return False
+            self.retries += 1
+        job_stats.incr("retries")
+        return True
+
+
+def is_stale(conn: http.client.HTTPConnection) -> bool:
+    """
+    An idle keep-alive socket should have nothing to read, if the server has closed it
+    or sent something unexpected then it is stale.
+
+    A readable TLS socket isn't enough to go on, TLS 1.3 servers send session tickets after
+    the handshake, so a connection that was opened and never used is readable too. Those
+    records are handled by a non-blocking read, and only the end of the connection or
+    application data left over make it stale.
+    """
+    sock = conn.sock
+    if not isinstance(sock, socket.socket):
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    if not readable:
+        return False
+    if not isinstance(sock, ssl.SSLSocket):
+        return True
+    if sock.pending():
+        return True
+
+    timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0)
+        # either nothing, the server closed the connection, or bytes it shouldn't have sent
+        sock.recv(1)
+        return True
+    except ssl.SSLWantReadError:
+        # only TLS records that aren't application data, such as session tickets
+        return False
+    except (OSError, ValueError):
+        return True
+    finally:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """
+    Keeps idle keep-alive HTTPS connections to one host so they can be
+    leased out again instead of paying for a new TCP and TLS handshake.
+
+    host may include a port. If use_ssl is False the connections are plain HTTP.
+    """
+
+    reuses_connections = True
+
+    def __init__(self, host: str, max_idle=10, timeout=30, idle_timeout=Config.POOL_IDLE_TIMEOUT, use_ssl: bool = True):
+        self.host = host
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.context = ssl.create_default_context() if use_ssl else None
+        self.idle: deque[tuple[http.client.HTTPConnection, float]] = deque()
+        self.lock = threading.Lock()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.context is None:
+            return http.client.HTTPConnection(host=self.host, timeout=self.timeout)
+        return CachingHTTPSConnection(host=self.host, timeout=self.timeout, context=self.context)
+
+    def lease(self) -> http.client.HTTPConnection:
+        """Take the most recently used idle connection that is still healthy, or a new one."""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                conn, last_used = self.idle.pop()
+
+            if time.monotonic() - last_used < self.idle_timeout and not is_stale(conn):
+                return conn
+            conn.close()
+        return self._new_connection()
+
+    def release(self, conn: http.client.HTTPConnection) -> None:
+        """Return a connection once its last response has been fully read."""
+        if conn.sock is None:
+            return
+
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def discard(self, conn: http.client.HTTPConnection) -> None:
+        """Close a connection that is in an unknown state rather than returning it."""
+        conn.close()
+
+    def prewarm(self, count: int) -> None:
+        """Open connections up front so the first requests of a job don't wait on handshakes."""
+        conns = []
+        for _ in range(count - len(self.idle)):
+            conn = self._new_connection()
+            try:
+                conn.connect()
+            except OSError as err:
+                print(f"unable to prewarm connection to {self.host}: {err}")
+                break
+            conns.append(conn)
+
+        for conn in conns:
+            self.release(conn)
+        print(f"{len(self.idle)} warm connections to {self.host}")
+
+    def close(self) -> None:
+        with self.lock:
+            while self.idle:
+                conn, _ = self.idle.pop()
+                conn.close()
+
+
+class Transport(Protocol):
+    """
+    What Client needs from the pool it leases connections from.
+
+    ConnectionPool is the HTTP/1.1 transport and http2_transport.Http2Transport the HTTP/2 one.
+    """
+
+    # whether a leased connection may be a keep-alive socket the server closed while it sat idle,
+    # if so Client checks it is still open before sending and retries once on a new connection
+    reuses_connections: bool
+
+    def lease(self) -> Any: ...
+
+    def release(self, conn: Any) -> None: ...
+
+    def discard(self, conn: Any) -> None: ...
+
+    def prewarm(self, count: int) -> None: ...
+
+    def close(self) -> None: ...
+
+
+_pools: dict[str, Transport] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(host: str | None = None) -> Transport:
+    """
+    Get the process wide transport for host, using the HTTP version and transport mode from Config.
+
+    Pools inherited from a parent process are not reused as their sockets are shared with it.
+    """
+    global _pools_pid
+
+    host = host or Config.API_HOST
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+
+        if host not in _pools:
+            _pools[host] = _new_transport(host)
+        return _pools[host]
+
+
+def _new_transport(host: str) -> Transport:
+    if Config.TRANSPORT_MODE in ("record", "replay"):
+        # cassette imports this module, so can only be imported once it has loaded
+        from cassette import RecordingTransport, ReplayTransport, get_cassette
+
+        if Config.TRANSPORT_MODE == "replay":
+            return ReplayTransport(get_cassette(), host, realtime=Config.REPLAY_LATENCY)
+
+    transport: Transport
+    if Config.HTTP_VERSION == "2":
+        # h2 is an optional dependency, so only imported when HTTP/2 is used
+        from http2_transport import Http2Transport
+
+        transport = Http2Transport(host)
+    else:
+        transport = ConnectionPool(host, max_idle=Config.POOL_SIZE)
+
+    if Config.TRANSPORT_MODE == "record":
+        return RecordingTransport(transport, get_cassette(), host)
+    return transport
+
+
+_hedge_executor: ThreadPoolExecutor | None = None
+_hedge_executor_pid = 0
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """Threads that hedged requests are sent from, one set per process as threads don't survive a fork."""
+    global _hedge_executor, _hedge_executor_pid
+
+    with _hedge_executor_lock:
+        if _hedge_executor is None or _hedge_executor_pid != os.getpid():
+            _hedge_executor = ThreadPoolExecutor(max_workers=Config.POOL_SIZE * 2, thread_name_prefix="hedge")
+            _hedge_executor_pid = os.getpid()
+        return _hedge_executor
 
 
 class Client:
-    def __init__(self, timeout=30, max_retries=3, retry_delay=2, host=None, headers=None):
+    def __init__(
+        self,
+        timeout=30,
+        max_retries=3,
+        retry_delay=2,
+        host=None,
+        headers=None,
+        pool=None,
+        rate_limiter=None,
+        retry_budget=None,
+        max_retry_delay=Config.MAX_RETRY_DELAY,
+        circuit_breaker=None,
+        latency_tracker=None,
+        hedge=False,
+    ):
         """
         Host should be passed without protocol.
+
+        If a pool is passed, connections are leased from and returned to it,
+        this can be a ConnectionPool or any other Transport.
+
+        If a rate_limiter is passed, every request waits for a token from it.
+
+        retry_delay is the backoff before the first retry, it doubles for each
+        retry after that up to max_retry_delay. If a RetryBudget is passed,
+        retries stop once it is used up.
+
+        If a CircuitBreaker is passed, every attempt is reported to it and
+        CircuitOpenError is raised while it is open.
+
+        If a LatencyTracker is passed, response times are recorded in it and timeouts
+        are set from them, with timeout as the most allowed. With hedge set as well,
+        a GET that takes longer than usual is sent again on a second connection.
         """
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_budget = retry_budget
+        self.circuit_breaker = circuit_breaker
+        self.latency_tracker = latency_tracker
+        self.hedge = hedge
         self.host = host or Config.API_HOST
         self.headers = headers or Config.HEADERS
-        self.context = ssl.create_default_context()
+        self.context = ssl_context
+        self.pool = pool
+        self.rate_limiter = rate_limiter
         self.conn = None
+        # status of the last attempt made, None if it got no response
+        self.last_status = None
+        # reused for every uncompressed response body, grows to the largest body seen
+        self.buffer = bytearray(READ_CHUNK_SIZE)
 
     def __enter__(self):
         """Called when entering the 'with' block. Creates reusable connection."""
@@ -28,59 +613,272 @@ class Client:
     def __exit__(self, exc_type, exc_value, traceback):
         """Called when exiting the 'with' block. Closes the connection."""
         if self.conn:
-            self.close_connection()
+            if exc_type is None:
+                self.close_connection()
+            else:
+                self._discard_connection()
 
     def get_connection(self):
         """Ensure a valid connection before making a request."""
         if self.conn is None:
             self._create_connection()
-            return self.conn
+        return self.conn
 
     def _create_connection(self):
-        self.conn = http.client.HTTPSConnection(host=self.host, timeout=self.timeout, context=self.context)
+        self.conn = self._lease_connection()
+
+    def _lease_connection(self):
+        if self.pool:
+            return self.pool.lease()
+        return CachingHTTPSConnection(host=self.host, timeout=self.timeout, context=self.context)
 
     def close_connection(self):
-        self.conn.close()
+        """Return the connection to the pool, or close it if there is no pool."""
+        if self.pool:
+            self.pool.release(self.conn)
+        else:
+            self.conn.close()
+        self.conn = None
+
+    def _discard_connection(self):
+        """Drop a connection in an unknown state, a new one is created for the next request."""
+        if self.pool:
+            self.pool.discard(self.conn)
+        else:
+            self.conn.close()
         self.conn = None
 
+    def _send(self, url, method, headers):
+        """
+        Send request and return the response.
+
+        A reused keep-alive connection may have been closed by the server while idle,
+        in that case the request is sent once more on a new connection.
+        """
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        self.get_connection()
+        reused = (self.pool is None or self.pool.reuses_connections) and self.conn.sock is not None
+
+        if reused and is_stale(self.conn):
+            self._discard_connection()
+            self.get_connection()
+            reused = False
+
+        try:
+            response = self._exchange(url, method, headers)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+            if not reused:
+                raise
+            print(f"Reconnecting after stale connection: {e}")
+            self._discard_connection()
+            self.get_connection()
+            response = self._exchange(url, method, headers)
+
+        if self.rate_limiter:
+            self.rate_limiter.update_from_headers(response)
+        return response
+
+    def _exchange(self, url, method, headers):
+        hedge_after = None
+        if self.hedge and self.latency_tracker and method == "GET":
+            hedge_after = self.latency_tracker.hedge_delay()
+
+        if hedge_after is None:
+            return self._timed_request(self.conn, url, method, headers)
+        return self._send_hedged(url, method, headers, hedge_after)
+
+    def _timed_request(self, conn, url, method, headers):
+        """
+        Send request on conn and wait for the response headers, recording how long that took.
+
+        The time taken by each phase is set on the response as timings, with dns, connect and tls
+        only included if a new connection was made, and added to the job_stats histograms.
+        A request that times out is recorded at the timeout, so timeouts grow if the API slows down.
+        """
+        timeout = self.latency_tracker.timeout(self.timeout) if self.latency_tracker else self.timeout
+        conn.timeout = timeout
+        sock = getattr(conn, "sock", None)
+        if isinstance(sock, socket.socket):
+            sock.settimeout(timeout)
+
+        connect_timings = getattr(conn, "connect_timings", None)
+        started = time.monotonic()
+        try:
+            conn.request(method, url, headers=headers)
+            response = conn.getresponse()
+        except TimeoutError:
+            if self.latency_tracker:
+                self.latency_tracker.record_timeout(timeout)
+            raise
+        elapsed = time.monotonic() - started
+        if self.latency_tracker:
+            self.latency_tracker.record(elapsed)
+
+        timings = {}
+        if getattr(conn, "connect_timings", None) is not connect_timings:
+            timings.update(conn.connect_timings)
+        timings["ttfb"] = max(elapsed - sum(timings.values()), 0)
+        for phase, seconds in timings.items():
+            job_stats.observe(phase, seconds)
+        response.timings = timings
+        return response
+
+    def _send_hedged(self, url, method, headers, hedge_after):
+        """
+        Send request, and if no response has arrived after hedge_after seconds send it again on a
+        second connection. The first response back is used and the other connection is closed.
+
+        Hedges sent and won are counted in job_stats as hedges_sent and hedge_wins.
+        """
+        executor = get_hedge_executor()
+        primary_conn = self.conn
+        primary = executor.submit(self._timed_request, primary_conn, url, method, headers)
+
+        wait([primary], timeout=hedge_after)
+        if primary.done():
+            return primary.result()
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        hedge_conn = self._lease_connection()
+        hedge = executor.submit(self._timed_request, hedge_conn, url, method, headers)
+        job_stats.incr("hedges_sent")
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+            if winner is None:
+                continue
+
+            if winner is hedge:
+                job_stats.incr("hedge_wins")
+                self._abandon_connection(primary_conn)
+                self.conn = hedge_conn
+            else:
+                self._abandon_connection(hedge_conn)
+            return winner.result()
+
+        # both failed, the primary connection is discarded by the caller
+        self._abandon_connection(hedge_conn)
+        return primary.result()
+
+    def _abandon_connection(self, conn):
+        """Close a connection that another thread may still be waiting on, without letting it reconnect."""
+        conn.auto_open = 0
+        sock = getattr(conn, "sock", None)
+        if isinstance(sock, socket.socket):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.pool:
+            self.pool.discard(conn)
+        else:
+            conn.close()
+
     def request(self, url, method="GET", headers={}):
         if headers == {}:
             headers = self.headers
 
+        if self.retry_budget:
+            self.retry_budget.record_request()
+
         for attempt in range(1, self.max_retries + 1):
-            try:
-                if self.conn is None:
-                    self.get_connection()
+            retry_after = None
+            if self.circuit_breaker:
+                self.circuit_breaker.before_request()
 
+            self.last_status = None
+            try:
                 print(f"making {method} request to {url}")
-                self.conn.request(method, url, headers=headers)
-                response = self.conn.getresponse()
+                response = self._send(url, method, headers)
+                self.last_status = response.status
+
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_status(response.status)
 
                 if response.status == 200:
                     return response
 
                 print(f"Attempt {attempt}: Received status {response.status}")
 
-                if response.status == 404:
+                # 404s and other client errors will not change on a retry
+                if response.status not in RETRYABLE_STATUSES:
                     return response
 
-            except (http.client.HTTPException, socket.timeout) as e:
+                retry_after = parse_retry_after(response.getheader("Retry-After"))
+                # body has to be read before the connection can send the next request
+                response.read()
+
+            except (http.client.HTTPException, OSError) as e:
                 print(f"Attempt {attempt}: Error - {e}")
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+                if self.conn:
+                    self._discard_connection()
 
             if attempt < self.max_retries:
-                time.sleep(self.retry_delay)
+                if self.retry_budget and not self.retry_budget.spend():
+                    print("Retry budget for this job used up, not retrying")
+                    break
+                time.sleep(get_retry_delay(attempt, self.retry_delay, self.max_retry_delay, retry_after))
 
         print("Failed to fetch data after retries.")
         return None
 
     def get_response_data(self, response):
-        return response.read().decode("utf-8")
+        started = time.monotonic()
+        body = read_decoded_body(response.read, response.getheader("Content-Encoding"))
+        record_body_time(response, time.monotonic() - started)
+        return body.decode("utf-8")
 
-    def get_json_dict_from_response(self, response_str: str) -> dict | str:
+    def get_json(self, url: str) -> dict:
         """
-        This will take the result from get_response_data and convert into dict
+        Request url and return the JSON body as a dict.
+
+        Raises NotFoundError, RequestFailedError or ResponseParseError instead of returning error strings.
         """
         try:
-            return json.loads(response_str)
-        except Exception as err:
-            return f"ERROR reading json from {response_str}, {err}"
+            response = check_response_status(self.request(url))
+            body = self.read_body(response)
+        except (http.client.HTTPException, OSError) as err:
+            if self.conn:
+                self._discard_connection()
+            raise RequestFailedError(f"Error reading response: {err}") from err
+        return decode_json(body)
+
+    def read_body(self, response) -> bytes | memoryview:
+        """
+        Read the response body into the client's reusable buffer.
+
+        Compressed bodies, or ones without a Content-Length, are read in chunks instead.
+        The returned memoryview is only valid until the next call.
+        """
+        started = time.monotonic()
+        content_encoding = response.getheader("Content-Encoding")
+        content_length = response.getheader("Content-Length")
+
+        if content_encoding or not content_length:
+            body = read_decoded_body(response.read, content_encoding)
+            record_body_time(response, time.monotonic() - started)
+            return body
+
+        size = int(content_length)
+        if len(self.buffer) < size:
+            self.buffer = bytearray(size)
+
+        view = memoryview(self.buffer)[:size]
+        received = 0
+        while received < size:
+            count = response.readinto(view[received:])
+            if not count:
+                raise http.client.IncompleteRead(bytes(view[:received]), size - received)
+            received += count
+
+        job_stats.incr("body_bytes_received", size)
+        job_stats.incr("body_bytes_decoded", size)
+        record_body_time(response, time.monotonic() - started)
+        return view
@@ -0,0 +1,62 @@
+import threading
+from collections import deque
+
+from config import Config
+
+
+class LatencyTracker:
+    """
+    Rolling window of how long a host takes to start responding,
+    used to set timeouts and decide when to hedge a request.
+
+    Nothing is derived until min_samples responses have been recorded.
+    """
+
+    def __init__(self, window: int = Config.LATENCY_WINDOW, min_samples: int = 20) -> None:
+        self.samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+
+    def record_timeout(self, timeout: float) -> None:
+        """
+        Record a request that timed out as taking the timeout, the least it would have taken.
+        Otherwise if responses slowed down past the timeout none would be recorded, and the
+        timeout would never grow to let them through.
+        """
+        self.record(timeout)
+
+    def percentile(self, percent: float) -> float | None:
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+    def timeout(self, default: float) -> float:
+        """Timeout from the p99 response time, never more than default or less than MIN_TIMEOUT."""
+        p99 = self.percentile(99)
+        if p99 is None:
+            return default
+        return min(max(p99 * Config.TIMEOUT_MULTIPLIER, Config.MIN_TIMEOUT), default)
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait for a response before sending a hedged copy, None until there are enough samples."""
+        return self.percentile(Config.HEDGE_PERCENTILE)
+
+
+_trackers: dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(host: str | None = None) -> LatencyTracker:
+    """Get the process wide latency tracker for host, by default the Crossref API."""
+    host = host or Config.API_HOST
+
+    with _trackers_lock:
+        if host not in _trackers:
+            _trackers[host] = LatencyTracker()
+        return _trackers[host]
@@ -0,0 +1,146 @@
+import fcntl
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+
+
+def parse_interval(interval: str) -> float:
+    """
+    Convert a rate limit interval such as "1s", "500ms" or "1m" into seconds.
+
+    Returns 0 if the interval can't be read.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*", interval or "")
+    if not match:
+        return 0
+    value, unit = float(match.group(1)), match.group(2) or "s"
+    return value * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread and process on the host.
+
+    The bucket lives in a small file that is locked with flock while it is
+    updated, so queue workers in separate processes draw from the same tokens.
+    The rate follows the X-Rate-Limit-Limit and X-Rate-Limit-Interval headers
+    sent back by the API.
+    """
+
+    # tokens, time last updated, tokens per second, bucket size, concurrency limit (0 if unknown)
+    STATE_FORMAT = "ddddd"
+
+    def __init__(self, path: Path, rate: float = Config.RATE_LIMIT) -> None:
+        self.path = path
+        self.initial_rate = rate
+        self.lock = threading.Lock()
+        self.last_headers: tuple[str | None, str | None, str | None] = (None, None, None)
+
+    def _update_state(self, update) -> tuple[float, ...]:
+        """Apply update to the bucket state while holding the thread and file locks."""
+        with self.lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                data = os.pread(fd, struct.calcsize(self.STATE_FORMAT), 0)
+
+                if len(data) == struct.calcsize(self.STATE_FORMAT):
+                    state = struct.unpack(self.STATE_FORMAT, data)
+                else:
+                    state = (self.initial_rate, time.time(), self.initial_rate, self.initial_rate, 0)
+
+                state = update(*state)
+                os.pwrite(fd, struct.pack(self.STATE_FORMAT, *state), 0)
+                return state
+            finally:
+                os.close(fd)
+
+    def reserve(self) -> float:
+        """
+        Take a token and return how many seconds to wait before using it.
+
+        The bucket can go into debt, so callers waiting at the same time queue up behind each other.
+        """
+        delay = 0.0
+
+        def take_token(tokens, updated_at, rate, burst, concurrency):
+            nonlocal delay
+            now = time.time()
+            tokens = min(burst, tokens + max(now - updated_at, 0) * rate) - 1
+            if tokens < 0:
+                delay = -tokens / rate
+            return tokens, now, rate, burst, concurrency
+
+        self._update_state(take_token)
+        return delay
+
+    def refund(self) -> None:
+        """Give back a reserved token that wasn't used, such as when a request waiting on it is cancelled."""
+
+        def return_token(tokens, updated_at, rate, burst, concurrency):
+            return min(burst, tokens + 1), updated_at, rate, burst, concurrency
+
+        self._update_state(return_token)
+
+    def acquire(self) -> None:
+        """Block until a request is allowed."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def update_from_headers(self, response) -> None:
+        """Set the rate from X-Rate-Limit headers, if the response has them and they have changed."""
+        headers = (
+            response.getheader("X-Rate-Limit-Limit"),
+            response.getheader("X-Rate-Limit-Interval"),
+            response.getheader("X-Concurrency-Limit"),
+        )
+        if headers == self.last_headers or not headers[0] or not headers[1]:
+            return
+        self.last_headers = headers
+
+        try:
+            limit = float(headers[0])
+            concurrency = float(headers[2] or 0)
+        except ValueError:
+            return
+        interval = parse_interval(headers[1])
+        if limit <= 0 or interval <= 0:
+            return
+
+        new_rate = limit / interval
+
+        def set_rate(tokens, updated_at, rate, burst, _concurrency):
+            if rate != new_rate:
+                print(f"Rate limit set to {limit:g} requests per {headers[1]}")
+            return min(tokens, new_rate), updated_at, new_rate, new_rate, concurrency
+
+        self._update_state(set_rate)
+
+    @property
+    def rate(self) -> float:
+        return self._update_state(lambda *state: state)[2]
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Requests the API allows in flight at once, 0 if it hasn't said."""
+        return int(self._update_state(lambda *state: state)[4])
+
+
+_limiters: dict[Path, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(path: Path | None = None) -> RateLimiter:
+    """Get the rate limiter for the bucket file at path, by default the one for the Crossref API."""
+    path = path or Config.RATE_LIMIT_FILEPATH
+
+    with _limiters_lock:
+        if path not in _limiters:
+            _limiters[path] = RateLimiter(path)
+        return _limiters[path]
@@ -0,0 +1,235 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Iterator
+from urllib.parse import quote, urljoin, urlsplit
+
+from config import Config
+from crossref import build_doi_result, iter_in_order, new_doi_result
+from doi_result import DOIResult
+from host_matcher import Hosts
+from http_client import Client, ClientError, ConnectionPool, NotFoundError, RequestFailedError, RetryBudget
+from stats import job_stats
+
+
+""" Follow DOIs from the resolver to where they actually land, with HEAD requests """
+
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class HostLimiter:
+    """
+    Politeness limits for one host, at most max_in_flight requests at once
+    and each request started at least interval seconds after the one before.
+
+    Used as a context manager around each request to the host.
+    """
+
+    def __init__(self, max_in_flight: int = Config.HOST_CONCURRENCY, interval: float = Config.HOST_INTERVAL) -> None:
+        self.slots = threading.BoundedSemaphore(max(max_in_flight, 1))
+        self.interval = interval
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "HostLimiter":
+        self.slots.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.slots.release()
+
+
+def get_origin(url: str) -> tuple[str, str]:
+    """Scheme and host, with the port if there is one, that a connection to url is made to."""
+    parts = urlsplit(url)
+    return parts.scheme, parts.netloc
+
+
+def wrap_redirects(doi: str, hops: list[dict]) -> dict:
+    """
+    Wrap a redirect chain in a response dict shaped like the one from /works/{doi}, with where
+    the DOI landed as its resolving URL, the landing host, and every hop as "status url".
+    """
+    landing_url = hops[-1]["url"]
+    return {
+        "status": "ok",
+        "message-type": "work",
+        "message": {
+            "DOI": doi,
+            "resource": {"primary": {"URL": landing_url}},
+            "landing-host": urlsplit(landing_url).hostname or "",
+            "redirects": " -> ".join(f"{hop['status']} {hop['url']}" for hop in hops),
+        },
+    }
+
+
+class RedirectFollower:
+    """
+    Follows the redirect chain from resolver_url/{doi} to wherever each DOI lands, with HEAD requests.
+
+    Connections are kept alive in a ConnectionPool for each origin, and only the max_pools
+    most recently used landing origins are kept. Requests to landing hosts are held to the
+    politeness limits of a HostLimiter per host, while the resolver is only limited by how many
+    DOIs are followed at once. Safe to share between threads, each thread sends with its own Client.
+    """
+
+    def __init__(
+        self,
+        resolver_url: str = Config.RESOLVER_URL,
+        max_redirects: int = Config.MAX_REDIRECTS,
+        max_pools: int = Config.MAX_HOST_POOLS,
+    ) -> None:
+        self.resolver_url = resolver_url.rstrip("/")
+        self.resolver_origin = get_origin(self.resolver_url)
+        self.resolver_pool = self._new_pool(self.resolver_origin, Config.POOL_SIZE)
+        self.max_redirects = max_redirects
+        self.max_pools = max_pools
+        self.retry_budget = RetryBudget()
+        self.pools: OrderedDict[tuple[str, str], ConnectionPool] = OrderedDict()
+        self.limiters: dict[str, HostLimiter] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _new_pool(self, origin: tuple[str, str], max_idle: int) -> ConnectionPool:
+        scheme, netloc = origin
+        return ConnectionPool(netloc, max_idle=max_idle, use_ssl=scheme == "https")
+
+    def get_pool(self, origin: tuple[str, str]) -> ConnectionPool:
+        if origin == self.resolver_origin:
+            return self.resolver_pool
+
+        evicted = None
+        with self.lock:
+            pool = self.pools.get(origin)
+            if pool is None:
+                pool = self.pools[origin] = self._new_pool(origin, Config.HOST_CONCURRENCY)
+                if len(self.pools) > self.max_pools:
+                    _, evicted = self.pools.popitem(last=False)
+            else:
+                self.pools.move_to_end(origin)
+
+        if evicted:
+            evicted.close()
+        return pool
+
+    def is_current(self, origin: tuple[str, str], pool: ConnectionPool) -> bool:
+        with self.lock:
+            return pool is self.resolver_pool or self.pools.get(origin) is pool
+
+    def get_limiter(self, host: str) -> HostLimiter:
+        with self.lock:
+            if host not in self.limiters:
+                self.limiters[host] = HostLimiter()
+            return self.limiters[host]
+
+    def get_client(self) -> Client:
+        if not hasattr(self.local, "client"):
+            self.local.client = Client(retry_budget=self.retry_budget)
+        return self.local.client
+
+    def head(self, url: str) -> tuple[int, str | None]:
+        """Send a HEAD request for url, returning the status and the Location header."""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        pool = self.get_pool(origin)
+        # the connection is given back after every hop, so the thread's client can move between pools
+        client = self.get_client()
+        client.pool = pool
+        with client:
+            if origin == self.resolver_origin:
+                response = client.request(target, method="HEAD")
+            else:
+                with self.get_limiter(parts.netloc):
+                    response = client.request(target, method="HEAD")
+            if response is None:
+                raise RequestFailedError("Failed to fetch data after retries.")
+            response.read()
+
+        if not self.is_current(origin, pool):
+            # closed while this hop was using it, so the connection just returned would be left open
+            pool.close()
+        return response.status, response.getheader("Location")
+
+    def follow(self, doi: str) -> list[dict]:
+        """
+        Every hop from the resolver to where doi lands, as the url requested and the status it returned.
+
+        Raises NotFoundError if the resolver doesn't know the DOI, and ClientError if the chain
+        loops, is too long, or can't be followed.
+        """
+        url = f"{self.resolver_url}/{quote(doi, safe='/')}"
+        hops: list[dict] = []
+
+        while True:
+            if urlsplit(url).scheme not in ("http", "https"):
+                raise ClientError(f"Unable to follow redirect to {url}")
+            status, location = self.head(url)
+            hops.append({"status": status, "url": url})
+
+            if status not in REDIRECT_STATUSES or not location:
+                break
+            if len(hops) > self.max_redirects:
+                raise ClientError(f"More than {self.max_redirects} redirects")
+            url = urljoin(url, location)
+            if any(hop["url"] == url for hop in hops):
+                raise ClientError(f"Redirect loop at {url}")
+
+        job_stats.incr("redirects_followed", len(hops) - 1)
+        if len(hops) == 1 and status == 404:
+            raise NotFoundError("Resource not found.")
+        if len(hops) == 1 and status >= 400:
+            raise RequestFailedError(f"Received status {status}")
+        return hops
+
+    def check(self, doi: str, resolving_host: Hosts) -> DOIResult:
+        """Follow doi and check where it lands against resolving_host, with the hops as its metadata."""
+        try:
+            hops = self.follow(doi)
+        except ClientError as err:
+            print(f"Unable to follow {doi}: {err}")
+            return new_doi_result(doi, errors=str(err))
+        return build_doi_result(doi, wrap_redirects(doi, hops), resolving_host, full_metadata=True)
+
+    def close(self) -> None:
+        with self.lock:
+            pools = [self.resolver_pool, *self.pools.values()]
+            self.pools.clear()
+        for pool in pools:
+            pool.close()
+
+
+def iter_redirect_data(
+    dois: Iterable[str],
+    resolving_host: Hosts = "",
+    jobs: int = 1,
+    window: int = Config.STREAM_WINDOW,
+    resolver_url: str = Config.RESOLVER_URL,
+) -> Iterator[DOIResult]:
+    """
+    Yield a result for each DOI in order, checking where it actually lands by following
+    its redirects from the resolver rather than where its metadata says it goes.
+
+    Up to jobs DOIs are followed at once, and no more than window ahead of the next result to be yielded.
+    Each result's metadata holds the landing host and every hop.
+    """
+    follower = RedirectFollower(resolver_url)
+
+    def check(doi: str) -> DOIResult:
+        return follower.check(doi, resolving_host)
+
+    try:
+        if jobs <= 1:
+            yield from map(check, dois)
+        else:
+            yield from iter_in_order(check, dois, jobs, window)
+    finally:
+        follower.close()
@@ -0,0 +1,148 @@
+import math
+import random
+from statistics import NormalDist
+from typing import Callable, Iterable, Iterator
+
+from agencies import get_prefix
+from config import Config
+from doi_result import DOIResult, Status
+
+
+""" Estimate how many of a job's DOIs resolve as expected from a sample of them """
+
+
+SAMPLE_METHODS = ("prefix", "random")
+
+
+def get_z_score(confidence: float) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def get_sample_size(
+    population: int, margin: float = Config.SAMPLE_MARGIN, confidence: float = Config.SAMPLE_CONFIDENCE
+) -> int:
+    """
+    DOIs to check to estimate the success rate of population DOIs to within margin either way,
+    assuming the worst case rate of a half and correcting for the population being finite.
+    """
+    if population <= 0:
+        return 0
+    z = get_z_score(confidence)
+    unlimited = z**2 * 0.25 / margin**2
+    return min(population, math.ceil(unlimited / (1 + (unlimited - 1) / population)))
+
+
+def draw_sample(dois: list[str], size: int, method: str = "prefix", seed: int | None = None) -> list[int]:
+    """
+    Indices of size of dois picked at random, in the order of dois.
+
+    With the prefix method each prefix gets its share of the sample, rounded so the shares
+    add up to size, and DOIs are picked at random within each prefix. That way every prefix
+    of a portfolio is represented and the plain sample rate still estimates the overall rate.
+    """
+    rng = random.Random(seed)
+    size = min(size, len(dois))
+    if method == "random":
+        return sorted(rng.sample(range(len(dois)), size))
+
+    prefixes: dict[str, list[int]] = {}
+    for index, doi in enumerate(dois):
+        prefixes.setdefault(get_prefix(doi), []).append(index)
+
+    shares = {prefix: size * len(indices) / len(dois) for prefix, indices in prefixes.items()}
+    counts = {prefix: math.floor(share) for prefix, share in shares.items()}
+    # the prefixes with the largest remainders get the DOIs left over from rounding down
+    by_remainder = sorted(shares, key=lambda prefix: shares[prefix] - counts[prefix], reverse=True)
+    for prefix in by_remainder[: size - sum(counts.values())]:
+        counts[prefix] += 1
+
+    return sorted(index for prefix, indices in prefixes.items() for index in rng.sample(indices, counts[prefix]))
+
+
+class SampleEstimate:
+    """
+    Success rate of a job's DOIs estimated from a sample, with a Wilson score interval
+    corrected for the sample being drawn without replacement from a finite population.
+    """
+
+    def __init__(self, successes: int, size: int, population: int, confidence: float = Config.SAMPLE_CONFIDENCE):
+        self.successes = successes
+        self.size = size
+        self.population = population
+        self.confidence = confidence
+
+    @property
+    def rate(self) -> float:
+        return self.successes / self.size if self.size else 0.0
+
+    @property
+    def bounds(self) -> tuple[float, float]:
+        if not self.size:
+            return 0.0, 1.0
+        if self.size >= self.population:
+            # every DOI was checked, so the rate is exact
+            return self.rate, self.rate
+
+        # a sample of a finite population tells as much as a larger sample of an unlimited one
+        n = self.size * (self.population - 1) / (self.population - self.size)
+        z = get_z_score(self.confidence)
+        centre = (self.rate + z**2 / (2 * n)) / (1 + z**2 / n)
+        spread = z / (1 + z**2 / n) * math.sqrt(self.rate * (1 - self.rate) / n + z**2 / (4 * n**2))
+        return max(0.0, centre - spread), min(1.0, centre + spread)
+
+    def __str__(self) -> str:
+        low, high = self.bounds
+        return (
+            f"{self.rate:.1%} of {self.population} DOIs estimated to resolve as expected, "
+            f"between {low:.1%} and {high:.1%} with {self.confidence:.0%} confidence, "
+            f"from {self.successes} of a sample of {self.size}"
+        )
+
+
+def check_sample(
+    dois: list[str],
+    lookup: Callable[[list[str]], Iterable[DOIResult]],
+    method: str = "prefix",
+    margin: float = Config.SAMPLE_MARGIN,
+    confidence: float = Config.SAMPLE_CONFIDENCE,
+    seed: int | None = None,
+) -> tuple[SampleEstimate, dict[int, DOIResult]]:
+    """
+    Check a sample of dois sized for margin and confidence, with lookup giving a result for each
+    DOI passed to it in order. Returns the estimate and the results by the DOIs' indices in dois.
+    """
+    indices = draw_sample(dois, get_sample_size(len(dois), margin, confidence), method, seed)
+    results = lookup([dois[index] for index in indices])
+    sampled = dict(zip(indices, results, strict=True))
+
+    successes = sum(result.status == Status.SUCCESS for result in sampled.values())
+    return SampleEstimate(successes, len(sampled), len(dois), confidence), sampled
+
+
+def iter_full_run(
+    dois: list[str], sampled: dict[int, DOIResult], lookup: Callable[[list[str]], Iterable[DOIResult]]
+) -> Iterator[DOIResult]:
+    """Yield a result for each of dois in order, reusing the sample's results and looking up the rest."""
+    rest = iter(lookup([doi for index, doi in enumerate(dois) if index not in sampled]))
+    for index in range(len(dois)):
+        yield sampled[index] if index in sampled else next(rest)
+
+
+def iter_sampled_data(
+    dois: list[str],
+    lookup: Callable[[list[str]], Iterable[DOIResult]],
+    method: str = "prefix",
+    full_run: bool = False,
+    margin: float = Config.SAMPLE_MARGIN,
+    confidence: float = Config.SAMPLE_CONFIDENCE,
+) -> Iterator[DOIResult]:
+    """
+    Check a sample of dois and print the estimate, then yield the sample's results,
+    or with full_run a result for every DOI, the sampled ones without looking them up again.
+    """
+    estimate, sampled = check_sample(dois, lookup, method, margin, confidence)
+    print(f"Sample estimate: {estimate}")
+    if full_run:
+        yield from iter_full_run(dois, sampled, lookup)
+    else:
+        yield from sampled.values()
@@ -0,0 +1,94 @@
+import bisect
+import threading
+from collections import Counter
+
+# upper bounds in seconds of the histogram buckets, the last one catches everything slower
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+
+
+class Histogram:
+    """Counts of values falling into each of a fixed set of buckets."""
+
+    def __init__(self, buckets: tuple[float, ...] = HISTOGRAM_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket the percentile falls in, or the largest value if that is lower."""
+        target = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+    def copy(self) -> "Histogram":
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count, histogram.total, histogram.max = self.count, self.total, self.max
+        return histogram
+
+
+class Stats:
+    """
+    Thread safe counters collected while a job runs, for example
+    how many TLS handshakes were resumed, and histograms of how long things took.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: Counter[str] = Counter()
+        self.histograms: dict[str, Histogram] = {}
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self.lock:
+            self.counters[name] += amount
+
+    def observe(self, name: str, value: float) -> None:
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def histograms_snapshot(self) -> dict[str, Histogram]:
+        with self.lock:
+            return {name: histogram.copy() for name, histogram in self.histograms.items()}
+
+    def timing_summary(self) -> dict[str, dict[str, float]]:
+        """Count, mean, p50, p90, p99 and max of each histogram, rounded to the millisecond."""
+        return {
+            name: {key: round(value, 3) for key, value in histogram.summary().items()}
+            for name, histogram in self.histograms_snapshot().items()
+        }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+job_stats = Stats()
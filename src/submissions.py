@@ -1,24 +1,36 @@
 import sys
+import time
 from multiprocessing import Process
 from pathlib import Path
+from typing import Iterator
 
+from circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker
 from config import Config
-from crossref import fetch_dois_data
+from crossref import check_api_available, iter_dois_data, iter_prefix_data
 from emailer import Emailer
+from doi_result import DOIResult
+from host_matcher import ExpectedHosts
+from http_client import get_pool
+from sampling import check_sample, iter_full_run
+from stats import job_stats
 from helpers import (
     create_lockfile,
+    read_csv_options,
+    read_expected_hosts,
     read_full_csv_data,
     remove_old_complete_files,
-    write_resolving_host_summary_to_csv,
-    write_full_metadata_to_csv,
+    update_csv_options,
+    write_results_to_csv,
+    write_timings_to_csv,
 )
 
 
-def email_summary_csv(recipient: str, filepath: Path) -> None:
+def email_summary_csv(
+    recipient: str, filepath: Path, message_body: str = "Please see attached for the results of your checks"
+) -> None:
     mailer = Emailer(sender_email=Config.EMAIL_ADDRESS, email_password=Config.EMAIL_PASSWORD)
 
     message_subject = "Results for Doi checks"
-    message_body = "Please see attached for the results of your checks"
 
     message = mailer.create_email_message(
         recipient_email=recipient, message_subject=message_subject, message_body=message_body
@@ -30,18 +42,87 @@ def email_summary_csv(recipient: str, filepath: Path) -> None:
 
 
 def process_csv_file(
-    file: Path, directories: dict, email_notification: bool = True, full_metadata: bool = False
+    file: Path,
+    directories: dict,
+    email_notification: bool = True,
+    full_metadata: bool = False,
+    jobs: int = Config.JOBS,
+    use_async: bool = Config.USE_ASYNC,
 ) -> bool:
-    """Process a single CSV file with DOIs."""
+    """
+    Process a single CSV file with DOIs, or with a prefix option to check every DOI under the prefix.
+    With a sample option a sample of the DOIs is checked and emailed with the estimated success rate
+    first, then with the full_run option the rest are checked as usual. Once the sample has been
+    emailed the file's options are rewritten, so a full run that is stopped and tried again
+    checks every DOI rather than sampling again.
+
+    Results are written to the output files as they arrive rather than collected first.
+    If the API circuit breaker opens the file is left in the queue and CircuitOpenError is raised,
+    once that has happened Config.MAX_REQUEUES times the file is moved to failures instead.
+    """
     try:
         print(f"Processing {file}")
         email, resolving_host, dois = read_full_csv_data(file)
-        results = fetch_dois_data(dois=dois, resolving_host=resolving_host)
-
-        if full_metadata:
-            write_full_metadata_to_csv(results, directories=directories)
-
-        summary_filepath = write_resolving_host_summary_to_csv(resolving_host, results, directories=directories)
+        options = read_csv_options(file)
+        expected_hosts = ExpectedHosts(resolving_host, read_expected_hosts(file))
+        backend = options.get("backend") or Config.BACKEND
+        # the redirects backend always has every hop to write
+        full_metadata = full_metadata or backend == "redirects"
+        job_stats.reset()
+
+        def lookup(dois: list[str]) -> Iterator[DOIResult]:
+            return iter_dois_data(
+                dois=dois,
+                resolving_host=expected_hosts,
+                full_metadata=full_metadata,
+                jobs=jobs,
+                use_async=use_async,
+                backend=backend,
+            )
+
+        if options.get("prefix"):
+            results = iter_prefix_data(
+                prefix=options["prefix"],
+                resolving_host=resolving_host,
+                filters=options.get("filter", ""),
+                full_metadata=full_metadata,
+            )
+        elif options.get("sample"):
+            estimate, sampled = check_sample(dois, lookup, options["sample"])
+            print(f"Sample estimate: {estimate}")
+            sample_filepath = write_results_to_csv(
+                resolving_host, sampled.values(), full_metadata=full_metadata, directories=directories, name="sample"
+            )
+            if email_notification:
+                print("Emailing sample results")
+                email_summary_csv(
+                    recipient=email,
+                    filepath=sample_filepath,
+                    message_body=f"Please see attached for the results of a sample of your checks.\n\n{estimate}",
+                )
+
+            if options.get("full_run") != "true":
+                print(f"{file} has been sampled, deleting file")
+                file.unlink()
+                return True
+
+            # if the full run is stopped and tried again, it isn't sampled and emailed again
+            update_csv_options(file, {**options, "sample": "", "full_run": "", "sample_done": "true"})
+            # the sampled DOIs aren't looked up again
+            results = iter_full_run(dois, sampled, lookup)
+        else:
+            if options.get("sample_done"):
+                print(f"{file} was sampled before it was stopped, checking every DOI")
+            results = lookup(dois)
+
+        summary_filepath = write_results_to_csv(
+            resolving_host, results, full_metadata=full_metadata, directories=directories
+        )
+        print(f"Job stats: {job_stats.snapshot()}")
+        print(f"Request timings: {job_stats.timing_summary()}")
+        timings = job_stats.histograms_snapshot()
+        if timings:
+            write_timings_to_csv(timings, summary_filepath)
 
         if email_notification:
             print("Emailing results")
@@ -50,6 +131,17 @@ def process_csv_file(
         print(f"{file} has processed successfully, deleting file")
         file.unlink()
         return True
+    except CircuitOpenError as err:
+        # read again, as a sampled job's options are rewritten part way through
+        options = read_csv_options(file)
+        requeues = int(options.get("requeues") or 0) + 1
+        if requeues > Config.MAX_REQUEUES:
+            print(f"API unavailable while processing {file}, giving up after {Config.MAX_REQUEUES} tries: {err}")
+            file.replace(directories["FAILURES_DIR"] / file.name)
+        else:
+            print(f"API unavailable while processing {file}, leaving it in the queue: {err}")
+            update_csv_options(file, {**options, "requeues": str(requeues)})
+        raise
     except Exception as err:
         print(f"Error with file: {file}: {err}")
         output_path = directories["FAILURES_DIR"] / file.name
@@ -68,6 +160,18 @@ def process_files(files: list[Path], directories: dict):
             file.replace(output_path)
 
 
+def wait_for_api(breaker: CircuitBreaker) -> None:
+    """Pause the queue until a probe request gets a response from the breaker's host."""
+    while True:
+        delay = breaker.retry_in() or Config.CIRCUIT_RESET_TIMEOUT
+        print(f"Queue paused, probing {breaker.host} again in {delay:.0f}s")
+        time.sleep(delay)
+
+        if check_api_available(breaker.host):
+            print(f"{breaker.host} available again, resuming queue")
+            return
+
+
 def process_queue(lock_filepath: Path = Config.LOCK_FILEPATH, directories: dict = Config.directories):
     """
     This should be run as a subprocess by the main app
@@ -77,6 +181,8 @@ def process_queue(lock_filepath: Path = Config.LOCK_FILEPATH, directories: dict
         sys.exit(1)
 
     try:
+        get_pool().prewarm(Config.PREWARM_CONNECTIONS)
+
         while True:
             queue_dir = directories["QUEUE_DIR"]
             files = sorted(queue_dir.iterdir())
@@ -85,7 +191,11 @@ def process_queue(lock_filepath: Path = Config.LOCK_FILEPATH, directories: dict
                 print("No files to process, exiting.")
                 break
 
-            process_files(files, directories)
+            try:
+                process_files(files, directories)
+            except CircuitOpenError as err:
+                # the breaker that opened, which may be for the resolving host rather than the API
+                wait_for_api(get_circuit_breaker(err.host))
     finally:
         complete_dir = directories["COMPLETE_DIR"]
         print("checking for older files to delete")
@@ -1,6 +1,7 @@
 import re
 
-from helpers import get_list_from_str
+from helpers import get_list_from_str, split_doi_hosts
+from host_matcher import split_hosts
 from typing import Any
 
 
@@ -33,11 +34,13 @@ def is_email(value: str) -> dict:
 
 
 def is_host(value: str) -> dict:
-    if "." not in value:
-        return {"ok": False, "error": "Invalid host"}
-    if "http" in value:
-        return {"ok": False, "error": "Host should not contain protocol. Remove http from host."}
-    return {"ok": True, "value": value}
+    """One host, or several separated by commas or spaces, DOIs then have to resolve to any of them."""
+    for host in split_hosts(value):
+        if "." not in host:
+            return {"ok": False, "error": "Invalid host"}
+        if "http" in host:
+            return {"ok": False, "error": "Host should not contain protocol. Remove http from host."}
+    return {"ok": True, "value": ", ".join(split_hosts(value))}
 
 
 def is_doi(doi: str) -> bool:
@@ -50,16 +53,58 @@ def is_doi(doi: str) -> bool:
     return bool(re.search(doi_regex, doi.strip()))
 
 
+def is_prefix(value: str) -> dict:
+    if re.match(r"^10\.\d{4,9}$", value.strip()):
+        return {"ok": True, "value": value.strip()}
+    return {"ok": False, "error": "Invalid prefix, it should look like 10.1234"}
+
+
+def is_filter(value: str) -> dict:
+    """
+    Filters are comma separated name:value pairs, see:
+
+    https://api.crossref.org/swagger-ui/index.html#/Works/get_works
+    """
+    value = (value or "").strip()
+    if not value or re.match(r"^[a-z-]+:[^,]+(,[a-z-]+:[^,]+)*$", value):
+        return {"ok": True, "value": value}
+    return {"ok": False, "error": "Invalid filter, it should look like type:journal-article,from-pub-date:2020"}
+
+
+def is_backend(value: str) -> dict:
+    value = (value or "").strip()
+    if value in ("", "crossref", "handle", "redirects", "auto"):
+        return {"ok": True, "value": value}
+    return {"ok": False, "error": "Invalid lookup, it should be crossref, handle, redirects or auto"}
+
+
+def is_sample(value: str) -> dict:
+    value = (value or "").strip()
+    if value in ("", "prefix", "random"):
+        return {"ok": True, "value": value}
+    return {"ok": False, "error": "Invalid sample, it should be prefix or random"}
+
+
 def get_invalid_dois(doi_list: list[str]) -> list[str]:
     return [doi for doi in doi_list if not is_doi(doi)]
 
 
 def validate_dois(dois_text: str) -> dict:
+    """
+    A DOI per line, each optionally followed by a space and the hosts it should resolve to
+    if not the resolving host. The value is the list of lines, see split_doi_hosts.
+    """
     dois_list: list = get_list_from_str(dois_text)
-    invalid_dois = get_invalid_dois(dois_list)
+    dois, hosts = split_doi_hosts(dois_list)
+    invalid_dois = get_invalid_dois(dois)
 
     if invalid_dois:
         return {"ok": False, "error": f"Invalid DOIs given: {', '.join(invalid_dois)}"}
+
+    for doi, doi_hosts in hosts.items():
+        result = is_host(doi_hosts)
+        if not result["ok"]:
+            return {"ok": False, "error": f"{result['error']} given for {doi}"}
     return {"ok": True, "value": dois_list}
 
 
@@ -79,6 +124,12 @@ def validate_form(data: dict, session_token: str) -> dict:
     """
     Runs all form validation and returns dict of results
 
+    Either DOIs or a prefix to check every DOI under, with optional filters, must be given.
+    DOIs can be checked with the Handle API or by following their redirects instead of with Crossref,
+    by setting backend to handle or redirects, or routed by their registration agency with auto.
+    The resolving host can be several hosts, and each line of DOIs can give its DOI's own hosts after it.
+    Setting sample checks a sample of the DOIs first, and full_run then checks the rest too.
+
     Successful validation might look like:
 
     {'email': {'ok': True, 'value': 'someone@email.com'}, 'resolver': {'ok': True, 'value': 'anotherexample.com'}, 'dois_text': {'ok': True, 'value': 'doi-value'}}
@@ -86,10 +137,30 @@ def validate_form(data: dict, session_token: str) -> dict:
     results = {
         "csrf_token": validate_csrf_token(session_token, data.get("csrf_token", "")),
         "email": chain_validators(data.get("email"), is_required, is_email),
-        "resolver": chain_validators(data.get("resolving_host"), is_required, is_host),
-        "dois": chain_validators(data.get("dois_text"), is_required, validate_dois),
         "blank_field": chain_validators(data.get("blank_field"), must_be_empty),
     }
+
+    # the resolving host can be left out if every DOI is given its own hosts
+    lines = get_list_from_str(data.get("dois_text") or "")
+    if data.get("dois_text") and not data.get("prefix") and len(split_doi_hosts(lines)[1]) == len(lines):
+        results["resolver"] = chain_validators(data.get("resolving_host") or "", is_host)
+    else:
+        results["resolver"] = chain_validators(data.get("resolving_host"), is_required, is_host)
+
+    results["backend"] = chain_validators(data.get("backend"), is_backend)
+
+    results["sample"] = chain_validators(data.get("sample"), is_sample)
+
+    if data.get("prefix"):
+        if results["backend"].get("value") not in ("", "crossref"):
+            results["backend"] = {"ok": False, "error": "A prefix can only be checked with Crossref"}
+        if results["sample"].get("value"):
+            results["sample"] = {"ok": False, "error": "A prefix can't be sampled, give its DOIs instead"}
+        results["prefix"] = chain_validators(data.get("prefix"), is_prefix)
+        results["filters"] = chain_validators(data.get("filters"), is_filter)
+        results["dois"] = chain_validators(data.get("dois_text"), must_be_empty)
+    else:
+        results["dois"] = chain_validators(data.get("dois_text"), is_required, validate_dois)
     return results
 
 
@@ -0,0 +1,154 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.agencies import AgencyCache, ClientError, fetch_agencies, find_agencies, get_agency_url, iter_routed_data
+from src.doi_result import DOIResult, Status
+
+AGENCIES = {"10.1234": "Crossref", "10.5281": "DataCite", "10.3280": "mEDRA"}
+
+
+def answer(url):
+    """Stands in for doi.org/ra, DOIs ending in missing don't exist."""
+    items = []
+    for doi in url.removeprefix("/ra/").split(","):
+        if doi.endswith("missing"):
+            items.append({"DOI": doi, "status": "DOI does not exist"})
+        else:
+            items.append({"DOI": doi, "RA": AGENCIES[doi.split("/")[0]]})
+    return items
+
+
+@patch("builtins.print")
+class TestFindAgencies(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_json.side_effect = answer
+        self.cache = AgencyCache()
+        patcher = patch("src.agencies.create_client")
+        patcher.start().return_value.__enter__.return_value = self.client
+        self.addCleanup(patcher.stop)
+        patcher = patch("src.agencies.get_agency_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_agency_url(self, mock_print):
+        self.assertEqual(get_agency_url(["10.1234/a", "10.5281/b#c"]), "/ra/10.1234/a,10.5281/b%23c")
+
+    def test_fetch_agencies(self, mock_print):
+        found = fetch_agencies(self.client, ["10.1234/A", "10.1234/missing"])
+
+        self.assertEqual(found, {"10.1234/a": "Crossref", "10.1234/missing": None})
+
+    def test_fetch_agencies_failure(self, mock_print):
+        self.client.get_json.side_effect = ClientError("Received status 503")
+
+        self.assertEqual(fetch_agencies(self.client, ["10.1234/a"]), {})
+
+    def test_one_doi_per_prefix(self, mock_print):
+        agencies, missing = find_agencies(["10.1234/a", "10.1234/b", "10.5281/c", "10.3280/d"])
+
+        self.assertEqual(agencies, {"10.1234": "Crossref", "10.5281": "DataCite", "10.3280": "mEDRA"})
+        self.assertEqual(missing, set())
+        self.client.get_json.assert_called_once_with("/ra/10.1234/a,10.5281/c,10.3280/d")
+
+    def test_prefixes_are_cached(self, mock_print):
+        find_agencies(["10.1234/a", "10.5281/c"])
+        self.client.get_json.reset_mock()
+
+        agencies, _ = find_agencies(["10.1234/b", "10.5281/d", "10.3280/e"])
+
+        self.assertEqual(agencies["10.5281"], "DataCite")
+        self.client.get_json.assert_called_once_with("/ra/10.3280/e")
+
+    def test_tries_another_doi_if_missing(self, mock_print):
+        agencies, missing = find_agencies(["10.5281/missing", "10.5281/c", "10.1234/a"], batch_size=1)
+
+        self.assertEqual(agencies, {"10.5281": "DataCite", "10.1234": "Crossref"})
+        self.assertEqual(missing, {"10.5281/missing"})
+        self.assertEqual(
+            [call.args[0] for call in self.client.get_json.call_args_list],
+            ["/ra/10.5281/missing", "/ra/10.5281/c", "/ra/10.1234/a"],
+        )
+
+    def test_asks_about_several_dois_after_a_miss(self, mock_print):
+        dois = ["10.5281/1missing", "10.5281/2missing", "10.5281/c", "10.5281/d", "10.1234/a"]
+
+        agencies, missing = find_agencies(dois, retry_dois=3)
+
+        self.assertEqual(agencies, {"10.5281": "DataCite", "10.1234": "Crossref"})
+        self.assertEqual(missing, {"10.5281/1missing", "10.5281/2missing"})
+        self.assertEqual(
+            [call.args[0] for call in self.client.get_json.call_args_list],
+            ["/ra/10.5281/1missing,10.1234/a", "/ra/10.5281/2missing,10.5281/c,10.5281/d"],
+        )
+
+    def test_gives_up_on_a_prefix_after_max_misses(self, mock_print):
+        dois = [f"10.5281/{i}missing" for i in range(10)] + ["10.5281/c"]
+
+        agencies, missing = find_agencies(dois, retry_dois=2, max_misses=3)
+
+        self.assertEqual(agencies, {})
+        self.assertEqual(missing, {"10.5281/0missing", "10.5281/1missing", "10.5281/2missing"})
+        self.assertEqual(self.client.get_json.call_count, 2)
+
+
+@patch("builtins.print")
+@patch("src.agencies.find_agencies")
+@patch("src.agencies.iter_dois_data")
+class TestRouting(unittest.TestCase):
+    def setUp(self):
+        self.dois = ["10.1234/a", "10.5281/b", "10.1234/missing", "10.9999/unknown", "10.3280/c"]
+        self.agencies = ({"10.1234": "Crossref", "10.5281": "DataCite", "10.3280": "mEDRA"}, {"10.1234/missing"})
+
+    def lookup(self, dois, *args, backend, **kwargs):
+        for doi in dois:
+            yield DOIResult(doi, Status.SUCCESS, f"https://{backend}.example/{doi}")
+
+    def test_routes_by_agency(self, mock_iter_dois_data, mock_find_agencies, mock_print):
+        mock_find_agencies.return_value = self.agencies
+        mock_iter_dois_data.side_effect = self.lookup
+
+        results = list(iter_routed_data(self.dois, "example.org", other_backend="handle"))
+
+        self.assertEqual([result.doi for result in results], self.dois)
+        self.assertEqual(
+            [result.resolving_url for result in results],
+            [
+                "https://crossref.example/10.1234/a",
+                "https://handle.example/10.5281/b",
+                "not_found",
+                "https://crossref.example/10.9999/unknown",
+                "https://handle.example/10.3280/c",
+            ],
+        )
+        self.assertEqual(results[2].errors, "Resource not found.")
+        self.assertEqual(
+            [call.args[0] for call in mock_iter_dois_data.call_args_list],
+            [["10.1234/a", "10.9999/unknown"], ["10.5281/b", "10.3280/c"]],
+        )
+
+    def test_skips_other_agencies(self, mock_iter_dois_data, mock_find_agencies, mock_print):
+        mock_find_agencies.return_value = self.agencies
+        mock_iter_dois_data.side_effect = self.lookup
+
+        results = list(iter_routed_data(self.dois, "example.org", other_backend="skip"))
+
+        self.assertEqual(results[1].errors, "Registered with DataCite, not Crossref")
+        self.assertEqual(results[4].errors, "Registered with mEDRA, not Crossref")
+        mock_iter_dois_data.assert_called_once()
+
+    def test_routes_a_window_at_a_time(self, mock_iter_dois_data, mock_find_agencies, mock_print):
+        mock_find_agencies.return_value = self.agencies
+        mock_iter_dois_data.side_effect = self.lookup
+
+        results = list(iter_routed_data(self.dois, "example.org", window=2))
+
+        self.assertEqual([result.doi for result in results], self.dois)
+        self.assertEqual(
+            [call.args[0] for call in mock_find_agencies.call_args_list],
+            [self.dois[0:2], self.dois[2:4], self.dois[4:]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
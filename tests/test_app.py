@@ -1,5 +1,6 @@
 import json
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 from src.app import app
 from webtest import TestApp
@@ -68,7 +69,9 @@ class BottleAppTestCase(unittest.TestCase):
         mock_file2 = MagicMock()
         mock_file2.name = "complete2.csv"
 
-        mock_complete_dir.glob.return_value = [mock_file1, mock_file2]
+        timings_file = Path("complete2_timings.csv")
+
+        mock_complete_dir.glob.return_value = [mock_file1, mock_file2, timings_file]
         mock_directories.__getitem__.return_value = mock_complete_dir
         res = self.test_app.get("/completed")
 
@@ -94,6 +97,8 @@ class SubmitFormTestCase(unittest.TestCase):
     ):
         mock_validate_form.return_value = {
             "resolver": {"value": "resolver_host"},
+            "backend": {"value": ""},
+            "sample": {"value": ""},
             "email": {"value": "test@example.com"},
             "dois": {"value": "10.1000/xyz123"},
         }
@@ -121,6 +126,39 @@ class SubmitFormTestCase(unittest.TestCase):
         mock_add_csv_to_queue.assert_called_once()
         mock_start_queue.assert_called_once()
 
+    @patch("src.app.start_queue")
+    @patch("src.app.Config")
+    @patch("src.app.add_csv_to_queue")
+    @patch("src.app.get_errors")
+    @patch("src.app.validate_form")
+    def test_submit_prefix(
+        self, mock_validate_form, mock_get_errors, mock_add_csv_to_queue, mock_config, mock_start_queue
+    ):
+        mock_validate_form.return_value = {
+            "resolver": {"value": "resolver_host"},
+            "backend": {"value": ""},
+            "sample": {"value": ""},
+            "email": {"value": "test@example.com"},
+            "prefix": {"value": "10.1234"},
+            "filters": {"value": "type:journal-article"},
+            "dois": {"value": ""},
+        }
+        mock_get_errors.return_value = {}
+        mock_config.directories = {"QUEUE_DIR": "/fake/queue/dir"}
+        mock_config.LOCK_FILEPATH.is_file.return_value = True
+
+        res = self.test_app.post("/submit", params={"prefix": "10.1234"})
+
+        self.assertTrue(res.json["success"])
+        mock_add_csv_to_queue.assert_called_once_with(
+            queue_dir="/fake/queue/dir",
+            resolver_host="resolver_host",
+            email="test@example.com",
+            dois=[],
+            options={"backend": "", "sample": "", "prefix": "10.1234", "filter": "type:journal-article"},
+            hosts={},
+        )
+
     @patch("src.app.start_queue")
     @patch("src.app.Config")
     @patch("src.app.add_csv_to_queue")
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from src.async_client import AsyncClient, job_stats
+from src.latency import LatencyTracker
+from src.rate_limiter import RateLimiter
+
+
+class LocalServer:
+    """Minimal keep-alive HTTP/1.1 server that answers every request with a set response."""
+
+    def __init__(self, responses=None, chunked=False):
+        self.responses = responses or []
+        self.delays = []
+        self.chunked = chunked
+        # close a kept alive connection on its next request, as a server's idle timeout can
+        self.drop_reused = False
+        self.keep_alive = True
+        self.connections = 0
+        self.requests = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        handled = 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                path = request_line.split()[1].decode()
+                self.requests.append(path)
+                if self.drop_reused and handled:
+                    break
+                handled += 1
+
+                status = self.responses.pop(0) if self.responses else 200
+                body = json.dumps({"path": path}).encode()
+                await asyncio.sleep(self.delays.pop(0) if self.delays else 0.01)
+
+                if self.chunked:
+                    half = len(body) // 2
+                    payload = f"{half:x}\r\n".encode() + body[:half] + b"\r\n"
+                    payload += f"{len(body) - half:x}\r\n".encode() + body[half:] + b"\r\n0\r\n\r\n"
+                    writer.write(f"HTTP/1.1 {status} OK\r\nTransfer-Encoding: chunked\r\n\r\n".encode() + payload)
+                else:
+                    writer.write(f"HTTP/1.1 {status} OK\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+                if not self.keep_alive:
+                    break
+        finally:
+            writer.close()
+
+
+class TestAsyncClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = LocalServer()
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    def get_client(self, **kwargs):
+        return AsyncClient(
+            host="127.0.0.1", port=self.server.port, use_ssl=False, headers={"Accept": "application/json"}, **kwargs
+        )
+
+    def get_rate_limiter(self, rate):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        return RateLimiter(Path(temp_dir.name) / "test.bucket", rate=rate)
+
+    def get_tokens(self, limiter):
+        return limiter._update_state(lambda *state: state)[0]
+
+    @patch("builtins.print")
+    async def test_tokens_reserved_once_a_slot_is_free(self, mock_print):
+        limiter = self.get_rate_limiter(rate=5)
+
+        async with self.get_client(max_connections=2, rate_limiter=limiter) as client:
+            requests = [asyncio.create_task(client.request(f"/works/{i}")) for i in range(50)]
+            await asyncio.sleep(0.05)
+
+            # only the requests holding a slot have reserved a token, so the bucket is at most 2 in debt
+            self.assertGreaterEqual(self.get_tokens(limiter), -2)
+
+            for request in requests:
+                request.cancel()
+            await asyncio.gather(*requests, return_exceptions=True)
+            # tokens still being taken in a thread are given back once it finishes
+            await asyncio.get_running_loop().shutdown_default_executor()
+            await asyncio.sleep(0)
+
+        # and tokens waited on by cancelled requests are given back
+        self.assertGreaterEqual(self.get_tokens(limiter), 0)
+
+    @patch("builtins.print")
+    async def test_token_taken_after_cancelling_is_given_back(self, mock_print):
+        taking = threading.Event()
+        taken = threading.Event()
+        limiter = MagicMock()
+
+        def reserve():
+            taking.set()
+            taken.wait(5)
+            return 0
+
+        limiter.reserve.side_effect = reserve
+
+        async with self.get_client(rate_limiter=limiter) as client:
+            request = asyncio.create_task(client.request("/works/1"))
+            await asyncio.to_thread(taking.wait, 5)
+            request.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await request
+
+            # the token is taken after the request was cancelled
+            limiter.refund.assert_not_called()
+            taken.set()
+            await asyncio.get_running_loop().shutdown_default_executor()
+            await asyncio.sleep(0)
+
+        limiter.refund.assert_called_once()
+
+    @patch("builtins.print")
+    async def test_requests_share_connections(self, mock_print):
+        async with self.get_client(max_connections=3) as client:
+            responses = await asyncio.gather(*(client.request(f"/works/{i}") for i in range(50)))
+
+        self.assertEqual([response.status for response in responses], [200] * 50)
+        self.assertEqual(json.loads(client.get_response_data(responses[7])), {"path": "/works/7"})
+        self.assertLessEqual(self.server.connections, 3)
+        self.assertEqual(set(responses[0].timings), {"connect", "ttfb", "body"})
+        self.assertEqual(set(responses[-1].timings), {"ttfb", "body"})
+
+    @patch("builtins.print")
+    async def test_request_chunked_response(self, mock_print):
+        self.server.chunked = True
+
+        async with self.get_client() as client:
+            response = await client.request("/works/chunked")
+
+        self.assertEqual(json.loads(client.get_response_data(response)), {"path": "/works/chunked"})
+
+    @patch("builtins.print")
+    async def test_stale_connection_doesnt_use_an_attempt(self, mock_print):
+        self.server.drop_reused = True
+
+        async with self.get_client(max_retries=1) as client:
+            first = await client.request("/works/1")
+            second = await client.request("/works/2")
+
+        self.assertEqual([first.status, second.status], [200, 200])
+        self.assertEqual(self.server.requests, ["/works/1", "/works/2", "/works/2"])
+        self.assertEqual(self.server.connections, 2)
+
+    @patch("builtins.print")
+    async def test_connection_closed_while_idle_isnt_reused(self, mock_print):
+        self.server.keep_alive = False
+
+        async with self.get_client(max_retries=1) as client:
+            await client.request("/works/1")
+            await asyncio.sleep(0.05)
+            response = await client.request("/works/2")
+
+        self.assertEqual(response.status, 200)
+        self.assertNotIn("Reconnecting", str(mock_print.call_args_list))
+
+    @patch("builtins.print")
+    async def test_request_404_not_retried(self, mock_print):
+        self.server.responses = [404]
+
+        async with self.get_client() as client:
+            response = await client.request("/works/missing")
+
+        self.assertEqual(response.status, 404)
+        self.assertEqual(len(self.server.requests), 1)
+
+    @patch("builtins.print")
+    async def test_request_retry_success(self, mock_print):
+        self.server.responses = [500]
+
+        async with self.get_client(retry_delay=0) as client:
+            response = await client.request("/works/retry")
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(self.server.requests), 2)
+
+    @patch("builtins.print")
+    async def test_request_max_retries_exhausted(self, mock_print):
+        self.server.responses = [500, 500]
+
+        async with self.get_client(max_retries=2, retry_delay=0) as client:
+            response = await client.request("/works/failing")
+
+        self.assertIsNone(response)
+        mock_print.assert_any_call("Failed to fetch data after retries.")
+
+    @patch("builtins.print")
+    async def test_hedged_request_wins(self, mock_print):
+        job_stats.reset()
+        tracker = LatencyTracker(min_samples=1)
+        tracker.record(0.05)
+        self.server.delays = [2]
+
+        async with self.get_client(latency_tracker=tracker, hedge=True) as client:
+            response = await asyncio.wait_for(client.request("/works/hedged"), 1)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.server.requests, ["/works/hedged", "/works/hedged"])
+        self.assertEqual(job_stats.snapshot(), {"hedges_sent": 1, "hedge_wins": 1})
+
+    @patch("builtins.print")
+    @patch("src.latency.Config.MIN_TIMEOUT", 0.2)
+    async def test_adaptive_timeout_retries_stalled_request(self, mock_print):
+        tracker = LatencyTracker(min_samples=1)
+        tracker.record(0.01)
+        self.server.delays = [2]
+
+        async with self.get_client(latency_tracker=tracker, retry_delay=0) as client:
+            response = await asyncio.wait_for(client.request("/works/stalled"), 1)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(self.server.requests), 2)
+        # the timed out attempt is recorded at the timeout
+        self.assertIn(0.2, tracker.samples)
+        # the timed out attempt is recorded at the timeout
+        self.assertIn(0.2, tracker.samples)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.autotuner import ConcurrencyController
+
+
+def finish_round(controller, latency=0.1, status=200):
+    """Report a full round of requests at the current limit."""
+    for _ in range(controller.limit):
+        controller.acquire()
+    for _ in range(controller.limit):
+        controller.release(latency, status)
+
+
+@patch("builtins.print")
+class TestConcurrencyController(unittest.TestCase):
+    def test_slow_start_doubles_to_max(self, mock_print):
+        controller = ConcurrencyController(max_limit=10)
+
+        limits = []
+        for _ in range(5):
+            finish_round(controller)
+            limits.append(controller.limit)
+
+        self.assertEqual(limits, [2, 4, 8, 10, 10])
+
+    def test_halves_on_throttling_then_grows_additively(self, mock_print):
+        controller = ConcurrencyController(max_limit=20, initial_limit=8)
+
+        finish_round(controller, status=429)
+        self.assertEqual(controller.limit, 4)
+
+        finish_round(controller)
+        finish_round(controller)
+        self.assertEqual(controller.limit, 6)
+        mock_print.assert_any_call("Concurrency 8 -> 4: throttled or failed requests")
+
+    def test_halves_on_failed_request(self, mock_print):
+        controller = ConcurrencyController(max_limit=20, initial_limit=8)
+
+        finish_round(controller, status=None)
+
+        self.assertEqual(controller.limit, 4)
+
+    def test_halves_on_latency_inflation(self, mock_print):
+        controller = ConcurrencyController(max_limit=20, initial_limit=4, latency_tolerance=2)
+
+        finish_round(controller, latency=0.1)
+        self.assertEqual(controller.limit, 8)
+
+        finish_round(controller, latency=0.5)
+        self.assertEqual(controller.limit, 4)
+
+    def test_never_below_min_limit(self, mock_print):
+        controller = ConcurrencyController(max_limit=4, initial_limit=1)
+
+        finish_round(controller, status=503)
+
+        self.assertEqual(controller.limit, 1)
+
+    def test_acquire_keeps_to_limit(self, mock_print):
+        controller = ConcurrencyController(max_limit=3, initial_limit=3)
+        in_flight = []
+        lock = threading.Lock()
+
+        def worker():
+            controller.acquire()
+            with lock:
+                in_flight.append(controller.in_flight)
+            time.sleep(0.01)
+            controller.release(0.01, 200)
+
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(in_flight), 3)
+        self.assertEqual(controller.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
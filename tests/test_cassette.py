@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from src.async_client import AsyncClient
+from src.cassette import Cassette, CassetteMissError, RecordingTransport, ReplayTransport
+from src.http_client import BufferedResponse, Client, get_pool
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cassette = Cassette(Path(self.temp_dir.name) / "cassette.sqlite3")
+        self.body = gzip.compress(json.dumps({"message": {"DOI": "10.1234/test"}}).encode())
+        self.headers = [("Content-Encoding", "gzip"), ("Content-Length", str(len(self.body)))]
+
+    def tearDown(self):
+        self.cassette.close()
+        self.temp_dir.cleanup()
+
+    def test_record_and_find(self):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 0.25)
+
+        response, elapsed = self.cassette.find("GET", "api.test", "/works/1")
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("content-encoding"), "gzip")
+        self.assertEqual(response.read(), self.body)
+        self.assertEqual(elapsed, 0.25)
+
+    def test_replayed_in_recorded_order(self):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(503, "", [], b""), 1)
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 0.1)
+
+        statuses = [self.cassette.find("GET", "api.test", "/works/1")[0].status for _ in range(3)]
+
+        # the last response keeps being replayed once they run out
+        self.assertEqual(statuses, [503, 200, 200])
+
+    def test_recording_again_replaces(self):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(503, "", [], b""), 1)
+        self.cassette.close()
+        self.cassette = Cassette(self.cassette.path)
+
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 0.1)
+
+        self.assertEqual(self.cassette.find("GET", "api.test", "/works/1")[0].status, 200)
+
+    @patch("builtins.print")
+    @patch("src.http_client.time.sleep")
+    def test_replays_retries(self, mock_sleep, mock_print):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(503, "", [], b""), 1)
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 0.1)
+
+        with Client(host="api.test", pool=ReplayTransport(self.cassette, "api.test", realtime=False)) as client:
+            self.assertEqual(client.get_json("/works/1"), {"message": {"DOI": "10.1234/test"}})
+            self.assertEqual(client.last_status, 200)
+
+    def test_find_missing(self):
+        with self.assertRaises(CassetteMissError):
+            self.cassette.find("GET", "api.test", "/works/missing")
+
+    @patch("builtins.print")
+    def test_record_then_replay_through_client(self, mock_print):
+        live_response = MagicMock(status=200, reason="OK")
+        live_response.getheaders.return_value = self.headers
+        live_response.read.return_value = self.body
+        live_pool = MagicMock()
+        live_pool.lease.return_value.sock = None
+        live_pool.lease.return_value.getresponse.return_value = live_response
+
+        recording = RecordingTransport(live_pool, self.cassette, "api.test")
+        with Client(host="api.test", pool=recording) as client:
+            recorded = client.get_json("/works/1")
+
+        live_pool.release.assert_called_once_with(live_pool.lease.return_value)
+
+        with patch("time.sleep") as mock_sleep:
+            with Client(host="api.test", pool=ReplayTransport(self.cassette, "api.test")) as client:
+                replayed = client.get_json("/works/1")
+
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(replayed, {"message": {"DOI": "10.1234/test"}})
+        mock_sleep.assert_called_once()
+
+    @patch("builtins.print")
+    def test_replay_at_full_speed(self, mock_print):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 5)
+
+        with patch("time.sleep") as mock_sleep:
+            with Client(host="api.test", pool=ReplayTransport(self.cassette, "api.test", realtime=False)) as client:
+                client.get_json("/works/1")
+
+        mock_sleep.assert_not_called()
+
+    @patch("builtins.print")
+    def test_replay_async(self, mock_print):
+        self.cassette.record("GET", "api.test", "/works/1", BufferedResponse(200, "OK", self.headers, self.body), 5)
+
+        async def fetch():
+            async with AsyncClient(
+                host="api.test", cassette=self.cassette, replay=True, replay_latency=False
+            ) as client:
+                return await client.get_json("/works/1")
+
+        self.assertEqual(asyncio.run(fetch()), {"message": {"DOI": "10.1234/test"}})
+
+    @patch("src.http_client.Config.TRANSPORT_MODE", "replay")
+    @patch("src.http_client._pools", {})
+    def test_get_pool_replays(self):
+        with patch("src.http_client.Config.CASSETTE_FILEPATH", Path(self.temp_dir.name) / "pool.sqlite3"):
+            self.assertEqual(type(get_pool("api.test")).__name__, "ReplayTransport")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@patch("builtins.print")
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("api.test", failure_rate=0.5, window=10, min_requests=4, reset_timeout=30)
+
+    def test_stays_closed_below_min_requests(self, mock_print):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_request()
+
+    def test_opens_at_failure_rate(self, mock_print):
+        for status in (200, 503, 200, 500):
+            self.breaker.record_status(status)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError) as raised:
+            self.breaker.before_request()
+        self.assertEqual(raised.exception.host, "api.test")
+
+    def test_stays_closed_while_mostly_succeeding(self, mock_print):
+        for status in (200, 404, 200, 500, 200, 200):
+            self.breaker.record_status(status)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    @patch("src.circuit_breaker.time.monotonic")
+    def test_half_open_probe_closes(self, mock_monotonic, mock_print):
+        mock_monotonic.return_value = 100
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+        mock_monotonic.return_value = 131
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+        # only the one probe is let through
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_request()
+
+    @patch("src.circuit_breaker.time.monotonic")
+    def test_half_open_probe_failure_reopens(self, mock_monotonic, mock_print):
+        mock_monotonic.return_value = 100
+        for _ in range(4):
+            self.breaker.record_failure()
+
+        mock_monotonic.return_value = 131
+        self.breaker.before_request()
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,18 @@
 import unittest
-from unittest.mock import patch, MagicMock, call
-import json
+from unittest.mock import ANY, patch, MagicMock, call
+import asyncio
+import time
 
 from src.crossref import (
+    ClientError,
+    check_api_available,
+    fetch_batch,
     fetch_dois_data,
+    fetch_prefix_data,
+    get_handle_url,
+    iter_handle_data,
+    iter_dois_data,
+    new_doi_result,
     process_single_doi,
     get_resolving_url_for_doi,
     validate_resolving_url,
@@ -35,30 +44,131 @@ class TestCrossRefFunctions(unittest.TestCase):
         self.assertEqual(results[1], mock_result2)
 
         expected_calls = [
-            call(mock_client_instance, "10.1234/test1", "example.org", True),
-            call(mock_client_instance, "10.1234/test2", "example.org", True),
+            call(mock_client_instance, "10.1234/test1", "example.org", True, None),
+            call(mock_client_instance, "10.1234/test2", "example.org", True, None),
         ]
         mock_process_single_doi.assert_has_calls(expected_calls)
 
         mock_client_class.assert_called_once()
         mock_client_class.return_value.__exit__.assert_called_once()
 
+    @patch("src.crossref.Client")
+    def test_check_api_available_probes_the_host(self, mock_client_class):
+        client = mock_client_class.return_value
+        client.request.return_value.status = 302
+
+        self.assertTrue(check_api_available("doi.org"))
+
+        self.assertEqual(mock_client_class.call_args.kwargs["host"], "doi.org")
+        self.assertEqual(mock_client_class.call_args.kwargs["circuit_breaker"].host, "doi.org")
+        client.request.assert_called_once_with("/")
+
+    @patch("src.crossref.get_rate_limiter")
+    @patch("src.crossref.Client")
+    @patch("src.crossref.process_single_doi")
+    def test_fetch_dois_data_concurrently_keeps_order(
+        self, mock_process_single_doi, mock_client_class, mock_get_rate_limiter
+    ):
+        mock_get_rate_limiter.return_value.concurrency_limit = 0
+        dois = [f"10.1234/test{i}" for i in range(20)]
+
+        def process(client, doi, resolving_host, full_metadata, fields):
+            # later DOIs finish first
+            time.sleep((20 - int(doi.removeprefix("10.1234/test"))) / 1000)
+            return {"doi": doi, "status": "SUCCESS"}
+
+        mock_process_single_doi.side_effect = process
+        mock_client_class.side_effect = lambda **kwargs: MagicMock(last_status=200)
+
+        results = fetch_dois_data(dois, "example.org", True, jobs=4)
+
+        self.assertEqual([result["doi"] for result in results], dois)
+        self.assertLessEqual(mock_client_class.call_count, 4)
+        for client in {c.args[0] for c in mock_process_single_doi.call_args_list}:
+            client.close_connection.assert_called_once()
+
+    @patch("src.crossref.get_rate_limiter")
+    @patch("src.crossref.Client")
+    @patch("src.crossref.process_single_doi")
+    def test_iter_dois_data_looks_up_a_window_ahead(
+        self, mock_process_single_doi, mock_client_class, mock_get_rate_limiter
+    ):
+        mock_get_rate_limiter.return_value.concurrency_limit = 0
+        mock_process_single_doi.side_effect = lambda client, doi, *args: {"doi": doi}
+        mock_client_class.side_effect = lambda **kwargs: MagicMock(last_status=200)
+        dois = (f"10.1234/test{i}" for i in range(100))
+
+        results = iter_dois_data(dois, "example.org", True, jobs=2, window=10)
+
+        self.assertEqual(next(results), {"doi": "10.1234/test0"})
+        self.assertLessEqual(mock_process_single_doi.call_count, 11)
+        self.assertEqual(len(list(results)), 99)
+
+    @patch("src.crossref.fetch_dois_data")
+    def test_iter_dois_data_batches_in_windows(self, mock_fetch_dois_data):
+        mock_fetch_dois_data.side_effect = lambda dois, *args, **kwargs: [{"doi": doi} for doi in dois]
+
+        results = list(iter_dois_data([f"10.1234/{i}" for i in range(5)], use_async=True, window=2))
+
+        self.assertEqual(results, [{"doi": f"10.1234/{i}"} for i in range(5)])
+        self.assertEqual([len(call.args[0]) for call in mock_fetch_dois_data.call_args_list], [2, 2, 1])
+
+    @patch("src.crossref.fetch_dois_data")
+    def test_iter_dois_data_chunks_stay_with_crossref(self, mock_fetch_dois_data):
+        mock_fetch_dois_data.side_effect = lambda dois, *args, **kwargs: [{"doi": doi} for doi in dois]
+
+        list(iter_dois_data(["10.1234/a"], jobs=2, use_async=True, batch_size=50, backend="crossref"))
+
+        # with the default backend, BACKEND=auto would route the chunk again and recurse
+        self.assertEqual(mock_fetch_dois_data.call_args.kwargs["backend"], "crossref")
+
+    @patch("src.crossref.iter_handle_data")
+    @patch("src.crossref.fetch_batch", return_value={})
+    @patch("src.crossref.process_single_doi")
+    @patch("src.crossref.create_client")
+    def test_explicit_crossref_backend_is_kept(
+        self, mock_create_client, mock_process_single_doi, mock_fetch_batch, mock_iter_handle_data
+    ):
+        mock_process_single_doi.side_effect = lambda client, doi, *args: {"doi": doi}
+
+        with patch("src.crossref.Config.BACKEND", "handle"):
+            results = list(iter_dois_data(["10.1234/a"], batch_size=50, backend="crossref"))
+            # an empty backend is the configured one
+            list(iter_dois_data(["10.1234/b"], backend=""))
+
+        self.assertEqual(results, [{"doi": "10.1234/a"}])
+        mock_fetch_batch.assert_called_once()
+        self.assertEqual(mock_iter_handle_data.call_args.args[0], ["10.1234/b"])
+
+    @patch("src.crossref.AsyncClient")
     @patch("builtins.print")
-    def test_process_single_doi_success(self, mock_print):
+    def test_fetch_dois_data_async(self, mock_print, mock_client_class):
         mock_client = MagicMock()
-        mock_response = MagicMock()
+        mock_client_class.return_value.__aenter__.return_value = mock_client
+
+        async def get_json(url_path):
+            # later DOIs finish first
+            await asyncio.sleep((3 - int(url_path[-1])) / 1000)
+            return self.sample_response_dict
 
-        response_data = json.dumps(self.sample_response_dict)
+        mock_client.get_json.side_effect = get_json
+        dois = ["10.1234/test1", "10.1234/test2", "10.1234/test3"]
+
+        results = fetch_dois_data(dois, "example.org", True, jobs=5, use_async=True)
+
+        mock_client_class.assert_called_once()
+        self.assertEqual(mock_client_class.call_args.kwargs["max_connections"], 5)
+        self.assertEqual([result["doi"] for result in results], dois)
+        self.assertEqual([result["status"] for result in results], ["SUCCESS"] * 3)
 
-        mock_client.request.return_value = mock_response
-        mock_client.get_response_data.return_value = response_data
-        mock_client.get_json_dict_from_response.return_value = self.sample_response_dict
+    @patch("builtins.print")
+    def test_process_single_doi_success(self, mock_print):
+        mock_client = MagicMock()
+        mock_client.get_json.return_value = self.sample_response_dict
 
         result = process_single_doi(mock_client, self.sample_doi, "example.org", True)
 
-        mock_client.request.assert_called_once_with(f"/works/{self.sample_doi}")
-        mock_client.get_response_data.assert_called_once_with(mock_response)
-        mock_client.get_json_dict_from_response.assert_called_once_with(response_data)
+        mock_client.get_json.assert_called_once_with(f"/works/{self.sample_doi}")
 
         self.assertEqual(result["doi"], self.sample_doi)
         self.assertEqual(result["status"], "SUCCESS")
@@ -71,10 +181,7 @@ class TestCrossRefFunctions(unittest.TestCase):
     @patch("builtins.print")
     def test_process_single_doi_not_found(self, mock_print):
         mock_client = MagicMock()
-        mock_response = MagicMock()
-
-        mock_client.request.return_value = mock_response
-        mock_client.get_response_data.return_value = "Resource not found."
+        mock_client.get_json.side_effect = ClientError("Resource not found.")
 
         result = process_single_doi(mock_client, self.sample_doi, "example.org", True)
 
@@ -86,28 +193,29 @@ class TestCrossRefFunctions(unittest.TestCase):
     @patch("builtins.print")
     def test_process_single_doi_json_error(self, mock_print):
         mock_client = MagicMock()
-        mock_response = MagicMock()
-
-        mock_client.request.return_value = mock_response
-        mock_client.get_response_data.return_value = "valid response"
-        mock_client.get_json_dict_from_response.return_value = "ERROR parsing JSON"
+        mock_client.get_json.side_effect = ClientError("ERROR reading json from response")
 
         result = process_single_doi(mock_client, self.sample_doi, "example.org", True)
 
         self.assertEqual(result["doi"], self.sample_doi)
         self.assertEqual(result["status"], "FAILURE")
-        self.assertEqual(result["ERRORS"], "ERROR parsing JSON")
+        self.assertEqual(result["ERRORS"], "ERROR reading json from response")
 
     @patch("builtins.print")
-    def test_process_single_doi_no_full_metadata(self, mock_print):
+    def test_process_single_doi_request_failed(self, mock_print):
         mock_client = MagicMock()
-        mock_response = MagicMock()
+        mock_client.get_json.side_effect = ClientError("Failed to fetch data after retries.")
+
+        result = process_single_doi(mock_client, self.sample_doi, "example.org", True)
 
-        response_data = json.dumps(self.sample_response_dict)
+        self.assertEqual(result["status"], "FAILURE")
+        self.assertEqual(result["ERRORS"], "Failed to fetch data after retries.")
+        self.assertEqual(result["full_metadata"], {"message": {}})
 
-        mock_client.request.return_value = mock_response
-        mock_client.get_response_data.return_value = response_data
-        mock_client.get_json_dict_from_response.return_value = self.sample_response_dict
+    @patch("builtins.print")
+    def test_process_single_doi_no_full_metadata(self, mock_print):
+        mock_client = MagicMock()
+        mock_client.get_json.return_value = self.sample_response_dict
 
         result = process_single_doi(mock_client, self.sample_doi, "example.org", False)
 
@@ -129,13 +237,7 @@ class TestCrossRefFunctions(unittest.TestCase):
 
     @patch("builtins.print")
     def test_validate_resolving_url_success(self, mock_print):
-        result_dict = {
-            "doi": self.sample_doi,
-            "status": "FAILURE",
-            "resolving_url": "not_found",
-            "ERRORS": "",
-            "full_metadata": {"message": {}},
-        }
+        result_dict = new_doi_result(self.sample_doi)
 
         updated_result = validate_resolving_url(self.sample_doi, self.sample_response_dict, "example.org", result_dict)
 
@@ -145,13 +247,7 @@ class TestCrossRefFunctions(unittest.TestCase):
 
     @patch("builtins.print")
     def test_validate_resolving_url_failure(self, mock_print):
-        result_dict = {
-            "doi": self.sample_doi,
-            "status": "FAILURE",
-            "resolving_url": "not_found",
-            "ERRORS": "",
-            "full_metadata": {"message": {}},
-        }
+        result_dict = new_doi_result(self.sample_doi)
 
         updated_result = validate_resolving_url(
             self.sample_doi, self.sample_response_dict, "different-host.com", result_dict
@@ -161,15 +257,28 @@ class TestCrossRefFunctions(unittest.TestCase):
         self.assertEqual(updated_result["resolving_url"], "https://example.org/10.1234/test")
         self.assertTrue("does not resolve correctly" in updated_result["ERRORS"])
 
+    @patch("builtins.print")
+    def test_validate_resolving_url_matches_hostnames(self, mock_print):
+        for hosts, status in (
+            ("example.org", "SUCCESS"),
+            ("ample.org", "FAILURE"),
+            ("other.com, example.org", "SUCCESS"),
+        ):
+            result = validate_resolving_url(
+                self.sample_doi, self.sample_response_dict, hosts, new_doi_result(self.sample_doi)
+            )
+
+            self.assertEqual(result.status, status, hosts)
+
+        # the DOI's path isn't taken for its host
+        result = validate_resolving_url(
+            self.sample_doi, self.sample_response_dict, "10.1234", new_doi_result(self.sample_doi)
+        )
+        self.assertEqual(result.status, "FAILURE")
+
     @patch("builtins.print")
     def test_validate_resolving_url_no_url_found(self, mock_print):
-        result_dict = {
-            "doi": self.sample_doi,
-            "status": "FAILURE",
-            "resolving_url": "not_found",
-            "ERRORS": "",
-            "full_metadata": {"message": {}},
-        }
+        result_dict = new_doi_result(self.sample_doi)
 
         bad_response_dict = {"message": {}}
 
@@ -180,5 +289,243 @@ class TestCrossRefFunctions(unittest.TestCase):
         self.assertEqual(updated_result["ERRORS"], "Unable to find resolving URL in metadata")
 
 
+def work(doi, url):
+    return {"DOI": doi, "resource": {"primary": {"URL": url}}}
+
+
+@patch("builtins.print")
+class TestBatchLookups(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_json.return_value = {
+            "status": "ok",
+            "message-type": "work-list",
+            "message-version": "1.0.0",
+            "message": {
+                "items": [
+                    work("10.1234/abc", "https://example.org/abc"),
+                    work("10.1234/def", "https://other.org/def"),
+                ]
+            },
+        }
+
+    def test_fetch_batch(self, mock_print):
+        found = fetch_batch(self.client, ["10.1234/ABC", "10.1234/def", "10.1234/a&b"])
+
+        self.client.get_json.assert_called_once_with(
+            "/works?filter=doi:10.1234/ABC,doi:10.1234/def,doi:10.1234/a%26b&rows=3"
+        )
+        self.assertEqual(set(found), {"10.1234/abc", "10.1234/def"})
+        self.assertEqual(
+            found["10.1234/abc"],
+            {
+                "status": "ok",
+                "message-type": "work",
+                "message-version": "1.0.0",
+                "message": work("10.1234/abc", "https://example.org/abc"),
+            },
+        )
+
+    def test_fetch_batch_selects_fields(self, mock_print):
+        fetch_batch(self.client, ["10.1234/abc"], ["resource"])
+
+        self.client.get_json.assert_called_once_with("/works?filter=doi:10.1234/abc&rows=1&select=DOI,resource")
+
+    def test_process_single_doi_with_fields(self, mock_print):
+        self.client.get_json.return_value = {
+            "status": "ok",
+            "message": {**work("10.1234/ABC", "https://example.org/abc"), "title": ["A title"]},
+        }
+
+        result = process_single_doi(self.client, "10.1234/ABC", "example.org", True, ["resource"])
+
+        # select only works on list queries, so a single DOI is fetched whole and cut down
+        self.client.get_json.assert_called_once_with("/works/10.1234/ABC")
+        self.assertEqual(result["status"], "SUCCESS")
+        self.assertEqual(result["resolving_url"], "https://example.org/abc")
+        self.assertEqual(set(result["full_metadata"]["message"]), {"DOI", "resource"})
+
+    def test_process_single_doi_with_comma(self, mock_print):
+        self.client.get_json.return_value = {"status": "ok", "message": work("10.1000/a,b", "https://example.org/ab")}
+
+        result = process_single_doi(self.client, "10.1000/a,b", "example.org", False, ["DOI", "resource"])
+
+        self.client.get_json.assert_called_once_with("/works/10.1000/a%2Cb")
+        self.assertEqual(result["status"], "SUCCESS")
+
+    def test_process_single_doi_with_fields_not_found(self, mock_print):
+        self.client.get_json.side_effect = ClientError("Resource not found.")
+
+        result = process_single_doi(self.client, "10.1234/missing", "example.org", False, ["DOI", "resource"])
+
+        self.assertEqual(result["status"], "FAILURE")
+        self.assertEqual(result["ERRORS"], "Resource not found.")
+        self.assertEqual(result["resolving_url"], "not_found")
+
+    @patch("src.crossref.create_client")
+    def test_fetch_dois_data_summary_fields(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+
+        fetch_dois_data(["10.1234/abc", "10.1234/def"], "example.org", False, batch_size=2)
+        self.assertIn("&select=DOI,resource", self.client.get_json.call_args.args[0])
+
+        fetch_dois_data(["10.1234/abc", "10.1234/def"], "example.org", True, batch_size=2, fields=["title"])
+        self.assertIn("&select=DOI,title", self.client.get_json.call_args.args[0])
+
+        # single lookups are never sent as a filter
+        for full_metadata in (False, True):
+            fetch_dois_data(["10.1234/abc"], "example.org", full_metadata)
+            self.assertEqual(self.client.get_json.call_args.args[0], "/works/10.1234/abc")
+
+    def test_fetch_batch_failure(self, mock_print):
+        self.client.get_json.side_effect = ClientError("Received status 400")
+
+        self.assertEqual(fetch_batch(self.client, ["10.1234/abc"]), {})
+
+    @patch("src.crossref.create_client")
+    @patch("src.crossref.process_single_doi")
+    def test_fetch_dois_data_batched(self, mock_process_single_doi, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+        single_result = {"doi": "10.1234/missing", "status": "FAILURE", "ERRORS": "Resource not found."}
+        mock_process_single_doi.return_value = single_result
+        dois = ["10.1234/missing", "10.1234/ABC", "10.1234/def"]
+
+        results = fetch_dois_data(dois, "example.org", False, batch_size=5)
+
+        self.client.get_json.assert_called_once()
+        # only the DOI the batch didn't return is looked up on its own
+        self.assertEqual(
+            mock_process_single_doi.call_args.args[1:], ("10.1234/missing", "example.org", False, ["DOI", "resource"])
+        )
+        self.assertEqual([result["doi"] for result in results], dois)
+        self.assertEqual(results[0], single_result)
+        self.assertEqual(results[1]["status"], "SUCCESS")
+        self.assertEqual(results[1]["resolving_url"], "https://example.org/abc")
+        self.assertEqual(results[2]["status"], "FAILURE")
+
+    @patch("src.crossref.create_client")
+    def test_fetch_dois_data_batched_splits_batches(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+        self.client.get_json.return_value = {"status": "ok", "message": {"items": []}}
+        dois = [f"10.1234/{i}" for i in range(5)]
+
+        with patch("src.crossref.process_single_doi") as mock_process_single_doi:
+            mock_process_single_doi.side_effect = lambda client, doi, host, full, fields: {"doi": doi}
+            results = fetch_dois_data(dois, "", False, batch_size=2)
+
+        self.assertEqual(self.client.get_json.call_count, 3)
+        self.assertEqual(results, [{"doi": doi} for doi in dois])
+
+
+def works_page(items, next_cursor):
+    return {
+        "status": "ok",
+        "message-version": "1.0.0",
+        "message": {"total-results": 3, "items": items, "next-cursor": next_cursor},
+    }
+
+
+@patch("builtins.print")
+@patch("src.crossref.create_client")
+class TestPrefixPaging(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_json.side_effect = [
+            works_page([work("10.1234/a", "https://example.org/a"), work("10.1234/b", "https://other.org/b")], "c+1"),
+            works_page([work("10.1234/c", "https://example.org/c")], "c+2"),
+        ]
+
+    def test_fetch_prefix_data(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+
+        results = fetch_prefix_data("10.1234", "example.org", "type:journal-article", rows=2)
+
+        self.assertEqual(
+            [call.args[0] for call in self.client.get_json.call_args_list],
+            [
+                "/prefixes/10.1234/works?cursor=%2A&rows=2&filter=type:journal-article&select=DOI,resource",
+                "/prefixes/10.1234/works?cursor=c%2B1&rows=2&filter=type:journal-article&select=DOI,resource",
+            ],
+        )
+        self.assertEqual([result["doi"] for result in results], ["10.1234/a", "10.1234/b", "10.1234/c"])
+        self.assertEqual([result["status"] for result in results], ["SUCCESS", "FAILURE", "SUCCESS"])
+        self.assertEqual(results[0]["full_metadata"], {"message": {}})
+
+    def test_fetch_prefix_data_full_metadata(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+
+        results = fetch_prefix_data("10.1234", full_metadata=True, rows=2)
+
+        self.assertNotIn("select", self.client.get_json.call_args.args[0])
+        self.assertEqual(results[2]["full_metadata"]["message"], work("10.1234/c", "https://example.org/c"))
+
+    def test_fetch_prefix_data_page_failure(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+        self.client.get_json.side_effect = ClientError("Resource not found.")
+
+        with self.assertRaises(ClientError):
+            fetch_prefix_data("10.9999", "example.org")
+
+
+def handle(doi, url):
+    return {
+        "responseCode": 1,
+        "handle": doi,
+        "values": [{"index": 1, "type": "URL", "data": {"format": "string", "value": url}}],
+    }
+
+
+@patch("builtins.print")
+@patch("src.crossref.create_client")
+class TestHandleLookups(unittest.TestCase):
+    def setUp(self):
+        responses = {
+            "/api/handles/10.1234/a?type=URL": handle("10.1234/a", "https://example.org/a"),
+            "/api/handles/10.1234/b?type=URL": handle("10.1234/b", "https://other.org/b"),
+            "/api/handles/10.1234/c?type=URL": {"responseCode": 200, "handle": "10.1234/c", "values": []},
+        }
+
+        def get_json(url):
+            if url not in responses:
+                raise ClientError("Resource not found.")
+            return responses[url]
+
+        self.client = MagicMock()
+        self.client.get_json.side_effect = get_json
+
+    def test_get_handle_url(self, mock_create_client, mock_print):
+        self.assertEqual(get_handle_url("10.1234/a#b?c"), "/api/handles/10.1234/a%23b%3Fc?type=URL")
+
+    def test_iter_handle_data(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+
+        results = list(iter_handle_data(["10.1234/a", "10.1234/b", "10.1234/c", "10.1234/d"], "example.org"))
+
+        mock_create_client.assert_called_once_with(ANY, "doi.org")
+        self.assertEqual(
+            [result.summary_row() for result in results],
+            [
+                ("10.1234/a", "SUCCESS", "https://example.org/a", ""),
+                (
+                    "10.1234/b",
+                    "FAILURE",
+                    "https://other.org/b",
+                    "example.org NOT in https://other.org/b, 10.1234/b does not resolve correctly",
+                ),
+                ("10.1234/c", "FAILURE", "not_found", "Unable to find resolving URL in metadata"),
+                ("10.1234/d", "FAILURE", "not_found", "Resource not found."),
+            ],
+        )
+        self.assertTrue(all(result.full_metadata is None for result in results))
+
+    def test_fetch_dois_data_with_handle_backend(self, mock_create_client, mock_print):
+        mock_create_client.return_value.__enter__.return_value = self.client
+
+        results = fetch_dois_data(["10.1234/a"], "example.org", False, batch_size=50, backend="handle")
+
+        self.client.get_json.assert_called_once_with("/api/handles/10.1234/a?type=URL")
+        self.assertEqual(results[0]["status"], "SUCCESS")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from src.doi_result import MAX_INTERNED, DOIResult, Status, intern
+
+
+class TestDOIResult(unittest.TestCase):
+    def test_defaults_to_failure(self):
+        result = DOIResult("10.1234/test")
+
+        self.assertEqual(result.summary_row(), ("10.1234/test", "FAILURE", "not_found", ""))
+        self.assertIsNone(result.full_metadata)
+
+    def test_read_like_a_dict(self):
+        result = DOIResult("10.1234/test", Status.SUCCESS, "https://example.org/test", errors="")
+
+        self.assertEqual(result["status"], "SUCCESS")
+        self.assertEqual(result["resolving_url"], "https://example.org/test")
+        self.assertEqual(result["ERRORS"], "")
+        self.assertEqual(result["full_metadata"], {"message": {}})
+        with self.assertRaises(KeyError):
+            result["missing"]
+
+    def test_no_instance_dict(self):
+        result = DOIResult("10.1234/test")
+
+        with self.assertRaises(AttributeError):
+            result.other = 1
+
+    def test_as_dict(self):
+        result = DOIResult("10.1234/test", errors="Resource not found.", full_metadata={"message": {"DOI": "x"}})
+
+        self.assertEqual(
+            result.as_dict(),
+            {
+                "doi": "10.1234/test",
+                "status": "FAILURE",
+                "resolving_url": "not_found",
+                "ERRORS": "Resource not found.",
+                "full_metadata": {"message": {"DOI": "x"}},
+            },
+        )
+
+
+class TestIntern(unittest.TestCase):
+    def setUp(self):
+        intern.cache_clear()
+
+    def test_shares_equal_strings(self):
+        first = intern("".join(["Received status ", "503"]))
+        second = intern("".join(["Received status ", "503"]))
+
+        self.assertIs(first, second)
+
+    def test_least_recently_used_are_dropped(self):
+        repeated = intern("".join(["Received status ", "503"]))
+        dropped = intern("".join(["one ", "off"]))
+
+        for i in range(MAX_INTERNED):
+            intern(f"10.1234/{i} not found")
+            if i % 1000 == 0:
+                self.assertIs(intern("".join(["Received status ", "503"])), repeated)
+
+        self.assertIs(intern("".join(["Received status ", "503"])), repeated)
+        self.assertIsNot(intern("".join(["one ", "off"])), dropped)
+        self.assertEqual(intern.cache_info().currsize, MAX_INTERNED)
+
+
+if __name__ == "__main__":
+    unittest.main()
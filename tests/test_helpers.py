@@ -11,11 +11,19 @@ from src.helpers import (
     create_log_filename,
     create_lockfile,
     get_list_from_str,
+    read_csv_options,
+    read_expected_hosts,
     read_full_csv_data,
     read_dois_from_csv,
     remove_old_complete_files,
+    split_doi_hosts,
+    update_csv_options,
     write_resolving_host_summary_to_csv,
+    write_results_to_csv,
+    write_timings_to_csv,
 )
+from src.doi_result import DOIResult, Status
+from src.stats import Stats
 
 
 class TestHelperFunctions(unittest.TestCase):
@@ -203,6 +211,43 @@ class TestCSVReaderFunctions(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             read_dois_from_csv("non_existent_file.csv")
 
+    def test_read_csv_options(self):
+        csv_data = f"{self.sample_email},prefix=10.1234,filter=type:journal-article\n{self.sample_host}\n"
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            self.assertEqual(
+                read_csv_options("dummy_path.csv"), {"prefix": "10.1234", "filter": "type:journal-article"}
+            )
+
+        with patch("builtins.open", mock_open(read_data=self.full_csv_content)):
+            self.assertEqual(read_csv_options("dummy_path.csv"), {})
+
+    def test_update_csv_options(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "job.csv"
+            path.write_text(f"{self.sample_email},sample=random\n{self.sample_host}\n10.1234/test1\n")
+
+            update_csv_options(path, {"sample": "", "sample_done": "true"})
+
+            self.assertEqual(read_csv_options(path), {"sample_done": "true"})
+            self.assertEqual(read_full_csv_data(path), (self.sample_email, self.sample_host, ["10.1234/test1"]))
+            self.assertEqual(os.listdir(temp_dir), ["job.csv"])
+
+    def test_read_expected_hosts(self):
+        csv_data = f"{self.sample_email}\n{self.sample_host},example.net\n10.1234/test1\n10.1234/test2,other.org,example.net\n10.1234/test3,\n"
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            self.assertEqual(read_expected_hosts("dummy_path.csv"), {"10.1234/test2": "other.org, example.net"})
+
+        with patch("builtins.open", mock_open(read_data=csv_data)):
+            self.assertEqual(read_full_csv_data("dummy_path.csv")[1], "example.org, example.net")
+
+    def test_split_doi_hosts(self):
+        dois, hosts = split_doi_hosts(["10.1234/test1", "10.1234/test2 other.org,example.net ", ""])
+
+        self.assertEqual(dois, ["10.1234/test1", "10.1234/test2", ""])
+        self.assertEqual(hosts, {"10.1234/test2": "other.org, example.net"})
+
     def test_read_full_csv_data_malformed(self):
         malformed_csv = f"{self.sample_email}"
 
@@ -253,14 +298,36 @@ class TestCSVWriterFunctions(unittest.TestCase):
                 self.assertEqual(rows[2], [dois[0]])
                 self.assertEqual(rows[3], [dois[1]])
 
+    def test_add_csv_to_queue_with_options(self):
+        options = {"prefix": "10.1234", "filter": "type:journal-article,from-pub-date:2020"}
+
+        output_path = add_csv_to_queue(self.temp_path, "test.resolver.com", "test@example.com", [], options)
+
+        self.assertEqual(read_csv_options(output_path), options)
+        self.assertEqual(read_full_csv_data(output_path), ("test@example.com", "test.resolver.com", []))
+
+    def test_add_csv_to_queue_with_hosts(self):
+        dois = ["10.1234/test1", "10.1234/test2"]
+
+        output_path = add_csv_to_queue(
+            self.temp_path, "a.com, b.org", "test@example.com", dois, hosts={"10.1234/test2": "other.org, example.net"}
+        )
+
+        self.assertTrue(output_path.name.startswith("checks_to_a.com_b.org_"))
+        self.assertEqual(read_full_csv_data(output_path), ("test@example.com", "a.com, b.org", dois))
+        self.assertEqual(read_expected_hosts(output_path), {"10.1234/test2": "other.org, example.net"})
+
     def test_write_resolving_host_summary_to_csv(self):
         resolving_host = "test.resolver.com"
         results = [
-            {"doi": "10.1234/test1", "status": "success", "full_metadata": {"message": {"title": "Test1"}}},
-            {"doi": "10.1234/test2", "status": "error", "full_metadata": {"message": {"title": "Test2"}}},
+            DOIResult("10.1234/test1", Status.SUCCESS, full_metadata={"message": {"title": "Test1"}}),
+            DOIResult("10.1234/test2", Status.FAILURE, full_metadata={"message": {"title": "Test2"}}),
         ]
 
-        expected_results = [{"doi": "10.1234/test1", "status": "success"}, {"doi": "10.1234/test2", "status": "error"}]
+        expected_results = [
+            {"doi": "10.1234/test1", "status": "SUCCESS"},
+            {"doi": "10.1234/test2", "status": "FAILURE"},
+        ]
 
         with patch("src.helpers.create_log_filename") as mock_create_filename:
             mock_create_filename.return_value = "test_summary.csv"
@@ -273,7 +340,7 @@ class TestCSVWriterFunctions(unittest.TestCase):
                 reader = csv.DictReader(file)
                 saved_rows = list(reader)
 
-                self.assertEqual(set(reader.fieldnames), set(expected_results[0].keys()))
+                self.assertEqual(reader.fieldnames, ["doi", "status", "resolving_url", "ERRORS"])
                 self.assertEqual(len(saved_rows), 2)
                 self.assertEqual(saved_rows[0]["doi"], expected_results[0]["doi"])
                 self.assertEqual(saved_rows[0]["status"], expected_results[0]["status"])
@@ -285,7 +352,7 @@ class TestCSVWriterFunctions(unittest.TestCase):
         os.makedirs(directories["COMPLETE_DIR"], exist_ok=True)
 
         resolving_host = "test.resolver.com"
-        results = [{"doi": "10.1234/test", "status": "success", "full_metadata": {"message": {}}}]
+        results = [DOIResult("10.1234/test")]
 
         with patch("src.helpers.create_log_filename") as mock_create_filename:
             mock_create_filename.return_value = "test_custom_dir.csv"
@@ -296,6 +363,76 @@ class TestCSVWriterFunctions(unittest.TestCase):
             self.assertEqual(output_path, expected_path)
             self.assertTrue(output_path.exists())
 
+    def test_write_results_to_csv_streams_both_files(self):
+        def results():
+            yield DOIResult("10.1234/a", errors="Resource not found.")
+            yield DOIResult(
+                "10.1234/b",
+                Status.SUCCESS,
+                "https://example.org/b",
+                full_metadata={"message": {"DOI": "10.1234/b", "title": "B"}},
+            )
+            yield DOIResult(
+                "10.1234/c", Status.SUCCESS, "https://example.org/c", full_metadata={"message": {"DOI": "10.1234/c"}}
+            )
+
+        with patch("src.helpers.create_log_filename", side_effect=["summary.csv", "full.csv"]):
+            output_path = write_results_to_csv("example.org", results(), full_metadata=True, output_dir=self.temp_path)
+
+        self.assertEqual(output_path, self.temp_path / "summary.csv")
+        with open(output_path, newline="") as file:
+            self.assertEqual(
+                list(csv.reader(file)),
+                [
+                    ["doi", "status", "resolving_url", "ERRORS"],
+                    ["10.1234/a", "FAILURE", "not_found", "Resource not found."],
+                    ["10.1234/b", "SUCCESS", "https://example.org/b", ""],
+                    ["10.1234/c", "SUCCESS", "https://example.org/c", ""],
+                ],
+            )
+        with open(self.temp_path / "full.csv", newline="") as file:
+            self.assertEqual(list(csv.reader(file)), [["DOI", "title"], ["10.1234/b", "B"], ["10.1234/c", ""]])
+
+    def test_write_results_to_csv_fails_on_new_full_metadata_fields(self):
+        def results():
+            yield DOIResult("10.1234/a", Status.SUCCESS, full_metadata={"message": {"DOI": "10.1234/a"}})
+            yield DOIResult("10.1234/b", Status.SUCCESS, full_metadata={"message": {"DOI": "10.1234/b", "x": 1}})
+
+        with self.assertRaisesRegex(ValueError, "10.1234/b has fields not in the full metadata csv columns: x"):
+            write_results_to_csv("example.org", results(), full_metadata=True, output_dir=self.temp_path)
+
+        self.assertEqual(list(self.temp_path.iterdir()), [])
+
+    def test_write_results_to_csv_removes_partial_files(self):
+        def results():
+            yield DOIResult("10.1234/a", Status.SUCCESS, full_metadata={"message": {"DOI": "10.1234/a"}})
+            raise RuntimeError("lookup failed")
+
+        with self.assertRaises(RuntimeError):
+            write_results_to_csv("example.org", results(), full_metadata=True, output_dir=self.temp_path)
+
+        self.assertEqual(list(self.temp_path.iterdir()), [])
+
+    def test_write_timings_to_csv(self):
+        stats = Stats()
+        for seconds in (0.02, 0.03, 0.2):
+            stats.observe("ttfb", seconds)
+        stats.observe("dns", 0.004)
+
+        output_path = write_timings_to_csv(stats.histograms_snapshot(), self.temp_path / "results_summary.csv")
+
+        self.assertEqual(output_path, self.temp_path / "results_summary_timings.csv")
+        with open(output_path, mode="r", newline="") as file:
+            rows = list(csv.DictReader(file))
+
+        self.assertEqual([row["phase"] for row in rows], ["dns", "ttfb"])
+        self.assertEqual(rows[1]["count"], "3")
+        self.assertEqual(rows[1]["p50"], "0.05")
+        self.assertEqual(rows[1]["max"], "0.2")
+        self.assertEqual(rows[1]["le_0.025"], "1")
+        self.assertEqual(rows[1]["le_0.05"], "1")
+        self.assertEqual(rows[1]["le_0.25"], "1")
+
 
 if __name__ == "__main__":
     unittest.main()
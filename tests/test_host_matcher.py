@@ -0,0 +1,81 @@
+import unittest
+
+from src.host_matcher import ExpectedHosts, HostMatcher, compile_hosts, get_host_matcher, parse_host, split_hosts
+
+
+class TestHostMatcher(unittest.TestCase):
+    def test_split_hosts(self):
+        self.assertEqual(
+            split_hosts("example.com, example.org\tjournals.example.net,,"),
+            ["example.com", "example.org", "journals.example.net"],
+        )
+
+    def test_parse_host(self):
+        self.assertEqual(parse_host("Example.COM"), ("example.com", None, ""))
+        self.assertEqual(parse_host("https://www.example.com/journals/"), ("www.example.com", None, "/journals"))
+        self.assertEqual(parse_host("127.0.0.1:8080"), ("127.0.0.1", 8080, ""))
+
+    def test_matches_hosts_and_subdomains(self):
+        matcher = HostMatcher(["example.com", "publisher.org"])
+
+        self.assertTrue(matcher.matches("https://example.com/10.1234/a"))
+        self.assertTrue(matcher.matches("https://www.EXAMPLE.com/10.1234/a"))
+        self.assertTrue(matcher.matches("http://journals.publisher.org./a?ref=example.net"))
+        self.assertFalse(matcher.matches("https://notexample.com/a"))
+        self.assertFalse(matcher.matches("https://example.com.evil.net/a"))
+        self.assertFalse(matcher.matches("https://other.net/example.com"))
+        self.assertFalse(matcher.matches("not a url"))
+
+    def test_ports_only_checked_if_given(self):
+        matcher = HostMatcher(["127.0.0.1:8080", "example.com"])
+
+        self.assertTrue(matcher.matches("http://127.0.0.1:8080/a"))
+        self.assertFalse(matcher.matches("http://127.0.0.1:9090/a"))
+        self.assertTrue(matcher.matches("https://example.com:8443/a"))
+        self.assertFalse(matcher.matches("https://example.com:bad/a"))
+
+    def test_path_prefixes(self):
+        matcher = HostMatcher(["platform.org/journals/", "platform.org:8443/books", "example.com"])
+
+        self.assertTrue(matcher.matches("https://platform.org/journals/a"))
+        self.assertTrue(matcher.matches("https://www.platform.org/journals"))
+        self.assertFalse(matcher.matches("https://platform.org/journalsx/a"))
+        self.assertFalse(matcher.matches("https://platform.org/other/journals/a"))
+        self.assertFalse(matcher.matches("https://platform.org/books/a"))
+        self.assertTrue(matcher.matches("https://platform.org:8443/books/a"))
+        self.assertTrue(matcher.matches("https://example.com/anything"))
+
+    def test_empty(self):
+        self.assertFalse(HostMatcher([]))
+        self.assertFalse(compile_hosts(" , "))
+
+    def test_compiled_once(self):
+        self.assertIs(compile_hosts("example.com, example.org"), compile_hosts("example.com, example.org"))
+        self.assertEqual(str(compile_hosts("example.com, example.org")), "example.com, example.org")
+
+
+class TestExpectedHosts(unittest.TestCase):
+    def test_per_doi_hosts(self):
+        expected = ExpectedHosts("example.com", {"10.1234/B": "other.org, example.net"})
+
+        self.assertTrue(expected.for_doi("10.1234/a").matches("https://www.example.com/a"))
+        self.assertTrue(expected.for_doi("10.1234/b").matches("https://example.net/b"))
+        self.assertFalse(expected.for_doi("10.1234/b").matches("https://example.com/b"))
+
+    def test_per_doi_hosts_without_default(self):
+        expected = ExpectedHosts("", {"10.1234/b": "other.org"})
+
+        self.assertTrue(expected)
+        self.assertFalse(ExpectedHosts())
+        self.assertFalse(expected.for_doi("10.1234/a").matches("https://other.org/a"))
+
+    def test_get_host_matcher(self):
+        matcher = HostMatcher(["example.com"])
+
+        self.assertIs(get_host_matcher(matcher, "10.1234/a"), matcher)
+        self.assertIs(get_host_matcher("example.com", "10.1234/a"), compile_hosts("example.com"))
+        self.assertEqual(str(get_host_matcher(ExpectedHosts("", {"10.1234/a": "a.org"}), "10.1234/a")), "a.org")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import importlib.util
+import json
+import socket
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.http_client import Client
+
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+if HAS_H2:
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    from src.http2_transport import Http2Transport
+
+
+class RecordingSocket:
+    """Wraps a socket, noting the threads that read from and write to it."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.threads = set()
+
+    def send(self, data):
+        self.threads.add(threading.current_thread())
+        return self.sock.send(data)
+
+    def recv(self, size):
+        self.threads.add(threading.current_thread())
+        return self.sock.recv(size)
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+class LocalH2Server:
+    """HTTP/2 stand-in server over plain TCP, answers each request with its path as JSON."""
+
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        self.not_found = set()
+        # paths that are never answered
+        self.unanswered = set()
+        self.client_socks = []
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                client_sock, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self.client_socks.append(client_sock)
+            threading.Thread(target=self.handle, args=(client_sock,), daemon=True).start()
+
+    def handle(self, client_sock):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        client_sock.sendall(conn.data_to_send())
+        pending = []
+
+        while True:
+            try:
+                data = client_sock.recv(65535)
+            except OSError:
+                return
+            if not data:
+                return
+
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    headers = dict(event.headers)
+                    pending.append((event.stream_id, headers[b":path"].decode()))
+
+            # answer everything received so far together, so streams overlap
+            for stream_id, path in pending:
+                if path in self.unanswered:
+                    continue
+                status = "404" if path in self.not_found else "200"
+                body = json.dumps({"path": path}).encode()
+                conn.send_headers(stream_id, [(":status", status), ("content-type", "application/json")])
+                conn.send_data(stream_id, body, end_stream=True)
+            pending.clear()
+            try:
+                client_sock.sendall(conn.data_to_send())
+            except OSError:
+                return
+
+    def drop_connections(self):
+        for client_sock in self.client_socks:
+            client_sock.shutdown(socket.SHUT_RDWR)
+            client_sock.close()
+        self.client_socks.clear()
+
+    def close(self):
+        self.sock.close()
+        self.drop_connections()
+
+
+@unittest.skipUnless(HAS_H2, "h2 is not installed")
+class TestHttp2Transport(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalH2Server()
+        self.transport = Http2Transport("127.0.0.1", port=self.server.port, timeout=5, use_tls=False)
+        self.addCleanup(self.server.close)
+        self.addCleanup(self.transport.close)
+
+    def get_json(self, url):
+        with Client(host="127.0.0.1", headers={"Accept": "application/json"}, pool=self.transport) as client:
+            response = client.request(url)
+            return response.status, json.loads(client.get_response_data(response))
+
+    @patch("builtins.print")
+    def test_concurrent_requests_share_one_connection(self, mock_print):
+        results = {}
+
+        def fetch(index):
+            results[index] = self.get_json(f"/works/{index}")
+
+        threads = [threading.Thread(target=fetch, args=(index,)) for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {index: (200, {"path": f"/works/{index}"}) for index in range(20)})
+        self.assertEqual(self.server.connections, 1)
+
+    @patch("builtins.print")
+    def test_request_404(self, mock_print):
+        self.server.not_found.add("/works/missing")
+
+        status, body = self.get_json("/works/missing")
+
+        self.assertEqual(status, 404)
+        self.assertEqual(body, {"path": "/works/missing"})
+
+    @patch("builtins.print")
+    def test_reconnects_after_server_closes_connection(self, mock_print):
+        self.assertEqual(self.get_json("/works/1")[0], 200)
+
+        self.server.drop_connections()
+        self.transport.connection.io_thread.join(timeout=5)
+
+        self.assertEqual(self.get_json("/works/2"), (200, {"path": "/works/2"}))
+        self.assertEqual(self.server.connections, 2)
+
+    @patch("builtins.print")
+    def test_socket_only_used_by_one_thread(self, mock_print):
+        connection = self.transport.get_connection()
+        connection.sock = RecordingSocket(connection.sock)
+
+        threads = [threading.Thread(target=self.get_json, args=(f"/works/{index}",)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(connection.sock.threads, {connection.io_thread})
+
+    @patch("builtins.print")
+    def test_client_timeout_applies_to_the_stream(self, mock_print):
+        self.server.unanswered.add("/works/slow")
+
+        started = time.monotonic()
+        with Client(host="127.0.0.1", timeout=0.2, max_retries=1, pool=self.transport) as client:
+            self.assertIsNone(client.request("/works/slow"))
+
+        # the transport's own timeout is 5s
+        self.assertLess(time.monotonic() - started, 2)
+
+    @patch("builtins.print")
+    def test_response_headers(self, mock_print):
+        with Client(host="127.0.0.1", pool=self.transport) as client:
+            response = client.request("/works/1")
+
+        self.assertEqual(response.getheader("Content-Type"), "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()
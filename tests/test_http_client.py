@@ -1,9 +1,38 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import http.client
+import io
+import json
+import select
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import shutil
 import socket
-
-from src.http_client import Client
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+
+from src import http_client
+from src.latency import LatencyTracker
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.http_client import (
+    CachingHTTPSConnection,
+    Client,
+    ConnectionPool,
+    DNSCache,
+    NotFoundError,
+    RequestFailedError,
+    ResponseParseError,
+    RetryBudget,
+    TLSSessionCache,
+    get_pool,
+    get_retry_delay,
+    is_stale,
+    parse_retry_after,
+)
 
 
 class TestClient(unittest.TestCase):
@@ -12,8 +41,7 @@ class TestClient(unittest.TestCase):
         self.test_headers = {"Content-Type": "application/json"}
         self.client = Client(timeout=10, max_retries=2, retry_delay=1, host=self.test_host, headers=self.test_headers)
 
-    @patch("ssl.create_default_context")
-    def test_init(self, mock_ssl_context):
+    def test_init(self):
         """Test initialization with custom values"""
         client = Client(timeout=10, max_retries=2, retry_delay=1, host=self.test_host, headers=self.test_headers)
 
@@ -22,10 +50,10 @@ class TestClient(unittest.TestCase):
         self.assertEqual(client.retry_delay, 1)
         self.assertEqual(client.host, self.test_host)
         self.assertEqual(client.headers, self.test_headers)
-        mock_ssl_context.assert_called_once()
+        self.assertIs(client.context, self.client.context)
         self.assertIsNone(client.conn)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     def test_enter(self, mock_https_conn):
         """Test __enter__ method"""
         mock_connection = MagicMock()
@@ -36,7 +64,7 @@ class TestClient(unittest.TestCase):
             mock_https_conn.assert_called_once_with(host=self.test_host, timeout=10, context=self.client.context)
             self.assertEqual(client.conn, mock_connection)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     def test_exit(self, mock_https_conn):
         """Test __exit__ method"""
         mock_connection = MagicMock()
@@ -48,7 +76,7 @@ class TestClient(unittest.TestCase):
         mock_connection.close.assert_called_once()
         self.assertIsNone(self.client.conn)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     def test_create_connection(self, mock_https_conn):
         mock_connection = MagicMock()
         mock_https_conn.return_value = mock_connection
@@ -67,7 +95,7 @@ class TestClient(unittest.TestCase):
         mock_conn.close.assert_called_once()
         self.assertIsNone(self.client.conn)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     @patch("builtins.print")
     @patch("time.sleep")
     def test_request_success(self, mock_sleep, mock_print, mock_https_conn):
@@ -83,7 +111,7 @@ class TestClient(unittest.TestCase):
         mock_connection.request.assert_called_once_with("GET", "/api/endpoint", headers={"X-Custom": "Value"})
         self.assertEqual(result, mock_response)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     @patch("builtins.print")
     @patch("time.sleep")
     def test_request_404(self, mock_sleep, mock_print, mock_https_conn):
@@ -99,10 +127,11 @@ class TestClient(unittest.TestCase):
         mock_connection.request.assert_called_once()
         self.assertEqual(result, mock_response)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     @patch("builtins.print")
     @patch("time.sleep")
-    def test_request_retry_success(self, mock_sleep, mock_print, mock_https_conn):
+    @patch("random.uniform", side_effect=lambda low, high: high)
+    def test_request_retry_success(self, mock_uniform, mock_sleep, mock_print, mock_https_conn):
         """Test retry that eventually succeeds"""
         mock_connection = MagicMock()
         mock_https_conn.return_value = mock_connection
@@ -126,10 +155,11 @@ class TestClient(unittest.TestCase):
 
         self.assertEqual(result, mock_success_response)
 
-    @patch("http.client.HTTPSConnection")
+    @patch("src.http_client.CachingHTTPSConnection")
     @patch("builtins.print")
     @patch("time.sleep")
-    def test_request_max_retries_exhausted(self, mock_sleep, mock_print, mock_https_conn):
+    @patch("random.uniform", side_effect=lambda low, high: high)
+    def test_request_max_retries_exhausted(self, mock_uniform, mock_sleep, mock_print, mock_https_conn):
         mock_connection = MagicMock()
         mock_https_conn.return_value = mock_connection
 
@@ -144,6 +174,160 @@ class TestClient(unittest.TestCase):
 
         mock_print.assert_any_call("Failed to fetch data after retries.")
 
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_client_error_not_retried(self, mock_sleep, mock_print, mock_https_conn):
+        mock_response = mock_https_conn.return_value.getresponse.return_value
+        mock_response.status = 400
+
+        result = self.client.request("/api/endpoint")
+
+        self.assertEqual(result, mock_response)
+        mock_https_conn.return_value.request.assert_called_once()
+        mock_sleep.assert_not_called()
+        self.assertEqual(self.client.last_status, 400)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_honours_retry_after(self, mock_sleep, mock_print, mock_https_conn):
+        mock_throttled_response = MagicMock()
+        mock_throttled_response.status = 429
+        mock_throttled_response.getheader.side_effect = lambda name: "7" if name == "Retry-After" else None
+        mock_success_response = MagicMock()
+        mock_success_response.status = 200
+        mock_https_conn.return_value.getresponse.side_effect = [mock_throttled_response, mock_success_response]
+
+        result = self.client.request("/api/endpoint")
+
+        mock_sleep.assert_called_once_with(7)
+        self.assertEqual(result, mock_success_response)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_stops_when_retry_budget_used(self, mock_sleep, mock_print, mock_https_conn):
+        mock_https_conn.return_value.getresponse.return_value.status = 503
+        client = Client(max_retries=3, host=self.test_host, retry_budget=RetryBudget(ratio=0, min_retries=1))
+
+        self.assertIsNone(client.request("/api/endpoint"))
+        self.assertIsNone(client.request("/api/endpoint"))
+
+        # one retry for the first request, none left for the second
+        self.assertEqual(mock_https_conn.return_value.request.call_count, 3)
+        mock_sleep.assert_called_once()
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_stops_when_circuit_opens(self, mock_sleep, mock_print, mock_https_conn):
+        mock_https_conn.return_value.getresponse.return_value.status = 503
+        breaker = CircuitBreaker(self.test_host, failure_rate=0.5, window=10, min_requests=2)
+        client = Client(max_retries=5, host=self.test_host, circuit_breaker=breaker)
+
+        with self.assertRaises(CircuitOpenError):
+            client.request("/api/endpoint")
+
+        self.assertEqual(mock_https_conn.return_value.request.call_count, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_drains_body_before_retry(self, mock_sleep, mock_print, mock_https_conn):
+        mock_connection = MagicMock()
+        mock_https_conn.return_value = mock_connection
+
+        mock_failed_response = MagicMock()
+        mock_failed_response.status = 503
+        mock_success_response = MagicMock()
+        mock_success_response.status = 200
+        mock_connection.getresponse.side_effect = [mock_failed_response, mock_success_response]
+
+        result = self.client.request("/api/endpoint")
+
+        mock_failed_response.read.assert_called_once()
+        mock_connection.close.assert_not_called()
+        self.assertEqual(result, mock_success_response)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_discards_connection_after_error(self, mock_sleep, mock_print, mock_https_conn):
+        mock_broken_connection = MagicMock()
+        mock_broken_connection.getresponse.side_effect = socket.timeout("Timeout")
+        mock_new_connection = MagicMock()
+        mock_new_connection.getresponse.return_value.status = 200
+        mock_https_conn.side_effect = [mock_broken_connection, mock_new_connection]
+
+        result = self.client.request("/api/endpoint")
+
+        mock_broken_connection.close.assert_called_once()
+        self.assertEqual(result, mock_new_connection.getresponse.return_value)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    @patch("time.sleep")
+    def test_request_stale_connection_does_not_use_attempt(self, mock_sleep, mock_print, mock_https_conn):
+        mock_stale_connection = MagicMock()
+        mock_stale_connection.getresponse.side_effect = http.client.RemoteDisconnected("closed")
+        mock_new_connection = MagicMock()
+        mock_new_connection.sock = None
+        mock_new_connection.getresponse.return_value.status = 200
+        mock_https_conn.return_value = mock_new_connection
+
+        client = Client(max_retries=1, host=self.test_host)
+        client.conn = mock_stale_connection
+
+        result = client.request("/api/endpoint")
+
+        mock_stale_connection.close.assert_called_once()
+        mock_sleep.assert_not_called()
+        self.assertEqual(result, mock_new_connection.getresponse.return_value)
+
+    @patch("src.http_client.is_stale")
+    def test_no_stale_checks_when_transport_does_not_reuse_connections(self, mock_is_stale):
+        pool = MagicMock(reuses_connections=False)
+        pool.lease.return_value.getresponse.return_value.status = 200
+
+        with Client(host=self.test_host, pool=pool) as client:
+            client.request("/api/endpoint")
+
+        mock_is_stale.assert_not_called()
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("builtins.print")
+    def test_request_uses_rate_limiter(self, mock_print, mock_https_conn):
+        mock_limiter = MagicMock()
+        mock_response = mock_https_conn.return_value.getresponse.return_value
+        mock_response.status = 200
+        client = Client(host=self.test_host, rate_limiter=mock_limiter)
+
+        client.request("/api/endpoint")
+
+        mock_limiter.acquire.assert_called_once()
+        mock_limiter.update_from_headers.assert_called_once_with(mock_response)
+
+    def test_pooled_client_returns_connection_to_pool(self):
+        mock_pool = MagicMock()
+
+        with Client(host=self.test_host, pool=mock_pool) as client:
+            self.assertEqual(client.conn, mock_pool.lease.return_value)
+
+        mock_pool.release.assert_called_once_with(mock_pool.lease.return_value)
+        mock_pool.discard.assert_not_called()
+
+    def test_pooled_client_discards_connection_on_error(self):
+        mock_pool = MagicMock()
+
+        with self.assertRaises(RuntimeError):
+            with Client(host=self.test_host, pool=mock_pool):
+                raise RuntimeError("failed")
+
+        mock_pool.discard.assert_called_once_with(mock_pool.lease.return_value)
+        mock_pool.release.assert_not_called()
+
     def test_get_response_data(self):
         mock_response = MagicMock()
         mock_response.read.return_value = b'{"key": "value"}'
@@ -152,20 +336,539 @@ class TestClient(unittest.TestCase):
 
         self.assertEqual(result, '{"key": "value"}')
 
-    def test_get_json_dict_from_response_success(self):
-        json_str = '{"key": "value", "number": 42}'
+    def test_get_response_data_gzip(self):
+        body = json.dumps({"message": {"title": ["x" * 1000]}}).encode()
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        response = io.BytesIO(compressor.compress(body) + compressor.flush())
+        mock_response = MagicMock()
+        mock_response.read.side_effect = response.read
+        mock_response.getheader.return_value = "gzip"
+        http_client.job_stats.reset()
+
+        with patch.object(http_client, "READ_CHUNK_SIZE", 16):
+            result = self.client.get_response_data(mock_response)
+
+        self.assertEqual(result, body.decode())
+        mock_response.getheader.assert_called_once_with("Content-Encoding")
+        stats = http_client.job_stats.snapshot()
+        self.assertEqual(stats["body_bytes_received"], len(response.getvalue()))
+        self.assertEqual(stats["body_bytes_decoded"], len(body))
+
+    def test_get_response_data_deflate(self):
+        body = b'{"key": "value"}'
+
+        for compressed in (zlib.compress(body), zlib.compress(body)[2:-4]):
+            with self.subTest(zlib_wrapped=compressed[0] == 0x78):
+                mock_response = MagicMock()
+                mock_response.read.side_effect = io.BytesIO(compressed).read
+                mock_response.getheader.return_value = "deflate"
+
+                self.assertEqual(self.client.get_response_data(mock_response), body.decode())
+
+    def get_mock_response(self, status, body, headers=None):
+        mock_response = MagicMock()
+        mock_response.status = status
+        headers = {"Content-Length": str(len(body)), **(headers or {})}
+        mock_response.getheader.side_effect = lambda name, default=None: headers.get(name, default)
+        stream = io.BytesIO(body)
+        mock_response.read.side_effect = stream.read
+        mock_response.readinto.side_effect = stream.readinto
+        return mock_response
+
+    @patch.object(Client, "request")
+    def test_get_json_reads_into_reused_buffer(self, mock_request):
+        mock_request.side_effect = [
+            self.get_mock_response(200, b'{"message": {"DOI": "10.1234/a"}}'),
+            self.get_mock_response(200, b'{"message": {}}'),
+        ]
+        buffer = self.client.buffer
+
+        self.assertEqual(self.client.get_json("/works/10.1234/a"), {"message": {"DOI": "10.1234/a"}})
+        self.assertEqual(self.client.get_json("/works/10.1234/b"), {"message": {}})
+        self.assertIs(self.client.buffer, buffer)
+
+    @patch.object(Client, "request")
+    def test_get_json_grows_buffer_for_large_body(self, mock_request):
+        body = json.dumps({"message": {"title": "x" * 100_000}}).encode()
+        mock_request.return_value = self.get_mock_response(200, body)
+
+        self.assertEqual(self.client.get_json("/works/large"), json.loads(body))
+        self.assertGreaterEqual(len(self.client.buffer), len(body))
+
+    @patch.object(Client, "request")
+    def test_get_json_not_found(self, mock_request):
+        mock_request.return_value = self.get_mock_response(404, b"Resource not found.")
+
+        with self.assertRaises(NotFoundError):
+            self.client.get_json("/works/missing")
+
+        mock_request.return_value.read.assert_called_once()
+
+    @patch.object(Client, "request")
+    def test_get_json_no_response(self, mock_request):
+        mock_request.return_value = None
+
+        with self.assertRaisesRegex(RequestFailedError, "Failed to fetch data after retries."):
+            self.client.get_json("/works/failing")
+
+    @patch.object(Client, "request")
+    def test_get_json_invalid_json(self, mock_request):
+        mock_request.return_value = self.get_mock_response(200, b"{key: value}")
+
+        with self.assertRaises(ResponseParseError):
+            self.client.get_json("/works/invalid")
+
+    @patch.object(Client, "request")
+    def test_get_json_incomplete_body(self, mock_request):
+        mock_response = self.get_mock_response(200, b'{"message": {}}')
+        mock_response.getheader.side_effect = lambda name, default=None: {"Content-Length": "100"}.get(name, default)
+        mock_request.return_value = mock_response
+        mock_connection = MagicMock()
+        self.client.conn = mock_connection
+
+        with self.assertRaises(RequestFailedError):
+            self.client.get_json("/works/truncated")
+
+        mock_connection.close.assert_called_once()
+
+
+@patch("builtins.print")
+class TestLatency(unittest.TestCase):
+    def setUp(self):
+        http_client.job_stats.reset()
+        self.tracker = LatencyTracker(min_samples=1)
+        for _ in range(10):
+            self.tracker.record(0.05)
+
+        self.pool = MagicMock()
+        self.primary_conn = MagicMock()
+        self.hedge_conn = MagicMock()
+        self.pool.lease.side_effect = [self.primary_conn, self.hedge_conn]
+
+    def slow_response(self, delay, status=200):
+        def getresponse():
+            time.sleep(delay)
+            return MagicMock(status=status)
+
+        return getresponse
+
+    @patch("src.latency.Config.MIN_TIMEOUT", 2)
+    def test_timeout_set_from_latency(self, mock_print):
+        self.primary_conn.getresponse.return_value.status = 200
+        client = Client(timeout=30, host="api.example.com", pool=self.pool, latency_tracker=self.tracker)
+
+        client.request("/works/1")
+
+        self.assertEqual(self.primary_conn.timeout, 2)
+        self.assertEqual(len(self.tracker.samples), 11)
+
+    @patch("src.latency.Config.MIN_TIMEOUT", 2)
+    @patch("src.http_client.time.sleep")
+    def test_timeouts_are_recorded(self, mock_sleep, mock_print):
+        self.pool.lease.side_effect = None
+        self.pool.lease.return_value = self.primary_conn
+        self.primary_conn.getresponse.side_effect = TimeoutError("timed out")
+        client = Client(timeout=30, host="api.example.com", pool=self.pool, latency_tracker=self.tracker, max_retries=2)
+
+        self.assertIsNone(client.request("/works/1"))
+
+        self.assertEqual(list(self.tracker.samples)[-2:], [2, 6])
+
+    def test_hedge_wins_over_slow_request(self, mock_print):
+        self.primary_conn.getresponse.side_effect = self.slow_response(1)
+        self.hedge_conn.getresponse.side_effect = self.slow_response(0)
+        client = Client(host="api.example.com", pool=self.pool, latency_tracker=self.tracker, hedge=True)
+
+        started = time.monotonic()
+        response = client.request("/works/1")
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(response.status, 200)
+        self.assertIs(client.conn, self.hedge_conn)
+        self.pool.discard.assert_called_once_with(self.primary_conn)
+        self.assertEqual(http_client.job_stats.snapshot(), {"hedges_sent": 1, "hedge_wins": 1})
+
+    def test_no_hedge_for_fast_request(self, mock_print):
+        self.primary_conn.getresponse.side_effect = self.slow_response(0)
+        client = Client(host="api.example.com", pool=self.pool, latency_tracker=self.tracker, hedge=True)
+
+        client.request("/works/1")
+
+        self.pool.lease.assert_called_once()
+        self.assertEqual(http_client.job_stats.snapshot(), {})
+
+    def test_hedge_not_used_when_switched_off(self, mock_print):
+        self.primary_conn.getresponse.side_effect = self.slow_response(0.2)
+        client = Client(host="api.example.com", pool=self.pool, latency_tracker=self.tracker)
+
+        client.request("/works/1")
+
+        self.pool.lease.assert_called_once()
+        self.assertNotIn("hedges_sent", http_client.job_stats.snapshot())
+
+
+@patch("builtins.print")
+class TestRequestTimings(unittest.TestCase):
+    def setUp(self):
+        http_client.job_stats.reset()
+        self.pool = MagicMock()
+        self.conn = self.pool.lease.return_value
+        self.response = self.conn.getresponse.return_value
+        self.response.status = 200
+        self.response.getheader.return_value = None
+        self.response.read.side_effect = [b'{"message": {}}', b""]
+
+    def test_timings_for_new_connection(self, mock_print):
+        def connect(*args, **kwargs):
+            self.conn.connect_timings = {"dns": 0.01, "connect": 0.02, "tls": 0.03}
+
+        self.conn.request.side_effect = connect
+        client = Client(host="api.example.com", pool=self.pool)
+
+        client.get_json("/works/1")
+
+        timings = self.response.timings
+        self.assertEqual(set(timings), {"dns", "connect", "tls", "ttfb", "body"})
+        self.assertEqual(timings["tls"], 0.03)
+        self.assertEqual(set(http_client.job_stats.histograms_snapshot()), {"dns", "connect", "tls", "ttfb", "body"})
+
+    def test_timings_for_reused_connection(self, mock_print):
+        client = Client(host="api.example.com", pool=self.pool)
+
+        client.get_json("/works/1")
+
+        self.assertEqual(set(self.response.timings), {"ttfb", "body"})
+        self.assertEqual(http_client.job_stats.histograms_snapshot()["ttfb"].count, 1)
+
+
+class TestRetries(unittest.TestCase):
+    @patch("random.uniform", side_effect=lambda low, high: high)
+    def test_get_retry_delay_backs_off_exponentially(self, mock_uniform):
+        delays = [get_retry_delay(attempt, retry_delay=2, max_retry_delay=10) for attempt in range(1, 5)]
+
+        self.assertEqual(delays, [2, 4, 8, 10])
+
+    def test_get_retry_delay_has_jitter(self):
+        delays = {get_retry_delay(3, retry_delay=2, max_retry_delay=30) for _ in range(20)}
+
+        self.assertGreater(len(delays), 1)
+        self.assertTrue(all(4 <= delay <= 8 for delay in delays))
+
+    def test_get_retry_delay_uses_retry_after(self):
+        self.assertEqual(get_retry_delay(1, retry_delay=2, max_retry_delay=30, retry_after=20), 20)
+
+    def test_get_retry_delay_caps_retry_after(self):
+        self.assertEqual(get_retry_delay(1, retry_delay=2, max_retry_delay=10, retry_after=3600), 10)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("later"))
+
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+        self.assertAlmostEqual(parse_retry_after(format_datetime(retry_at, usegmt=True)), 60, delta=2)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+    def test_retry_budget(self):
+        budget = RetryBudget(ratio=0.5, min_retries=1)
+
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+
+        budget.record_request()
+        budget.record_request()
+
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool("api.example.com", max_idle=2, timeout=10, idle_timeout=30)
+
+    def get_open_connection(self):
+        conn = MagicMock()
+        conn.sock, peer = socket.socketpair()
+        self.addCleanup(conn.sock.close)
+        self.addCleanup(peer.close)
+        return conn, peer
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    def test_lease_creates_connection_when_empty(self, mock_https_conn):
+        conn = self.pool.lease()
+
+        mock_https_conn.assert_called_once_with(host="api.example.com", timeout=10, context=self.pool.context)
+        self.assertEqual(conn, mock_https_conn.return_value)
+
+    def test_release_and_lease_reuses_connection(self):
+        conn, _ = self.get_open_connection()
+
+        self.pool.release(conn)
+
+        self.assertEqual(self.pool.lease(), conn)
+        conn.close.assert_not_called()
+
+    def test_release_closed_connection_not_kept(self):
+        conn = MagicMock()
+        conn.sock = None
+
+        self.pool.release(conn)
+
+        self.assertEqual(len(self.pool.idle), 0)
+
+    def test_release_over_max_idle_closes_connection(self):
+        conns = [self.get_open_connection()[0] for _ in range(3)]
+
+        for conn in conns:
+            self.pool.release(conn)
+
+        self.assertEqual(len(self.pool.idle), 2)
+        conns[2].close.assert_called_once()
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    def test_lease_skips_stale_connection(self, mock_https_conn):
+        conn, peer = self.get_open_connection()
+        self.pool.release(conn)
+
+        # server closing an idle socket makes it readable
+        peer.close()
+        leased = self.pool.lease()
+
+        conn.close.assert_called_once()
+        self.assertEqual(leased, mock_https_conn.return_value)
+
+    @patch("src.http_client.CachingHTTPSConnection")
+    @patch("time.monotonic")
+    def test_lease_skips_expired_connection(self, mock_monotonic, mock_https_conn):
+        conn, _ = self.get_open_connection()
+        mock_monotonic.return_value = 100
+        self.pool.release(conn)
+
+        mock_monotonic.return_value = 131
+        leased = self.pool.lease()
+
+        conn.close.assert_called_once()
+        self.assertEqual(leased, mock_https_conn.return_value)
+
+    @patch("builtins.print")
+    @patch("src.http_client.CachingHTTPSConnection")
+    def test_prewarm_opens_connections(self, mock_https_conn, mock_print):
+        mock_https_conn.side_effect = lambda **kwargs: self.get_open_connection()[0]
+
+        self.pool.prewarm(2)
+
+        self.assertEqual(len(self.pool.idle), 2)
+        for conn, _ in self.pool.idle:
+            conn.connect.assert_called_once()
+
+    @patch("builtins.print")
+    @patch("src.http_client.CachingHTTPSConnection")
+    def test_prewarm_stops_on_connection_error(self, mock_https_conn, mock_print):
+        mock_https_conn.return_value.connect.side_effect = OSError("unreachable")
+
+        self.pool.prewarm(2)
+
+        self.assertEqual(len(self.pool.idle), 0)
+        mock_https_conn.assert_called_once()
+
+    def test_get_pool_is_shared_per_host(self):
+        self.assertIs(get_pool("api.example.com"), get_pool("api.example.com"))
+        self.assertIsNot(get_pool("api.example.com"), get_pool("other.example.com"))
+
+
+@unittest.skipUnless(shutil.which("openssl"), "openssl is needed to make a test certificate")
+class TestStaleTLSConnections(unittest.TestCase):
+    """A local TLS 1.3 server, which sends session tickets once each handshake is done."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cert_dir = tempfile.TemporaryDirectory()
+        cls.certfile = f"{cls.cert_dir.name}/cert.pem"
+        keyfile = f"{cls.cert_dir.name}/key.pem"
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost"]
+            + ["-addext", "subjectAltName=DNS:localhost", "-keyout", keyfile, "-out", cls.certfile],
+            check=True,
+            capture_output=True,
+        )
+        cls.server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        cls.server_context.minimum_version = ssl.TLSVersion.TLSv1_3
+        cls.server_context.load_cert_chain(cls.certfile, keyfile)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cert_dir.cleanup()
+
+    def setUp(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        # closing a listening socket doesn't wake a blocked accept, so it polls instead
+        self.listener.settimeout(0.01)
+        self.stopped = threading.Event()
+        self.accepted = []
+        self.thread = threading.Thread(target=self.accept, daemon=True)
+        self.thread.start()
+        self.addCleanup(self.close_server)
+
+        self.pool = ConnectionPool(f"localhost:{self.listener.getsockname()[1]}", max_idle=3)
+        self.pool.context = ssl.create_default_context(cafile=self.certfile)
+        self.addCleanup(self.pool.close)
+
+    def accept(self):
+        while not self.stopped.is_set():
+            try:
+                sock, _ = self.listener.accept()
+            except TimeoutError:
+                continue
+            sock.settimeout(5)
+            self.accepted.append(self.server_context.wrap_socket(sock, server_side=True))
+
+    def close_server(self):
+        self.stopped.set()
+        self.thread.join()
+        self.listener.close()
+        for sock in self.accepted:
+            sock.close()
+
+    def wait_until_readable(self, conn):
+        self.assertTrue(select.select([conn.sock], [], [], 5)[0], "no session ticket arrived")
+        # the tickets are sent before the server's handshake returns, so it may not have kept the socket yet
+        deadline = time.monotonic() + 5
+        while not self.accepted and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    @patch("builtins.print")
+    def test_session_tickets_are_not_stale(self, mock_print):
+        self.pool.prewarm(3)
+
+        conns = [conn for conn, _ in self.pool.idle]
+        for conn in conns:
+            self.wait_until_readable(conn)
+
+        self.assertEqual([is_stale(conn) for conn in conns], [False, False, False])
+        # and the tickets having been read, the connections are still quiet
+        self.assertEqual([is_stale(conn) for conn in conns], [False, False, False])
+        self.assertIs(self.pool.lease(), conns[-1])
+
+    @patch("builtins.print")
+    def test_closed_by_server_is_stale(self, mock_print):
+        self.pool.prewarm(1)
+        ((conn, _),) = self.pool.idle
+        self.wait_until_readable(conn)
+
+        for sock in self.accepted:
+            sock.close()
+        time.sleep(0.05)
+
+        self.assertTrue(is_stale(conn))
+
+    @patch("builtins.print")
+    def test_unexpected_data_is_stale(self, mock_print):
+        self.pool.prewarm(1)
+        ((conn, _),) = self.pool.idle
+
+        self.wait_until_readable(conn)
+        self.accepted[0].sendall(b"HTTP/1.1 408 Request Timeout\r\n\r\n")
+        time.sleep(0.05)
+
+        self.assertTrue(is_stale(conn))
+
+
+class TestDNSCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = DNSCache(ttl=60)
+        self.addresses = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 443))]
+
+    @patch("time.monotonic")
+    @patch("socket.getaddrinfo")
+    def test_resolve_cached_until_ttl(self, mock_getaddrinfo, mock_monotonic):
+        mock_getaddrinfo.return_value = self.addresses
+        mock_monotonic.return_value = 100
+
+        self.assertEqual(self.cache.resolve("api.example.com", 443), self.addresses)
+        mock_monotonic.return_value = 159
+        self.assertEqual(self.cache.resolve("api.example.com", 443), self.addresses)
+        mock_getaddrinfo.assert_called_once()
+
+        mock_monotonic.return_value = 161
+        self.cache.resolve("api.example.com", 443)
+        self.assertEqual(mock_getaddrinfo.call_count, 2)
+
+    @patch("socket.getaddrinfo")
+    def test_create_connection_failure_invalidates_entry(self, mock_getaddrinfo):
+        # nothing listens on a port that has just been released
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        mock_getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+
+        with self.assertRaises(OSError):
+            self.cache.create_connection("api.example.com", port, timeout=1)
+
+        self.assertNotIn(("api.example.com", port), self.cache.entries)
+
+    @patch("socket.getaddrinfo")
+    def test_create_connection_connects_to_resolved_address(self, mock_getaddrinfo):
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen()
+            port = server.getsockname()[1]
+            mock_getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+
+            sock = self.cache.create_connection("api.example.com", port, timeout=1)
+            self.addCleanup(sock.close)
+
+            self.assertEqual(sock.getpeername(), ("127.0.0.1", port))
+
+
+class TestCachingHTTPSConnection(unittest.TestCase):
+    def setUp(self):
+        self.context = MagicMock()
+        self.conn = CachingHTTPSConnection(host="api.example.com", timeout=10, context=self.context)
+        http_client.job_stats.reset()
+
+    def test_connect_timings_not_shared(self):
+        other = CachingHTTPSConnection(host="api.example.com", timeout=10, context=self.context)
+
+        self.conn.connect_timings["dns"] = 0.01
+
+        self.assertEqual(other.connect_timings, {})
+
+    @patch.object(http_client, "tls_sessions", TLSSessionCache())
+    @patch.object(http_client.dns_cache, "create_connection")
+    def test_connect_resumes_cached_session(self, mock_create_connection):
+        cached_session = MagicMock()
+        http_client.tls_sessions.set(self.context, "api.example.com", 443, cached_session)
+        self.context.wrap_socket.return_value.session_reused = True
+
+        self.conn.connect()
+
+        mock_create_connection.assert_called_once_with("api.example.com", 443, 10, None, self.conn.connect_timings)
+        self.assertIn("tls", self.conn.connect_timings)
+        self.context.wrap_socket.assert_called_once_with(
+            mock_create_connection.return_value, server_hostname="api.example.com", session=cached_session
+        )
+        self.assertEqual(http_client.job_stats.snapshot(), {"tls_handshakes_resumed": 1})
+
+    @patch.object(http_client, "tls_sessions", TLSSessionCache())
+    @patch.object(http_client.dns_cache, "create_connection")
+    def test_connect_full_handshake_counted(self, mock_create_connection):
+        self.context.wrap_socket.return_value.session_reused = False
 
-        result = self.client.get_json_dict_from_response(json_str)
+        self.conn.connect()
 
-        self.assertEqual(result, {"key": "value", "number": 42})
+        self.context.wrap_socket.assert_called_once_with(
+            mock_create_connection.return_value, server_hostname="api.example.com", session=None
+        )
+        self.assertEqual(http_client.job_stats.snapshot(), {"tls_handshakes_full": 1})
 
-    def test_get_json_dict_from_response_failure(self):
-        invalid_json = '{key: "value"}'
+    @patch.object(http_client.dns_cache, "create_connection")
+    def test_connect_closes_socket_on_handshake_error(self, mock_create_connection):
+        self.context.wrap_socket.side_effect = ssl.SSLError("handshake failed")
 
-        result = self.client.get_json_dict_from_response(invalid_json)
+        with self.assertRaises(ssl.SSLError):
+            self.conn.connect()
 
-        self.assertTrue(isinstance(result, str))
-        self.assertTrue(result.startswith("ERROR reading json"))
+        mock_create_connection.return_value.close.assert_called_once()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from src.latency import LatencyTracker
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = LatencyTracker(window=100, min_samples=10)
+
+    def test_nothing_derived_without_enough_samples(self):
+        for _ in range(9):
+            self.tracker.record(0.1)
+
+        self.assertIsNone(self.tracker.percentile(50))
+        self.assertIsNone(self.tracker.hedge_delay())
+        self.assertEqual(self.tracker.timeout(30), 30)
+
+    def test_percentile(self):
+        for ms in range(1, 101):
+            self.tracker.record(ms / 1000)
+
+        self.assertEqual(self.tracker.percentile(50), 0.051)
+        self.assertEqual(self.tracker.percentile(95), 0.096)
+        self.assertEqual(self.tracker.percentile(100), 0.1)
+
+    def test_window_drops_old_samples(self):
+        for _ in range(100):
+            self.tracker.record(5)
+        for _ in range(100):
+            self.tracker.record(0.5)
+
+        self.assertEqual(self.tracker.percentile(99), 0.5)
+
+    @patch("src.latency.Config.MIN_TIMEOUT", 2)
+    @patch("src.latency.Config.TIMEOUT_MULTIPLIER", 3)
+    def test_timeout_follows_p99(self):
+        for _ in range(20):
+            self.tracker.record(1.5)
+        self.assertEqual(self.tracker.timeout(30), 4.5)
+        self.assertEqual(self.tracker.timeout(4), 4)
+
+    @patch("src.latency.Config.MIN_TIMEOUT", 2)
+    @patch("src.latency.Config.TIMEOUT_MULTIPLIER", 3)
+    def test_timeouts_widen_the_timeout(self):
+        for _ in range(20):
+            self.tracker.record(1)
+        timeout = self.tracker.timeout(30)
+
+        # responses now all slower than the timeout
+        for _ in range(3):
+            self.tracker.record_timeout(timeout)
+            timeout = self.tracker.timeout(30)
+
+        self.assertEqual(timeout, 30)
+
+    @patch("src.latency.Config.MIN_TIMEOUT", 2)
+    def test_timeout_has_minimum(self):
+        for _ in range(20):
+            self.tracker.record(0.05)
+
+        self.assertEqual(self.tracker.timeout(30), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
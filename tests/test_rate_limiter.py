@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from src.rate_limiter import RateLimiter, get_rate_limiter, parse_interval
+
+
+class TestParseInterval(unittest.TestCase):
+    def test_parse_interval(self):
+        self.assertEqual(parse_interval("1s"), 1)
+        self.assertEqual(parse_interval("500ms"), 0.5)
+        self.assertEqual(parse_interval("2m"), 120)
+        self.assertEqual(parse_interval("3"), 3)
+
+    def test_parse_interval_invalid(self):
+        self.assertEqual(parse_interval("soon"), 0)
+        self.assertEqual(parse_interval(""), 0)
+
+
+@patch("builtins.print")
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "test.bucket"
+
+    def get_response(self, limit, interval, concurrency=None):
+        headers = {"X-Rate-Limit-Limit": limit, "X-Rate-Limit-Interval": interval, "X-Concurrency-Limit": concurrency}
+        response = MagicMock()
+        response.getheader.side_effect = headers.get
+        return response
+
+    @patch("time.time")
+    def test_reserve_waits_once_burst_used(self, mock_time, mock_print):
+        mock_time.return_value = 1000
+        limiter = RateLimiter(self.path, rate=2)
+
+        delays = [limiter.reserve() for _ in range(4)]
+
+        self.assertEqual(delays, [0, 0, 0.5, 1.0])
+
+    @patch("time.time")
+    def test_tokens_refill_over_time(self, mock_time, mock_print):
+        mock_time.return_value = 1000
+        limiter = RateLimiter(self.path, rate=2)
+        limiter.reserve()
+        limiter.reserve()
+
+        mock_time.return_value = 1000.5
+
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0.5)
+
+    @patch("time.time")
+    def test_refund(self, mock_time, mock_print):
+        mock_time.return_value = 1000
+        limiter = RateLimiter(self.path, rate=2)
+        delays = [limiter.reserve() for _ in range(3)]
+
+        limiter.refund()
+        limiter.refund()
+
+        self.assertEqual(delays, [0, 0, 0.5])
+        self.assertEqual(limiter.reserve(), 0)
+
+    @patch("time.time")
+    def test_bucket_shared_between_limiters(self, mock_time, mock_print):
+        """Separate limiters on one file behave like separate worker processes."""
+        mock_time.return_value = 1000
+        first = RateLimiter(self.path, rate=2)
+        second = RateLimiter(self.path, rate=2)
+
+        self.assertEqual(first.reserve(), 0)
+        self.assertEqual(second.reserve(), 0)
+        self.assertEqual(first.reserve(), 0.5)
+
+    @patch("time.time")
+    def test_update_from_headers_sets_rate(self, mock_time, mock_print):
+        mock_time.return_value = 1000
+        limiter = RateLimiter(self.path, rate=2)
+
+        limiter.update_from_headers(self.get_response("50", "1s", "5"))
+
+        self.assertEqual(limiter.rate, 50)
+        self.assertEqual(limiter.concurrency_limit, 5)
+        self.assertEqual(RateLimiter(self.path, rate=2).rate, 50)
+
+    def test_update_from_headers_ignores_missing_or_invalid_headers(self, mock_print):
+        limiter = RateLimiter(self.path, rate=2)
+
+        limiter.update_from_headers(self.get_response(None, None))
+        limiter.update_from_headers(self.get_response("lots", "1s"))
+        limiter.update_from_headers(self.get_response("50", "0s"))
+
+        self.assertEqual(limiter.rate, 2)
+        self.assertEqual(limiter.concurrency_limit, 0)
+
+    @patch("time.sleep")
+    def test_acquire_sleeps_for_reserved_delay(self, mock_sleep, mock_print):
+        limiter = RateLimiter(self.path, rate=1)
+
+        with patch.object(limiter, "reserve", side_effect=[0, 0.25]):
+            limiter.acquire()
+            limiter.acquire()
+
+        mock_sleep.assert_called_once_with(0.25)
+
+    def test_get_rate_limiter_shared_per_path(self, mock_print):
+        self.assertIs(get_rate_limiter(self.path), get_rate_limiter(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from src.redirects import HostLimiter, iter_redirect_data, wrap_redirects
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    """Answers HEAD requests from the server's routes, path to status and Location."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_HEAD(self):
+        self.server.requests.append(self.path)
+        status, location = self.server.routes.get(self.path, (404, None))
+        self.send_response(status)
+        if location:
+            self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RedirectServer(ThreadingHTTPServer):
+    """Routes for RedirectHandler to answer from, with the paths requested and connections made."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), RedirectHandler)
+        self.routes: dict[str, tuple[int, str | None]] = {}
+        self.requests: list[str] = []
+        self.connections = 0
+
+
+def start_server(test: unittest.TestCase) -> RedirectServer:
+    server = RedirectServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join)
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return server
+
+
+@patch("builtins.print")
+class TestRedirectFollowing(unittest.TestCase):
+    """A local stand-in for doi.org redirecting to a stand-in landing site."""
+
+    def setUp(self):
+        self.resolver = start_server(self)
+        self.landing = start_server(self)
+        self.resolver_url = f"http://127.0.0.1:{self.resolver.server_port}"
+        self.landing_host = f"127.0.0.1:{self.landing.server_port}"
+        landing_url = f"http://{self.landing_host}"
+
+        self.resolver.routes = {
+            "/10.1234/a": (302, f"{landing_url}/articles/a"),
+            "/10.1234/b": (302, f"{landing_url}/old/b"),
+            "/10.1234/moved": (302, "/elsewhere"),
+            "/elsewhere": (200, None),
+            "/10.1234/loop": (302, "/10.1234/loop"),
+        }
+        self.landing.routes = {
+            "/articles/a": (200, None),
+            "/old/b": (301, "/articles/b"),
+            "/articles/b": (200, None),
+        }
+
+    def check(self, dois, **kwargs):
+        return list(iter_redirect_data(dois, self.landing_host, resolver_url=self.resolver_url, **kwargs))
+
+    def test_follows_redirects_to_landing_host(self, mock_print):
+        results = self.check(["10.1234/a", "10.1234/b", "10.1234/moved", "10.1234/missing", "10.1234/loop"])
+
+        self.assertEqual([result.status for result in results], ["SUCCESS", "SUCCESS", "FAILURE", "FAILURE", "FAILURE"])
+        self.assertEqual(results[1].resolving_url, f"http://{self.landing_host}/articles/b")
+        self.assertEqual(results[2].resolving_url, f"{self.resolver_url}/elsewhere")
+        self.assertIn("NOT in", results[2].errors)
+        self.assertEqual(results[3].errors, "Resource not found.")
+        self.assertEqual(results[4].errors, f"Redirect loop at {self.resolver_url}/10.1234/loop")
+        self.assertEqual(self.landing.requests, ["/articles/a", "/old/b", "/articles/b"])
+
+    def test_reuses_a_connection_per_host(self, mock_print):
+        self.check(["10.1234/a", "10.1234/b", "10.1234/a"])
+
+        self.assertEqual(len(self.resolver.requests), 3)
+        self.assertEqual(len(self.landing.requests), 4)
+        self.assertEqual(self.resolver.connections, 1)
+        self.assertEqual(self.landing.connections, 1)
+
+    def test_records_every_hop(self, mock_print):
+        (result,) = self.check(["10.1234/b"])
+
+        message = result.full_metadata["message"]
+        self.assertEqual(message["landing-host"], "127.0.0.1")
+        self.assertEqual(
+            message["redirects"],
+            f"302 {self.resolver_url}/10.1234/b -> "
+            f"301 http://{self.landing_host}/old/b -> "
+            f"200 http://{self.landing_host}/articles/b",
+        )
+
+    def test_concurrent_results_in_order(self, mock_print):
+        dois = ["10.1234/a", "10.1234/missing", "10.1234/b", "10.1234/moved"] * 3
+
+        results = self.check(dois, jobs=4, window=2)
+
+        self.assertEqual([result.doi for result in results], dois)
+        self.assertEqual([result.status for result in results], ["SUCCESS", "FAILURE", "SUCCESS", "FAILURE"] * 3)
+
+    def test_too_many_redirects(self, mock_print):
+        self.resolver.routes.update({f"/hop/{i}": (302, f"/hop/{i + 1}") for i in range(20)})
+        self.resolver.routes["/10.1234/long"] = (302, "/hop/0")
+
+        (result,) = self.check(["10.1234/long"])
+
+        self.assertEqual(result.errors, "More than 10 redirects")
+
+
+class TestHostLimiter(unittest.TestCase):
+    @patch("src.redirects.time.sleep")
+    @patch("src.redirects.time.monotonic", return_value=100.0)
+    def test_spaces_requests(self, mock_monotonic, mock_sleep):
+        limiter = HostLimiter(max_in_flight=2, interval=0.5)
+
+        with limiter:
+            pass
+        with limiter:
+            pass
+
+        mock_sleep.assert_called_once_with(0.5)
+
+    def test_limits_requests_in_flight(self):
+        limiter = HostLimiter(max_in_flight=1, interval=0)
+
+        with limiter:
+            self.assertFalse(limiter.slots.acquire(blocking=False))
+        self.assertTrue(limiter.slots.acquire(blocking=False))
+
+
+class TestWrapRedirects(unittest.TestCase):
+    def test_landing_url_is_the_resolving_url(self):
+        wrapped = wrap_redirects(
+            "10.1234/a",
+            [{"status": 302, "url": "https://doi.org/10.1234/a"}, {"status": 200, "url": "https://example.org/a"}],
+        )
+
+        self.assertEqual(wrapped["message"]["resource"]["primary"]["URL"], "https://example.org/a")
+        self.assertEqual(wrapped["message"]["landing-host"], "example.org")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch
+
+from src.doi_result import DOIResult, Status
+from src.sampling import (
+    SampleEstimate,
+    check_sample,
+    draw_sample,
+    get_sample_size,
+    iter_full_run,
+    iter_sampled_data,
+)
+
+
+class Lookups:
+    """Stands in for iter_dois_data, DOIs ending in bad don't resolve as expected."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, dois):
+        self.calls.append(dois)
+        for doi in dois:
+            yield DOIResult(doi, Status.FAILURE if doi.endswith("bad") else Status.SUCCESS)
+
+
+class TestSampleSize(unittest.TestCase):
+    def test_sample_size(self):
+        self.assertEqual(get_sample_size(500_000, margin=0.02, confidence=0.95), 2390)
+        self.assertEqual(get_sample_size(500_000, margin=0.05, confidence=0.95), 384)
+        self.assertEqual(get_sample_size(1000, margin=0.05, confidence=0.95), 278)
+
+    def test_small_populations_are_checked_in_full(self):
+        self.assertEqual(get_sample_size(10, margin=0.02), 10)
+        self.assertEqual(get_sample_size(0), 0)
+
+
+class TestDrawSample(unittest.TestCase):
+    def setUp(self):
+        self.dois = [f"10.1111/{i}" for i in range(700)] + [f"10.2222/{i}" for i in range(290)] + ["10.3333/a"] * 10
+
+    def test_random_sample(self):
+        indices = draw_sample(self.dois, 50, method="random", seed=1)
+
+        self.assertEqual(len(set(indices)), 50)
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(indices, draw_sample(self.dois, 50, method="random", seed=1))
+
+    def test_each_prefix_gets_its_share(self):
+        indices = draw_sample(self.dois, 100, method="prefix", seed=1)
+        prefixes = [self.dois[index].split("/")[0] for index in indices]
+
+        self.assertEqual(len(set(indices)), 100)
+        self.assertEqual(indices, sorted(indices))
+        self.assertEqual(
+            {prefix: prefixes.count(prefix) for prefix in set(prefixes)},
+            {"10.1111": 70, "10.2222": 29, "10.3333": 1},
+        )
+
+    def test_shares_add_up_to_the_sample_size(self):
+        dois = ["10.1111/a", "10.1111/b", "10.2222/a", "10.3333/a", "10.3333/b"]
+
+        self.assertEqual(len(draw_sample(dois, 3, seed=2)), 3)
+        self.assertEqual(draw_sample(dois, 10), [0, 1, 2, 3, 4])
+
+
+class TestSampleEstimate(unittest.TestCase):
+    def test_bounds(self):
+        estimate = SampleEstimate(successes=2000, size=2390, population=500_000, confidence=0.95)
+
+        low, high = estimate.bounds
+        self.assertAlmostEqual(estimate.rate, 0.8368, places=4)
+        self.assertLess(low, estimate.rate)
+        self.assertGreater(high, estimate.rate)
+        self.assertLess(high - low, 0.04)
+
+    def test_bounds_stay_within_0_and_1(self):
+        low, high = SampleEstimate(successes=384, size=384, population=500_000).bounds
+
+        self.assertGreater(low, 0.98)
+        self.assertEqual(high, 1.0)
+
+    def test_whole_population_is_exact(self):
+        self.assertEqual(SampleEstimate(successes=9, size=10, population=10).bounds, (0.9, 0.9))
+
+    def test_str(self):
+        self.assertEqual(
+            str(SampleEstimate(successes=9, size=10, population=10)),
+            "90.0% of 10 DOIs estimated to resolve as expected, "
+            "between 90.0% and 90.0% with 95% confidence, from 9 of a sample of 10",
+        )
+
+
+class TestSampledRuns(unittest.TestCase):
+    def setUp(self):
+        self.dois = [f"10.1234/{i}" + ("bad" if i % 4 == 0 else "") for i in range(200)]
+        self.lookup = Lookups()
+
+    def test_check_sample(self):
+        estimate, sampled = check_sample(self.dois, self.lookup, margin=0.1, seed=3)
+
+        self.assertEqual(estimate.size, len(sampled))
+        self.assertEqual(estimate.population, 200)
+        self.assertEqual(estimate.successes, sum(not self.dois[index].endswith("bad") for index in sampled))
+        self.assertEqual(self.lookup.calls, [[self.dois[index] for index in sampled]])
+
+    def test_full_run_reuses_the_sample(self):
+        _, sampled = check_sample(self.dois, self.lookup, margin=0.1, seed=3)
+
+        results = list(iter_full_run(self.dois, sampled, self.lookup))
+
+        self.assertEqual([result.doi for result in results], self.dois)
+        self.assertEqual(len(self.lookup.calls[1]), 200 - len(sampled))
+        self.assertFalse(set(self.lookup.calls[0]) & set(self.lookup.calls[1]))
+
+    @patch("builtins.print")
+    def test_iter_sampled_data(self, mock_print):
+        results = list(iter_sampled_data(self.dois, self.lookup, "random", margin=0.1))
+
+        self.assertLess(len(results), 200)
+        self.assertIn("Sample estimate: ", mock_print.call_args.args[0])
+
+        results = list(iter_sampled_data(self.dois, self.lookup, "random", full_run=True, margin=0.1))
+        self.assertEqual([result.doi for result in results], self.dois)
+
+
+if __name__ == "__main__":
+    unittest.main()
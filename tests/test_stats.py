@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+from src.stats import Histogram, Stats
+
+
+class TestStats(unittest.TestCase):
+    def test_incr_and_snapshot(self):
+        stats = Stats()
+
+        stats.incr("dns_lookups")
+        stats.incr("bytes", 10)
+        stats.incr("bytes", 5)
+
+        self.assertEqual(stats.snapshot(), {"dns_lookups": 1, "bytes": 15})
+
+    def test_incr_from_threads(self):
+        stats = Stats()
+
+        threads = [threading.Thread(target=lambda: [stats.incr("requests") for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(stats.snapshot(), {"requests": 4000})
+
+    def test_reset(self):
+        stats = Stats()
+        stats.incr("requests")
+
+        stats.reset()
+
+        self.assertEqual(stats.snapshot(), {})
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe_and_summary(self):
+        histogram = Histogram(buckets=(0.1, 1, float("inf")))
+        for value in (0.05, 0.05, 0.5, 0.7, 3):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 2, 1])
+        self.assertEqual(histogram.summary(), {"count": 5, "mean": 0.86, "p50": 1, "p90": 3, "p99": 3, "max": 3})
+
+    def test_percentile_capped_at_max(self):
+        histogram = Histogram(buckets=(0.1, 1, float("inf")))
+        histogram.observe(0.2)
+
+        self.assertEqual(histogram.percentile(50), 0.2)
+
+    def test_stats_histograms(self):
+        stats = Stats()
+        stats.observe("ttfb", 0.2)
+        stats.observe("ttfb", 0.4)
+
+        snapshot = stats.histograms_snapshot()
+        stats.observe("ttfb", 0.6)
+
+        self.assertEqual(snapshot["ttfb"].count, 2)
+        self.assertEqual(stats.timing_summary()["ttfb"]["count"], 3)
+
+        stats.reset()
+        self.assertEqual(stats.histograms_snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,17 +5,20 @@ import csv
 import tempfile
 import os
 
-from src.submissions import process_csv_file, process_files, process_queue
+from src.doi_result import DOIResult, Status
+from src.helpers import read_csv_options
+from src.submissions import CircuitOpenError, process_csv_file, process_files, process_queue, wait_for_api
 
 
 class TestProcessCSVFile(unittest.TestCase):
+    @patch("src.submissions.read_expected_hosts", return_value={"10.1234/test2": "other.org"})
+    @patch("src.submissions.read_csv_options", return_value={})
     @patch("src.submissions.read_full_csv_data")
-    @patch("src.submissions.fetch_dois_data")
-    @patch("src.submissions.write_full_metadata_to_csv")
-    @patch("src.submissions.write_resolving_host_summary_to_csv")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.write_results_to_csv")
     @patch("src.submissions.email_summary_csv")
     def test_process_csv_file_success(
-        self, mock_email, mock_write_summary, mock_write_metadata, mock_fetch, mock_read_csv
+        self, mock_email, mock_write_results, mock_fetch, mock_read_csv, mock_read_options, mock_read_hosts
     ):
         test_file = MagicMock(spec=Path)
         test_file.name = "testfile.csv"
@@ -31,22 +34,52 @@ class TestProcessCSVFile(unittest.TestCase):
             {"doi": "10.1234/test1", "status": "success"},
             {"doi": "10.1234/test2", "status": "error"},
         ]
-        mock_write_summary.return_value = Path("/test/complete/results_summary.csv")
+        mock_write_results.return_value = Path("/test/complete/results_summary.csv")
 
-        result = process_csv_file(test_file, mock_directories, email_notification=True, full_metadata=True)
+        result = process_csv_file(
+            test_file, mock_directories, email_notification=True, full_metadata=True, jobs=1, use_async=False
+        )
 
         self.assertTrue(result)
         mock_read_csv.assert_called_once_with(test_file)
-        mock_fetch.assert_called_once_with(dois=["10.1234/test1", "10.1234/test2"], resolving_host="test.resolver.org")
-        mock_write_metadata.assert_called_once_with(mock_fetch.return_value, directories=mock_directories)
-        mock_write_summary.assert_called_once_with(
-            "test.resolver.org", mock_fetch.return_value, directories=mock_directories
+        mock_fetch.assert_called_once_with(
+            dois=["10.1234/test1", "10.1234/test2"],
+            resolving_host=mock_fetch.call_args.kwargs["resolving_host"],
+            full_metadata=True,
+            jobs=1,
+            use_async=False,
+            backend="crossref",
+        )
+        expected_hosts = mock_fetch.call_args.kwargs["resolving_host"]
+        self.assertEqual(str(expected_hosts.for_doi("10.1234/test1")), "test.resolver.org")
+        self.assertEqual(str(expected_hosts.for_doi("10.1234/test2")), "other.org")
+        mock_write_results.assert_called_once_with(
+            "test.resolver.org", mock_fetch.return_value, full_metadata=True, directories=mock_directories
         )
         mock_email.assert_called_once_with(
             recipient="test@example.com", filepath=Path("/test/complete/results_summary.csv")
         )
         test_file.unlink.assert_called_once()
 
+    @patch("builtins.print")
+    @patch("src.submissions.read_expected_hosts", return_value={})
+    @patch("src.submissions.read_csv_options", return_value={"backend": "redirects"})
+    @patch("src.submissions.read_full_csv_data")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.write_results_to_csv")
+    @patch("src.submissions.email_summary_csv")
+    def test_process_csv_file_redirects_writes_hops(
+        self, mock_email, mock_write_results, mock_fetch, mock_read_csv, mock_read_options, mock_read_hosts, mock_print
+    ):
+        test_file = MagicMock(spec=Path)
+        mock_read_csv.return_value = ("test@example.com", "test.resolver.org", ["10.1234/test1"])
+        mock_write_results.return_value = Path("/test/complete/results_summary.csv")
+
+        process_csv_file(test_file, {}, full_metadata=False)
+
+        self.assertEqual(mock_fetch.call_args.kwargs["backend"], "redirects")
+        self.assertTrue(mock_write_results.call_args.kwargs["full_metadata"])
+
     @patch("src.submissions.read_full_csv_data")
     def test_process_csv_file_failure(self, mock_read_csv):
         test_file = MagicMock(spec=Path)
@@ -60,6 +93,177 @@ class TestProcessCSVFile(unittest.TestCase):
         self.assertFalse(result)
         test_file.replace.assert_called_once_with(mock_directories["FAILURES_DIR"] / "testfile.csv")
 
+    @patch("src.submissions.update_csv_options")
+    @patch("src.submissions.read_expected_hosts", return_value={})
+    @patch("src.submissions.read_csv_options", return_value={})
+    @patch("builtins.print")
+    @patch("src.submissions.read_full_csv_data")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.email_summary_csv")
+    def test_process_csv_file_circuit_open(
+        self, mock_email, mock_fetch, mock_read_csv, mock_print, mock_read_options, mock_read_hosts, mock_update
+    ):
+        test_file = MagicMock(spec=Path)
+        test_file.name = "testfile.csv"
+
+        def results():
+            yield DOIResult("10.1234/test1", Status.SUCCESS)
+            raise CircuitOpenError("api down")
+
+        mock_read_csv.return_value = ("test@example.com", "test.resolver.org", ["10.1234/test1", "10.1234/test2"])
+        mock_fetch.return_value = results()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mock_directories = {"FAILURES_DIR": MagicMock(spec=Path), "COMPLETE_DIR": Path(temp_dir)}
+
+            with self.assertRaises(CircuitOpenError):
+                process_csv_file(test_file, mock_directories)
+
+            # no partial results are left behind
+            self.assertEqual(list(Path(temp_dir).iterdir()), [])
+
+        # left in the queue to be tried again
+        test_file.unlink.assert_not_called()
+        test_file.replace.assert_not_called()
+        mock_update.assert_called_once_with(test_file, {"requeues": "1"})
+        mock_email.assert_not_called()
+
+    @patch("builtins.print")
+    @patch("src.submissions.iter_dois_data", side_effect=CircuitOpenError("api down"))
+    @patch("src.submissions.Config.MAX_REQUEUES", 2)
+    def test_process_csv_file_circuit_open_gives_up(self, mock_fetch, mock_print):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = Path(temp_dir) / "testfile.csv"
+            test_file.write_text("test@example.com\ntest.resolver.org\n10.1234/test1\n")
+            failures_dir = Path(temp_dir) / "failures"
+            failures_dir.mkdir()
+            directories = {"FAILURES_DIR": failures_dir, "COMPLETE_DIR": Path(temp_dir)}
+
+            for requeues in ("1", "2"):
+                with self.assertRaises(CircuitOpenError):
+                    process_csv_file(test_file, directories)
+                self.assertEqual(read_csv_options(test_file), {"requeues": requeues})
+
+            with self.assertRaises(CircuitOpenError):
+                process_csv_file(test_file, directories)
+
+            self.assertFalse(test_file.exists())
+            self.assertTrue((failures_dir / "testfile.csv").exists())
+
+    @patch("builtins.print")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.iter_prefix_data")
+    @patch("src.submissions.write_results_to_csv")
+    @patch("src.submissions.email_summary_csv")
+    def test_process_csv_file_prefix(
+        self, mock_email, mock_write_results, mock_fetch_prefix, mock_fetch_dois, mock_print
+    ):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = Path(temp_dir) / "prefix.csv"
+            test_file.write_text("test@example.com,prefix=10.1234,filter=type:journal-article\ntest.resolver.org\n")
+
+            self.assertTrue(process_csv_file(test_file, {}, email_notification=False))
+
+        mock_fetch_prefix.assert_called_once_with(
+            prefix="10.1234", resolving_host="test.resolver.org", filters="type:journal-article", full_metadata=False
+        )
+        mock_fetch_dois.assert_not_called()
+        mock_write_results.assert_called_once()
+
+    def sample_job(self, temp_dir, options):
+        test_file = Path(temp_dir) / "sample.csv"
+        dois = "\n".join(f"10.1234/{i}" for i in range(50))
+        test_file.write_text(f"test@example.com,{options}\ntest.resolver.org\n{dois}\n")
+        return test_file
+
+    def lookup(self, dois, **kwargs):
+        for doi in dois:
+            yield DOIResult(doi, Status.SUCCESS)
+
+    @patch("builtins.print")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.email_summary_csv")
+    def test_process_csv_file_sample(self, mock_email, mock_fetch_dois, mock_print):
+        mock_fetch_dois.side_effect = self.lookup
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = self.sample_job(temp_dir, "sample=random")
+
+            self.assertTrue(process_csv_file(test_file, {"COMPLETE_DIR": Path(temp_dir)}))
+
+            (sample_file,) = Path(temp_dir).glob("dois_to_test.resolver.org_sample_*.csv")
+            with open(sample_file, newline="") as file:
+                sampled = list(csv.reader(file))[1:]
+            self.assertFalse(test_file.exists())
+
+        self.assertLess(len(sampled), 50)
+        mock_fetch_dois.assert_called_once()
+        mock_email.assert_called_once()
+        self.assertIn("estimated to resolve as expected", mock_email.call_args.kwargs["message_body"])
+
+    @patch("builtins.print")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.email_summary_csv")
+    def test_process_csv_file_sample_then_full_run(self, mock_email, mock_fetch_dois, mock_print):
+        mock_fetch_dois.side_effect = self.lookup
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = self.sample_job(temp_dir, "sample=prefix,full_run=true")
+
+            self.assertTrue(process_csv_file(test_file, {"COMPLETE_DIR": Path(temp_dir)}))
+
+            (results_file,) = Path(temp_dir).glob("dois_to_test.resolver.org_results_*.csv")
+            with open(results_file, newline="") as file:
+                results = list(csv.reader(file))[1:]
+
+        self.assertEqual([row[0] for row in results], [f"10.1234/{i}" for i in range(50)])
+        sample, rest = (call.kwargs["dois"] for call in mock_fetch_dois.call_args_list)
+        self.assertEqual(len(sample) + len(rest), 50)
+        self.assertFalse(set(sample) & set(rest))
+        self.assertEqual(mock_email.call_count, 2)
+
+    @patch("builtins.print")
+    @patch("src.submissions.iter_dois_data")
+    @patch("src.submissions.email_summary_csv")
+    def test_stopped_full_run_isnt_sampled_again(self, mock_email, mock_fetch_dois, mock_print):
+        def stopped(dois, **kwargs):
+            if len(mock_fetch_dois.call_args_list) == 2:
+                raise CircuitOpenError(30)
+            return self.lookup(dois)
+
+        mock_fetch_dois.side_effect = stopped
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = self.sample_job(temp_dir, "sample=random,full_run=true")
+            rows = test_file.read_text().splitlines()[1:]
+
+            with self.assertRaises(CircuitOpenError):
+                process_csv_file(test_file, {"COMPLETE_DIR": Path(temp_dir)})
+            self.assertEqual(read_csv_options(test_file), {"sample_done": "true", "requeues": "1"})
+            self.assertEqual(test_file.read_text().splitlines()[1:], rows)
+
+            self.assertTrue(process_csv_file(test_file, {"COMPLETE_DIR": Path(temp_dir)}))
+
+        self.assertEqual(len(mock_fetch_dois.call_args_list[-1].kwargs["dois"]), 50)
+        # the sample and the full results, not a second sample
+        self.assertEqual(mock_email.call_count, 2)
+
+
+class TestWaitForAPI(unittest.TestCase):
+    @patch("builtins.print")
+    @patch("src.submissions.time.sleep")
+    @patch("src.submissions.check_api_available")
+    def test_wait_for_api_probes_until_available(self, mock_check_api, mock_sleep, mock_print):
+        breaker = MagicMock()
+        breaker.retry_in.side_effect = [12, 0]
+        mock_check_api.side_effect = [False, True]
+
+        wait_for_api(breaker)
+
+        self.assertEqual(mock_check_api.call_count, 2)
+        mock_check_api.assert_called_with(breaker.host)
+        self.assertEqual(mock_sleep.call_args_list[0], unittest.mock.call(12))
+
 
 class TestProcessFiles(unittest.TestCase):
     @patch("src.submissions.process_csv_file")
@@ -84,10 +288,11 @@ class TestProcessFiles(unittest.TestCase):
         mock_text_file.replace.assert_called_once_with(mock_directories["FAILURES_DIR"] / "test.txt")
 
 
+@patch("src.submissions.get_pool")
 class TestProcessQueue(unittest.TestCase):
     @patch("src.submissions.create_lockfile")
     @patch("src.submissions.process_files")
-    def test_process_queue_no_files(self, mock_process_files, mock_create_lockfile):
+    def test_process_queue_no_files(self, mock_process_files, mock_create_lockfile, mock_get_pool):
         mock_create_lockfile.return_value = True
         mock_lock_file = MagicMock(spec=Path)
         mock_directories = {"QUEUE_DIR": MagicMock(spec=Path), "COMPLETE_DIR": MagicMock(spec=Path)}
@@ -97,11 +302,12 @@ class TestProcessQueue(unittest.TestCase):
         process_queue(lock_filepath=mock_lock_file, directories=mock_directories)
 
         mock_process_files.assert_not_called()
+        mock_get_pool.return_value.prewarm.assert_called_once()
         mock_lock_file.unlink.assert_called_once_with(missing_ok=True)
 
     @patch("src.submissions.create_lockfile")
     @patch("src.submissions.process_files")
-    def test_process_queue_with_files(self, mock_process_files, mock_create_lockfile):
+    def test_process_queue_with_files(self, mock_process_files, mock_create_lockfile, mock_get_pool):
         mock_create_lockfile.return_value = True
         mock_lock_file = MagicMock(spec=Path)
 
@@ -121,6 +327,42 @@ class TestProcessQueue(unittest.TestCase):
         mock_process_files.assert_called_once_with([mock_file1, mock_file2], mock_directories)
         mock_lock_file.unlink.assert_called_once_with(missing_ok=True)
 
+    @patch("builtins.print")
+    @patch("src.submissions.wait_for_api")
+    @patch("src.submissions.create_lockfile")
+    @patch("src.submissions.process_files")
+    def test_process_queue_pauses_when_circuit_open(
+        self, mock_process_files, mock_create_lockfile, mock_wait_for_api, mock_print, mock_get_pool
+    ):
+        mock_create_lockfile.return_value = True
+        mock_lock_file = MagicMock(spec=Path)
+        mock_file = MagicMock(spec=Path)
+        mock_directories = {"QUEUE_DIR": MagicMock(spec=Path), "COMPLETE_DIR": MagicMock(spec=Path)}
+
+        mock_directories["QUEUE_DIR"].iterdir.side_effect = [[mock_file], [mock_file], []]
+        mock_process_files.side_effect = [CircuitOpenError("api down"), None]
+
+        process_queue(lock_filepath=mock_lock_file, directories=mock_directories)
+
+        mock_wait_for_api.assert_called_once()
+        self.assertEqual(mock_process_files.call_count, 2)
+
+    @patch("builtins.print")
+    @patch("src.submissions.wait_for_api")
+    @patch("src.submissions.create_lockfile")
+    @patch("src.submissions.process_files")
+    def test_process_queue_waits_for_the_host_that_failed(
+        self, mock_process_files, mock_create_lockfile, mock_wait_for_api, mock_print, mock_get_pool
+    ):
+        mock_create_lockfile.return_value = True
+        mock_directories = {"QUEUE_DIR": MagicMock(spec=Path), "COMPLETE_DIR": MagicMock(spec=Path)}
+        mock_directories["QUEUE_DIR"].iterdir.side_effect = [[MagicMock(spec=Path)], []]
+        mock_process_files.side_effect = [CircuitOpenError("doi.org down", host="doi.org")]
+
+        process_queue(lock_filepath=MagicMock(spec=Path), directories=mock_directories)
+
+        self.assertEqual(mock_wait_for_api.call_args.args[0].host, "doi.org")
+
 
 class TestIntegration(unittest.TestCase):
     def setUp(self):
@@ -152,12 +394,12 @@ class TestIntegration(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
-    @patch("src.submissions.fetch_dois_data")
+    @patch("src.submissions.iter_dois_data")
     @patch("src.submissions.email_summary_csv")
     def test_integration_process_csv_file(self, mock_email, mock_fetch):
         mock_fetch.return_value = [
-            {"doi": "10.1234/test1", "status": "success", "full_metadata": {"message": {"title": "Test1"}}},
-            {"doi": "10.1234/test2", "status": "error", "full_metadata": {"message": {"title": "Test2"}}},
+            DOIResult("10.1234/test1", Status.SUCCESS, full_metadata={"message": {"title": "Test1"}}),
+            DOIResult("10.1234/test2", Status.FAILURE, full_metadata={"message": {"title": "Test2"}}),
         ]
 
         result = process_csv_file(self.test_csv_path, self.directories, email_notification=False)
@@ -1,7 +1,20 @@
 import unittest
 from unittest.mock import patch
 
-from src.validators import is_required, must_be_empty, is_email, is_host, is_doi, get_invalid_dois, validate_dois
+from src.validators import (
+    is_required,
+    must_be_empty,
+    is_email,
+    is_host,
+    is_backend,
+    is_doi,
+    is_filter,
+    is_prefix,
+    is_sample,
+    get_invalid_dois,
+    validate_dois,
+    validate_form,
+)
 
 
 class TestValidators(unittest.TestCase):
@@ -148,3 +161,86 @@ class TestDOIValidators(unittest.TestCase):
 
         self.assertFalse(result["ok"])
         self.assertIn("Invalid DOIs given:", result["error"])
+
+    def test_is_prefix(self):
+        self.assertEqual(is_prefix(" 10.1234 "), {"ok": True, "value": "10.1234"})
+        for value in ("10.12", "10.1234/abc", "11.1234", "prefix"):
+            self.assertFalse(is_prefix(value)["ok"])
+
+    def test_is_filter(self):
+        for value in ("", None, "type:journal-article", "type:journal-article,from-pub-date:2020-01"):
+            self.assertTrue(is_filter(value)["ok"])
+        for value in ("type", "type:journal-article,", "type:a,,from-pub-date:2020"):
+            self.assertFalse(is_filter(value)["ok"])
+
+    def test_validate_form_with_prefix(self):
+        form = {
+            "csrf_token": "token",
+            "email": "someone@email.com",
+            "resolving_host": "example.com",
+            "prefix": "10.1234",
+            "filters": "type:journal-article",
+            "dois_text": "",
+        }
+
+        results = validate_form(form, "token")
+
+        self.assertTrue(all(result["ok"] for result in results.values()))
+        self.assertEqual(results["prefix"]["value"], "10.1234")
+        self.assertEqual(results["filters"]["value"], "type:journal-article")
+
+        # DOIs and a prefix can't both be given
+        results = validate_form({**form, "dois_text": "10.1234/abc"}, "token")
+        self.assertFalse(results["dois"]["ok"])
+
+        # the Handle API has no way to list a prefix's DOIs
+        results = validate_form({**form, "backend": "handle"}, "token")
+        self.assertFalse(results["backend"]["ok"])
+
+    def test_validate_form_with_several_hosts(self):
+        form = {
+            "csrf_token": "token",
+            "email": "someone@email.com",
+            "resolving_host": "example.com,  example.org",
+            "dois_text": "10.1234/abc\n10.1234/def other.net",
+        }
+
+        results = validate_form(form, "token")
+
+        self.assertTrue(all(result["ok"] for result in results.values()))
+        self.assertEqual(results["resolver"]["value"], "example.com, example.org")
+        self.assertEqual(results["dois"]["value"], ["10.1234/abc", "10.1234/def other.net"])
+
+        # hosts given for a DOI are checked too
+        results = validate_form({**form, "dois_text": "10.1234/def https://other.net"}, "token")
+        self.assertFalse(results["dois"]["ok"])
+
+        # the resolving host is only needed for DOIs without their own
+        results = validate_form({**form, "resolving_host": ""}, "token")
+        self.assertFalse(results["resolver"]["ok"])
+        results = validate_form({**form, "resolving_host": "", "dois_text": "10.1234/def other.net"}, "token")
+        self.assertTrue(results["resolver"]["ok"])
+
+    def test_is_host_with_several_hosts(self):
+        self.assertEqual(is_host("a.com b.org,c.net"), {"ok": True, "value": "a.com, b.org, c.net"})
+        self.assertFalse(is_host("a.com, localhost")["ok"])
+        self.assertEqual(is_host("platform.org/journals")["value"], "platform.org/journals")
+
+    def test_is_sample(self):
+        for value in ("", None, "prefix", "random"):
+            self.assertTrue(is_sample(value)["ok"])
+        self.assertFalse(is_sample("half")["ok"])
+
+        form = {
+            "csrf_token": "token",
+            "email": "someone@email.com",
+            "resolving_host": "example.com",
+            "prefix": "10.1234",
+            "sample": "random",
+        }
+        self.assertFalse(validate_form(form, "token")["sample"]["ok"])
+
+    def test_is_backend(self):
+        for value in ("", None, "crossref", "handle", "redirects", "auto"):
+            self.assertTrue(is_backend(value)["ok"])
+        self.assertFalse(is_backend("datacite")["ok"])